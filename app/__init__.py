@@ -1,18 +1,28 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import APIRouter, FastAPI, Request
+from fastapi import APIRouter, FastAPI, Request, Response
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from pgai import install
 
 from app.common.exception_handlers import (
     custom_http_exception_handler,
     unhandled_exception_handler,
     validation_exception_handler,
 )
+from app.common.compression import CompressionMiddleware
+from app.common.database import ENGINE, POOL_STATS
+from app.common.embeddings import close_embedding_backend, get_embedding_backend
+from app.common.llm import close_llm_client
+from app.common.memory_index import start_memory_index_refresher
+from app.common.metrics import MetricsMiddleware, render_metrics
+from app.common.pgai_setup import ensure_pgai_installed
+from app.common.prompts import get_prompt_registry, start_prompt_reloader
+from app.common.vectorizer import start_vectorizer_monitor
 from app.v1.routes import router as v1_router
 from config import CONFIG
 
@@ -20,9 +30,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# install pgai into database
-install(db_url=CONFIG.PGAI_DATABASE_URL)
-
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
@@ -32,13 +39,51 @@ def home():
     return RedirectResponse(url="/docs")
 
 
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    data, content_type = render_metrics()
+    return Response(data, media_type=content_type)
+
+
+@router.get("/stats/pool", include_in_schema=False)
+def pool_stats():
+    return POOL_STATS.snapshot(ENGINE.pool)
+
+
 @router.get("/pages/create", response_class=HTMLResponse, include_in_schema=False)
 async def render_page(request: Request):
     return templates.TemplateResponse("page_form.html", {"request": request})
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CONFIG.PGAI_INSTALL_ON_STARTUP:
+        await ensure_pgai_installed(ENGINE)
+
+    # compile every prompt template before the first request needs one
+    get_prompt_registry()
+    if CONFIG.EMBEDDING_BACKEND == "local":
+        # load the embedding model before the first query needs it
+        await asyncio.to_thread(get_embedding_backend)
+    reloader = start_prompt_reloader()
+    index_refresher = start_memory_index_refresher(ENGINE)
+    vectorizer_monitor = start_vectorizer_monitor()
+    yield
+    for task in (reloader, index_refresher, vectorizer_monitor):
+        if task is not None:
+            task.cancel()
+    await close_embedding_backend()
+    await close_llm_client()
+
+
 def create_app():
-    app = FastAPI(title="Gen AI LLM API", description="API for Gen AI LLM with Ollama")
+    app = FastAPI(
+        title="Gen AI LLM API",
+        description="API for Gen AI LLM with Ollama",
+        lifespan=lifespan,
+        # serialize with orjson instead of json.dumps
+        default_response_class=ORJSONResponse,
+    )
 
     app.include_router(router)
 
@@ -52,6 +97,10 @@ def create_app():
     app.add_exception_handler(StarletteHTTPException, custom_http_exception_handler)
     app.add_exception_handler(Exception, unhandled_exception_handler)
 
+    app.add_middleware(CompressionMiddleware)
+    # added last so request latency includes compression
+    app.add_middleware(MetricsMiddleware)
+
     # Mount static files
     app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
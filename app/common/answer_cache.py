@@ -0,0 +1,71 @@
+import logging
+
+from sqlalchemy import and_, any_, delete, exists, select
+
+from app.common.models import AnswerCache, Page
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+async def lookup_cached_answer(
+    session, query_embedding: list[float], model: str, template_version: str
+) -> str | None:
+    """Return the answer of the closest cached question, if close enough.
+
+    An entry only qualifies when it was produced by the same model and prompt
+    template, none of the pages it was built from changed since, and no page
+    was created since. A new page may hold a better answer, so the newest
+    ``pages.created_at`` acts as the corpus generation the entry must match.
+    """
+    distance = AnswerCache.query_embedding.cosine_distance(query_embedding)
+    source_changed = exists().where(
+        and_(
+            Page.id == any_(AnswerCache.page_ids),
+            Page.updated_at > AnswerCache.created_at,
+        )
+    )
+    corpus_grew = exists().where(Page.created_at > AnswerCache.created_at)
+    stmt = (
+        select(AnswerCache.answer)
+        .where(
+            AnswerCache.model == model,
+            AnswerCache.template_version == template_version,
+            distance < CONFIG.ANSWER_CACHE_MAX_DISTANCE,
+            ~source_changed,
+            ~corpus_grew,
+        )
+        .order_by(distance)
+        .limit(1)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def store_answer(
+    session,
+    query_embedding: list[float],
+    chunks,
+    model: str,
+    template_version: str,
+    answer: str,
+):
+    entry = AnswerCache(
+        query_embedding=query_embedding,
+        chunk_ids=[chunk.chunk_id for chunk in chunks],
+        page_ids=sorted({chunk.page_id for chunk in chunks}),
+        model=model,
+        template_version=template_version,
+        answer=answer,
+    )
+    session.add(entry)
+    await session.commit()
+
+
+async def invalidate_answers(session):
+    """Drop every cached answer, e.g. when retrieval itself changes.
+
+    Page writes need not call this: ``lookup_cached_answer`` already skips
+    entries older than the newest page or than one of their source pages.
+    """
+    await session.execute(delete(AnswerCache))
@@ -0,0 +1,179 @@
+"""Negotiated response compression.
+
+Responses of at least ``COMPRESSION_MIN_SIZE`` bytes are compressed with the
+best encoding the client accepts: zstd, brotli or gzip, in that order of
+preference. zstd and brotli are used only when their packages are installed.
+Streaming responses (NDJSON/SSE chat, exports) are passed through untouched so
+their events are not held back in a compressor buffer.
+"""
+
+import asyncio
+import gzip
+from collections.abc import Callable
+
+from config import CONFIG
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+# multi-megabyte page lists take tens of milliseconds to compress, do that
+# off the event loop
+THREAD_MIN_SIZE = 256 * 1024
+
+# already compressed formats are not worth the CPU
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "application/zip")
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def _compress_zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+def available_encoders() -> dict[str, Callable[[bytes], bytes]]:
+    """Encoders usable in this process, in order of preference."""
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = _compress_zstd
+    if brotli is not None:
+        encoders["br"] = _compress_brotli
+    encoders["gzip"] = _compress_gzip
+    return encoders
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """``{coding: q}`` from an Accept-Encoding header, lowercased."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header: str, encodings) -> str | None:
+    """The preferred of ``encodings`` with the highest q-value, if any."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses above ``min_size``."""
+
+    def __init__(self, app, min_size: int | None = None):
+        self.app = app
+        self.min_size = CONFIG.COMPRESSION_MIN_SIZE if min_size is None else min_size
+        self.encoders = available_encoders()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept, self.encoders) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                # held back until the first body part shows whether to compress
+                start_message = message
+                return
+
+            body = message.get("body", b"")
+            headers = start_message["headers"]
+            if (
+                message.get("more_body", False)
+                or len(body) < self.min_size
+                or not _compressible(headers)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compress = self.encoders[encoding]
+            if len(body) >= THREAD_MIN_SIZE:
+                compressed = await asyncio.to_thread(compress, body)
+            else:
+                compressed = compress(body)
+            headers = [
+                (name, value)
+                for name, value in headers
+                if name not in (b"content-length", b"vary")
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", _vary(start_message["headers"])),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _compressible(headers) -> bool:
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type" and value.decode("latin-1").startswith(
+            INCOMPRESSIBLE_TYPES
+        ):
+            return False
+    return True
+
+
+def _vary(headers) -> bytes:
+    for name, value in headers:
+        if name == b"vary" and b"accept-encoding" not in value.lower():
+            return value + b", Accept-Encoding"
+        if name == b"vary":
+            return value
+    return b"Accept-Encoding"
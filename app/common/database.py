@@ -1,15 +1,107 @@
+import logging
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import func
+from sqlalchemy import exc, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy_utils import UUIDType
 
+from app.common.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_OVERFLOW_EVENTS,
+    DB_POOL_TIMEOUTS,
+)
 from config import CONFIG
 
-ENGINE = create_async_engine(CONFIG.DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    """Per-worker counters describing how the connection pool is used."""
+
+    checkouts: int = 0
+    overflow_events: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def record_checkout(self, wait_seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def snapshot(self, pool) -> dict:
+        return dict(
+            asdict(self),
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+
+
+POOL_STATS = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool recording checkout wait time, overflow and timeouts."""
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            POOL_STATS.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            logger.warning("connection pool exhausted: %s", self.status())
+            raise
+
+        wait_seconds = time.perf_counter() - start
+        POOL_STATS.record_checkout(wait_seconds)
+        DB_POOL_CHECKOUT_WAIT.observe(wait_seconds)
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+        if wait_seconds > CONFIG.DB_POOL_SLOW_CHECKOUT:
+            logger.warning("waited %.3fs for a pooled connection", wait_seconds)
+        if self._overflow > 0 and self._overflow > overflow_before:
+            POOL_STATS.overflow_events += 1
+            DB_POOL_OVERFLOW_EVENTS.inc()
+            logger.info("opened overflow connection: %s", self.status())
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+
+
+def engine_options() -> dict:
+    connect_args = {"statement_cache_size": CONFIG.DB_STATEMENT_CACHE_SIZE}
+    if CONFIG.DB_PGBOUNCER_MODE:
+        # transaction pooling cannot keep prepared statements between queries
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=CONFIG.DB_POOL_SIZE,
+        max_overflow=CONFIG.DB_MAX_OVERFLOW,
+        pool_timeout=CONFIG.DB_POOL_TIMEOUT,
+        pool_recycle=CONFIG.DB_POOL_RECYCLE,
+        pool_pre_ping=CONFIG.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+ENGINE = create_async_engine(CONFIG.DATABASE_URL, **engine_options())
 SessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=ENGINE)
 
 
@@ -0,0 +1,684 @@
+"""Alternative vectorizer configurations, built side by side and switched.
+
+The vectorizer created by migration ``02798e54b562`` splits pages into 800
+character chunks overlapping by 400, so most text is embedded twice. Each
+profile below is another way to chunk and embed ``pages.content``. A profile
+gets its own pgai vectorizer writing to ``pages_embeddings_<profile>_store``,
+which the ``vectorizer_worker`` backfills next to the live table.
+
+The application always reads ``pages_embeddings_store`` and the
+``pages_embeddings`` view. Switching to a profile renames the tables, views
+and indexes of the outgoing and the incoming profile, and repoints both
+vectorizers, in one transaction. Retrieval moves to the new chunks at the
+commit, with no deploy.
+
+::
+
+    python cli.py create-embedding-profile recursive_800_80
+    python cli.py embedding-profile-report --recall-target 0.9
+    python cli.py switch-embedding-profile recursive_800_80
+"""
+
+import asyncio
+import logging
+import random
+import re
+from dataclasses import dataclass, field
+
+from pgai.vectorizer.configuration import (
+    ChunkingCharacterTextSplitterConfig,
+    ChunkingRecursiveCharacterTextSplitterConfig,
+    DestinationTableConfig,
+    EmbeddingOllamaConfig,
+    FormattingPythonTemplateConfig,
+    LoadingColumnConfig,
+)
+from pgai.vectorizer.create_vectorizer import CreateVectorizer
+from sqlalchemy import func, select, text
+
+from app.common.answer_cache import invalidate_answers
+from app.common.llm import get_llm_client
+from app.common.models import EMBEDDING_DIMENSIONS, Page
+from app.common.pg_vector_index import PgCreateVectorIndexOp
+from app.common.pgai_setup import installed_pgai_version
+from app.common.vectorizer import VECTORIZER_NAME, vectorizer_backlog
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_DESTINATION = "pages_embeddings"
+DEFAULT_PROFILE = "default"
+PROFILE_NAME_RE = re.compile(r"^[a-z][a-z0-9_]{0,23}$")
+# queries running against the tables hold them for as long as they run
+SWITCH_LOCK_TIMEOUT = "10s"
+QUERY_EMBED_BATCH_SIZE = 32
+SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+MIN_QUERY_WORDS = 6
+
+SENTENCE_SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", "; ", " "]
+
+# pgai has no public way to point a vectorizer at an existing table:
+# ai.create_vectorizer refuses a destination that exists. The switch therefore
+# edits ai.vectorizer.config and rebuilds the source triggers with this
+# internal function, which is only known to work with the pgai releases below
+# (pinned in pyproject.toml) and is checked before anything is changed.
+SWITCH_PGAI_VERSIONS = ("0.10.",)
+PGAI_TRIGGER_BUILDER = (
+    "ai._vectorizer_build_trigger_definition(name, name, name, name, name, name, jsonb)"
+)
+
+
+@dataclass(frozen=True)
+class EmbeddingProfile:
+    name: str
+    chunking: (
+        ChunkingCharacterTextSplitterConfig
+        | ChunkingRecursiveCharacterTextSplitterConfig
+    )
+    model: str = field(default_factory=lambda: CONFIG.OLLAMA_EMBEDDING_MODEL)
+    dimensions: int = EMBEDDING_DIMENSIONS
+    template: str = "$title - $chunk"
+    description: str = ""
+    # built and reported on, but never switched to: retrieval and the query
+    # embeddings are fixed to EMBEDDING_DIMENSIONS and OLLAMA_EMBEDDING_MODEL
+    evaluation_only: bool = False
+
+    def __post_init__(self):
+        if not PROFILE_NAME_RE.match(self.name):
+            raise ValueError(f"Invalid profile name: {self.name!r}")
+        if self.dimensions != EMBEDDING_DIMENSIONS and not self.evaluation_only:
+            raise ValueError(
+                f"Profile {self.name!r} stores {self.dimensions} dimensions, "
+                f"only evaluation-only profiles may differ from "
+                f"{EMBEDDING_DIMENSIONS}"
+            )
+
+    @property
+    def vectorizer_name(self) -> str:
+        if self.name == DEFAULT_PROFILE:
+            return VECTORIZER_NAME
+        return f"{VECTORIZER_NAME}_{self.name}"
+
+    @property
+    def destination(self) -> str:
+        """The view name while the profile is not active; ``_store`` is appended
+        for the table."""
+        return f"{ACTIVE_DESTINATION}_{self.name}"
+
+    def create_vectorizer_sql(self) -> str:
+        return CreateVectorizer(
+            source=Page.__tablename__,
+            name=self.vectorizer_name,
+            destination=DestinationTableConfig(destination=self.destination),
+            loading=LoadingColumnConfig(column_name="content"),
+            embedding=EmbeddingOllamaConfig(
+                model=self.model, dimensions=self.dimensions
+            ),
+            chunking=self.chunking,
+            formatting=FormattingPythonTemplateConfig(template=self.template),
+        ).to_sql()
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        EmbeddingProfile(
+            DEFAULT_PROFILE,
+            ChunkingCharacterTextSplitterConfig(
+                chunk_size=800,
+                chunk_overlap=400,
+                separator=".",
+                is_separator_regex=False,
+            ),
+            description="migration 02798e54b562: 800 characters, 50% overlap",
+        ),
+        EmbeddingProfile(
+            "char_800_100",
+            ChunkingCharacterTextSplitterConfig(
+                chunk_size=800,
+                chunk_overlap=100,
+                separator=".",
+                is_separator_regex=False,
+            ),
+            description="the default splitter with 12.5% overlap",
+        ),
+        EmbeddingProfile(
+            "recursive_800_80",
+            ChunkingRecursiveCharacterTextSplitterConfig(
+                chunk_size=800,
+                chunk_overlap=80,
+                separators=["\n\n", "\n", ".", " "],
+                is_separator_regex=False,
+            ),
+            description="paragraphs, then lines, then sentences; 10% overlap",
+        ),
+        EmbeddingProfile(
+            "sentences_500_50",
+            ChunkingRecursiveCharacterTextSplitterConfig(
+                chunk_size=500,
+                chunk_overlap=50,
+                separators=SENTENCE_SEPARATORS,
+                is_separator_regex=False,
+            ),
+            description="shorter chunks cut at sentence boundaries",
+        ),
+        EmbeddingProfile(
+            "minilm_384",
+            ChunkingRecursiveCharacterTextSplitterConfig(
+                chunk_size=500,
+                chunk_overlap=50,
+                separators=SENTENCE_SEPARATORS,
+                is_separator_regex=False,
+            ),
+            model="all-minilm",
+            dimensions=384,
+            description="384-dimension all-minilm vectors, half the storage",
+            evaluation_only=True,
+        ),
+    )
+}
+
+
+SWITCHABLE_PROFILES = sorted(
+    name for name, profile in PROFILES.items() if not profile.evaluation_only
+)
+
+
+def get_profile(name: str) -> EmbeddingProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise LookupError(
+            f"Unknown embedding profile {name!r}, expected one of {sorted(PROFILES)}"
+        ) from None
+
+
+@dataclass
+class ProfileState:
+    """What the database says about a profile's vectorizer."""
+
+    profile: str
+    vectorizer: str
+    disabled: bool
+    store: str
+    view: str
+    queue: str
+    model: str
+    dimensions: int
+
+    @property
+    def active(self) -> bool:
+        return self.view == ACTIVE_DESTINATION
+
+
+def _profile_of(vectorizer_name: str) -> str | None:
+    if vectorizer_name == VECTORIZER_NAME:
+        return DEFAULT_PROFILE
+    prefix = f"{VECTORIZER_NAME}_"
+    if vectorizer_name.startswith(prefix):
+        return vectorizer_name.removeprefix(prefix)
+    return None
+
+
+async def profile_states(connection) -> dict[str, ProfileState]:
+    """The created profiles, by name."""
+    rows = await connection.execute(
+        text(
+            "SELECT name, disabled, queue_schema, queue_table, "
+            "config -> 'destination' ->> 'target_table' AS store, "
+            "config -> 'destination' ->> 'view_name' AS view, "
+            "config -> 'embedding' ->> 'model' AS model, "
+            "(config -> 'embedding' ->> 'dimensions')::int AS dimensions "
+            "FROM ai.vectorizer WHERE source_table = :source"
+        ),
+        {"source": Page.__tablename__},
+    )
+    states = {}
+    for row in rows:
+        profile = _profile_of(row.name)
+        if profile is None:
+            continue
+        states[profile] = ProfileState(
+            profile=profile,
+            vectorizer=row.name,
+            disabled=row.disabled,
+            store=row.store,
+            view=row.view,
+            queue=f"{_ident(row.queue_schema)}.{_ident(row.queue_table)}",
+            model=row.model,
+            dimensions=row.dimensions,
+        )
+    return states
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _vector_index_options() -> dict:
+    # the same build parameters as migration 5859f65566a5
+    if CONFIG.VECTOR_INDEX_METHOD == "diskann":
+        return {
+            "num_neighbors": CONFIG.DISKANN_NUM_NEIGHBORS,
+            "search_list_size": CONFIG.DISKANN_SEARCH_LIST_SIZE,
+        }
+    return {"m": CONFIG.HNSW_M, "ef_construction": CONFIG.HNSW_EF_CONSTRUCTION}
+
+
+def store_extension_statements(destination: str) -> list[str]:
+    """The columns and indexes migrations added to ``pages_embeddings_store``.
+
+    Index names follow the migrations' with ``pages_embeddings`` replaced by
+    ``destination``, so switching renames them back to the migrations' names.
+    """
+    store = f"{destination}_store"
+    return [
+        f"ALTER TABLE {_ident(store)} ADD COLUMN chunk_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector("
+        f"'{CONFIG.FULL_TEXT_SEARCH_CONFIG}'::regconfig, chunk)) STORED",
+        f"CREATE INDEX {_ident(f'ix_{store}_chunk_tsv')} "
+        f"ON {_ident(store)} USING gin (chunk_tsv)",
+        f"ALTER TABLE {_ident(store)} "
+        "ADD COLUMN seq bigint GENERATED BY DEFAULT AS IDENTITY NOT NULL",
+        f"CREATE INDEX {_ident(f'ix_{store}_seq')} ON {_ident(store)} (seq)",
+        PgCreateVectorIndexOp(
+            f"ix_{destination}_embedding",
+            _ident(store),
+            method=CONFIG.VECTOR_INDEX_METHOD,
+            options=_vector_index_options(),
+            if_not_exists=False,
+        ).to_sql_statement_create(),
+    ]
+
+
+async def create_profile(engine, profile: EmbeddingProfile):
+    """Create the profile's vectorizer; the worker then backfills every page."""
+    async with engine.begin() as connection:
+        if profile.name in await profile_states(connection):
+            raise ValueError(f"Embedding profile {profile.name!r} already exists")
+        await connection.execute(text(profile.create_vectorizer_sql()))
+        for statement in store_extension_statements(profile.destination):
+            await connection.execute(text(statement))
+    logger.info(
+        "created vectorizer %s writing to %s_store",
+        profile.vectorizer_name,
+        profile.destination,
+    )
+
+
+def renamed(name: str, old: str, new: str) -> str | None:
+    """``name`` with the ``old`` destination replaced by ``new``, if it has it."""
+    if old not in name:
+        return None
+    return name.replace(old, new, 1)
+
+
+async def _rename_destination(connection, store: str, view: str, old: str, new: str):
+    indexes = await connection.scalars(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :store"
+        ),
+        {"store": store},
+    )
+    for index in indexes.all():
+        new_index = renamed(index, old, new)
+        if new_index is not None:
+            await connection.execute(
+                text(f"ALTER INDEX {_ident(index)} RENAME TO {_ident(new_index)}")
+            )
+    await connection.execute(
+        text(f"ALTER TABLE {_ident(store)} RENAME TO {_ident(f'{new}_store')}")
+    )
+    await connection.execute(text(f"ALTER VIEW {_ident(view)} RENAME TO {_ident(new)}"))
+
+
+async def _set_destination(connection, vectorizer: str, destination: str):
+    await connection.execute(
+        text(
+            "UPDATE ai.vectorizer SET config = jsonb_set(jsonb_set(config, "
+            "'{destination,target_table}', to_jsonb(CAST(:store AS text))), "
+            "'{destination,view_name}', to_jsonb(CAST(:view AS text))) "
+            "WHERE name = :name"
+        ),
+        {"store": f"{destination}_store", "view": destination, "name": vectorizer},
+    )
+
+
+async def _replace_trigger_function(connection, vectorizer: str):
+    """Regenerate the source trigger, which names the store it deletes from.
+
+    The same statement pgai's upgrade script runs for every vectorizer.
+    """
+    row = (
+        await connection.execute(
+            text(
+                "SELECT queue_schema, trigger_name, "
+                "ai._vectorizer_build_trigger_definition(queue_schema, queue_table, "
+                "config -> 'destination' ->> 'target_schema', "
+                "config -> 'destination' ->> 'target_table', "
+                "source_schema, source_table, source_pk) AS definition "
+                "FROM ai.vectorizer WHERE name = :name"
+            ),
+            {"name": vectorizer},
+        )
+    ).one()
+    # the generated body is passed through verbatim, without bind parsing
+    await connection.exec_driver_sql(
+        f"CREATE OR REPLACE FUNCTION {_ident(row.queue_schema)}."
+        f"{_ident(row.trigger_name)}() RETURNS trigger "
+        f"AS $trigger_def$ {row.definition} $trigger_def$ "
+        "LANGUAGE plpgsql VOLATILE PARALLEL SAFE SECURITY DEFINER "
+        "SET search_path TO pg_catalog, pg_temp"
+    )
+
+
+async def _set_disabled(connection, vectorizer: str, disabled: bool):
+    # these also pause and resume the vectorizer's scheduled job, if it has one
+    if disabled:
+        toggle = func.ai.disable_vectorizer_schedule(vectorizer)
+    else:
+        toggle = func.ai.enable_vectorizer_schedule(vectorizer)
+    await connection.execute(select(toggle))
+
+
+async def check_pgai_internals(connection):
+    """Fail unless the pgai internals the switch relies on are as expected."""
+    version = await installed_pgai_version(connection)
+    if version is None or not version.startswith(SWITCH_PGAI_VERSIONS):
+        raise RuntimeError(
+            f"Switching embedding profiles supports pgai "
+            f"{', '.join(v + 'x' for v in SWITCH_PGAI_VERSIONS)}, "
+            f"the database has {version}"
+        )
+    builder = await connection.scalar(
+        select(func.to_regprocedure(PGAI_TRIGGER_BUILDER))
+    )
+    if builder is None:
+        raise RuntimeError(f"pgai {version} has no {PGAI_TRIGGER_BUILDER}")
+
+
+async def _pending(connection, vectorizer: str) -> int:
+    backlog = await vectorizer_backlog(connection, vectorizer, exact=True)
+    return backlog.pending_items
+
+
+async def switch_profile(
+    engine, profile: EmbeddingProfile, max_pending: int = 0, grace: float = 5.0
+):
+    """Make ``profile`` the one retrieval reads, in a single transaction.
+
+    The outgoing vectorizer is disabled first and the worker is given
+    ``grace`` seconds to finish its current batch, so it cannot write the
+    old chunks into the renamed tables afterwards. It stays disabled while
+    parked; its queue keeps collecting page changes. Switching back to it
+    re-enables it and fails until the worker has caught up.
+    """
+    if profile.evaluation_only:
+        raise ValueError(
+            f"Embedding profile {profile.name!r} is evaluation-only, "
+            "it can be reported on but not switched to"
+        )
+    async with engine.connect() as connection:
+        await check_pgai_internals(connection)
+        states = await profile_states(connection)
+        if profile.name not in states:
+            raise LookupError(f"Embedding profile {profile.name!r} was not created")
+        incoming = states[profile.name]
+        if incoming.active:
+            raise ValueError(f"Embedding profile {profile.name!r} is already active")
+        if incoming.dimensions != EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"Profile {profile.name!r} stores {incoming.dimensions} dimensions "
+                f"but the application is built for {EMBEDDING_DIMENSIONS}"
+            )
+        if incoming.model != CONFIG.OLLAMA_EMBEDDING_MODEL:
+            logger.warning(
+                "profile %s was embedded with %s, queries are embedded with %s",
+                profile.name,
+                incoming.model,
+                CONFIG.OLLAMA_EMBEDDING_MODEL,
+            )
+        if incoming.disabled:
+            await _set_disabled(connection, incoming.vectorizer, False)
+            await connection.commit()
+            logger.info("re-enabled vectorizer %s", incoming.vectorizer)
+        pending = await _pending(connection, incoming.vectorizer)
+        if pending > max_pending:
+            raise RuntimeError(
+                f"Backfill of {profile.name!r} is not complete: {pending} pending"
+            )
+        outgoing = next(state for state in states.values() if state.active)
+        await _set_disabled(connection, outgoing.vectorizer, True)
+        await connection.commit()
+
+    await asyncio.sleep(grace)
+
+    try:
+        async with engine.begin() as connection:
+            await connection.execute(
+                text(f"SET LOCAL lock_timeout = '{SWITCH_LOCK_TIMEOUT}'")
+            )
+            # page writes fire both vectorizers' triggers, hold them back first
+            await connection.execute(
+                text(f"LOCK TABLE {_ident(Page.__tablename__)} IN EXCLUSIVE MODE")
+            )
+            # then wait for in-flight searches and worker batches
+            await connection.execute(
+                text(
+                    f"LOCK TABLE {_ident(outgoing.store)}, {_ident(incoming.store)}, "
+                    f"{outgoing.queue}, {incoming.queue} IN ACCESS EXCLUSIVE MODE"
+                )
+            )
+            pending = await _pending(connection, incoming.vectorizer)
+            if pending > max_pending:
+                raise RuntimeError(
+                    f"Backfill of {profile.name!r} is not complete: {pending} pending"
+                )
+
+            parked = f"{ACTIVE_DESTINATION}_{outgoing.profile}"
+            await _rename_destination(
+                connection, outgoing.store, outgoing.view, ACTIVE_DESTINATION, parked
+            )
+            await _rename_destination(
+                connection,
+                incoming.store,
+                incoming.view,
+                profile.destination,
+                ACTIVE_DESTINATION,
+            )
+            await _set_destination(connection, outgoing.vectorizer, parked)
+            await _set_destination(connection, incoming.vectorizer, ACTIVE_DESTINATION)
+            for vectorizer in (outgoing.vectorizer, incoming.vectorizer):
+                await _replace_trigger_function(connection, vectorizer)
+            # cached answers were built from the outgoing chunks
+            await invalidate_answers(connection)
+    except Exception:
+        async with engine.begin() as connection:
+            await _set_disabled(connection, outgoing.vectorizer, False)
+        raise
+
+    logger.info("switched retrieval from %s to %s", outgoing.profile, profile.name)
+
+
+async def drop_profile(engine, profile: EmbeddingProfile):
+    """Drop an inactive profile's vectorizer, tables and queue."""
+    async with engine.begin() as connection:
+        state = (await profile_states(connection)).get(profile.name)
+        if state is None:
+            raise LookupError(f"Embedding profile {profile.name!r} was not created")
+        if state.active:
+            raise ValueError(f"Embedding profile {profile.name!r} is active")
+        await connection.execute(
+            text("SELECT ai.drop_vectorizer(:name, drop_all => true)"),
+            {"name": state.vectorizer},
+        )
+
+
+@dataclass
+class RecallQuery:
+    question: str
+    page_id: int
+
+
+def sample_sentences(content: str, rng: random.Random) -> str | None:
+    """A random sentence of at least ``MIN_QUERY_WORDS`` words from ``content``."""
+    sentences = [
+        sentence.strip()
+        for sentence in SENTENCE_RE.findall(content)
+        if len(sentence.split()) >= MIN_QUERY_WORDS
+    ]
+    return rng.choice(sentences) if sentences else None
+
+
+async def sample_queries(connection, count: int, seed: int) -> list[RecallQuery]:
+    """One sentence from each of ``count`` random pages, answered by that page.
+
+    A sentence lifted from a page is an easy question, so this ranks profiles
+    rather than predicting the recall of real questions; use
+    ``load_queries`` with labelled questions for that.
+    """
+    rng = random.Random(seed)
+    await connection.execute(select(func.setseed(rng.random() * 2 - 1)))
+    rows = await connection.execute(
+        select(Page.id, Page.content).order_by(func.random()).limit(count)
+    )
+    queries = []
+    for row in rows:
+        sentence = sample_sentences(row.content, rng)
+        if sentence is not None:
+            queries.append(RecallQuery(sentence, row.id))
+    return queries
+
+
+async def load_queries(connection, questions: list[dict]) -> list[RecallQuery]:
+    """``[{"question": ..., "page": <page uuid>}]`` as recall queries."""
+    uuids = {item["page"] for item in questions}
+    rows = await connection.execute(
+        select(Page.uuid, Page.id).where(Page.uuid.in_(uuids))
+    )
+    ids = {str(row.uuid): row.id for row in rows}
+    return [
+        RecallQuery(item["question"], ids[str(item["page"])])
+        for item in questions
+        if str(item["page"]) in ids
+    ]
+
+
+@dataclass
+class ProfileReport:
+    profile: str
+    vectorizer: str
+    active: bool
+    disabled: bool
+    model: str
+    dimensions: int
+    evaluation_only: bool
+    pending_items: int | None
+    pages: int
+    chunks: int
+    chunks_per_page: float
+    table_bytes: int
+    index_bytes: int
+    total_bytes: int
+    recall_at_k: float | None = None
+
+
+def _evaluation_only(state: ProfileState) -> bool:
+    profile = PROFILES.get(state.profile)
+    if profile is not None and profile.evaluation_only:
+        return True
+    return state.dimensions != EMBEDDING_DIMENSIONS
+
+
+async def storage_report(connection, state: ProfileState) -> ProfileReport:
+    row = (
+        await connection.execute(
+            text(
+                "SELECT count(*) AS chunks, count(DISTINCT id) AS pages, "
+                "pg_table_size(CAST(:store AS regclass)) AS table_bytes, "
+                "pg_indexes_size(CAST(:store AS regclass)) AS index_bytes "
+                f"FROM {_ident(state.store)}"
+            ),
+            {"store": state.store},
+        )
+    ).one()
+    backlog = await vectorizer_backlog(connection, state.vectorizer)
+    return ProfileReport(
+        profile=state.profile,
+        vectorizer=state.vectorizer,
+        active=state.active,
+        disabled=state.disabled,
+        model=state.model,
+        dimensions=state.dimensions,
+        evaluation_only=_evaluation_only(state),
+        pending_items=backlog.pending_items,
+        pages=row.pages,
+        chunks=row.chunks,
+        chunks_per_page=round(row.chunks / row.pages, 2) if row.pages else 0.0,
+        table_bytes=row.table_bytes,
+        index_bytes=row.index_bytes,
+        total_bytes=row.table_bytes + row.index_bytes,
+    )
+
+
+async def measure_recall(
+    connection, state: ProfileState, queries: list[RecallQuery], k: int
+) -> float | None:
+    """Share of queries whose page is among the pages of the ``k`` nearest
+    chunks, the chunks a chat would retrieve."""
+    if not queries:
+        return None
+
+    llm = get_llm_client()
+    hits = 0
+    for start in range(0, len(queries), QUERY_EMBED_BATCH_SIZE):
+        batch = queries[start : start + QUERY_EMBED_BATCH_SIZE]
+        embeddings = await llm.embed(state.model, [query.question for query in batch])
+        for query, embedding in zip(batch, embeddings):
+            page_ids = await connection.scalars(
+                text(
+                    f"SELECT id FROM {_ident(state.store)} "
+                    "ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k"
+                ),
+                {"embedding": str(embedding), "k": k},
+            )
+            hits += query.page_id in set(page_ids.all())
+    return round(hits / len(queries), 4)
+
+
+async def profile_report(
+    engine, queries: list[dict] | None, sample: int, k: int, seed: int = 0
+) -> list[ProfileReport]:
+    """Storage and recall of every created profile, active one first."""
+    async with engine.connect() as connection:
+        states = await profile_states(connection)
+        if queries is None:
+            recall_queries = await sample_queries(connection, sample, seed)
+        else:
+            recall_queries = await load_queries(connection, queries)
+
+        reports = []
+        for state in sorted(states.values(), key=lambda state: not state.active):
+            report = await storage_report(connection, state)
+            report.recall_at_k = await measure_recall(
+                connection, state, recall_queries, k
+            )
+            reports.append(report)
+    return reports
+
+
+def cheapest_meeting_target(
+    reports: list[ProfileReport], recall_target: float
+) -> ProfileReport | None:
+    """The smallest fully backfilled profile with at least ``recall_target``
+    that can be switched to."""
+    candidates = [
+        report
+        for report in reports
+        if not report.evaluation_only
+        and report.pending_items == 0
+        and report.recall_at_k is not None
+        and report.recall_at_k >= recall_target
+    ]
+    return min(candidates, key=lambda report: report.total_bytes, default=None)
@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Protocol
+
+from app.common.llm import get_llm_client
+from app.common.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_WAIT
+from app.common.models import EMBEDDING_DIMENSIONS
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend(Protocol):
+    async def embed(self, model: str, texts: list[str]) -> list[list[float]]: ...
+
+
+class LocalEmbeddingBackend:
+    """Embeds texts in-process on CPU with a sentence-transformers model.
+
+    The model is loaded once per worker. Each call encodes its texts as one
+    batch on a dedicated thread pool, so inference neither blocks the event
+    loop nor competes with other ``asyncio.to_thread`` work. ``threads``
+    bounds concurrent batches; torch already parallelizes within one.
+    """
+
+    def __init__(self, encoder, batch_size: int, query_prefix: str, threads: int):
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.query_prefix = query_prefix
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="embedding"
+        )
+
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_name: str,
+        runtime: str,
+        batch_size: int,
+        query_prefix: str,
+        threads: int,
+        trust_remote_code: bool = False,
+    ) -> "LocalEmbeddingBackend":
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=local needs the sentence-transformers package, "
+                "install the local-embeddings extra: "
+                "uv sync --extra local-embeddings"
+            ) from exc
+
+        encoder = SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend=runtime,
+            trust_remote_code=trust_remote_code,
+        )
+        dimensions = encoder.get_sentence_embedding_dimension()
+        if dimensions != EMBEDDING_DIMENSIONS:
+            raise RuntimeError(
+                f"{model_name} produces {dimensions} dimensions, "
+                f"the stored embeddings have {EMBEDDING_DIMENSIONS}"
+            )
+        return cls(encoder, batch_size, query_prefix, threads)
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.encoder.encode(
+            [self.query_prefix + text for text in texts],
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            # Ollama returns unit vectors too
+            normalize_embeddings=True,
+        )
+        return vectors.tolist()
+
+    async def embed(self, model: str, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._encode, texts)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used for embedding and as cache key."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """Bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, list[float]]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: list[float]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embeddings into batched calls.
+
+    Texts are queued for at most ``max_wait`` seconds, or until
+    ``max_batch_size`` texts are waiting, then sent to the backend in one
+    call. Each caller gets its own embedding back.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        model: str,
+        max_batch_size: int,
+        max_wait: float,
+    ):
+        self.backend = backend
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((text, future, time.perf_counter()))
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        # keep a reference until done, the loop only holds weak ones
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future, float]]):
+        sent_at = time.perf_counter()
+        EMBEDDING_BATCH_SIZE.observe(len(batch))
+        for _, _, queued_at in batch:
+            EMBEDDING_QUEUE_WAIT.observe(sent_at - queued_at)
+
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            embeddings = await self.backend.embed(self.model, texts)
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        by_text = dict(zip(texts, embeddings))
+        for text, future, _ in batch:
+            # callers that were cancelled meanwhile have a done future
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+class EmbeddingService:
+    """Computes query embeddings in the application instead of the database.
+
+    Repeated queries are served from an in-process cache keyed by
+    ``(model, normalized text)``, and concurrent misses for the same key share
+    one upstream call.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        model: str,
+        cache: EmbeddingCache,
+        batcher: EmbeddingBatcher | None = None,
+    ):
+        self.backend = backend
+        self.model = model
+        self.cache = cache
+        self.batcher = batcher
+        self._pending: dict[tuple, asyncio.Task] = {}
+
+    async def embed_query(self, text: str) -> list[float]:
+        normalized = normalize_query(text)
+        key = (self.model, normalized)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._pending.get(key)
+        if task is None:
+            # the upstream call runs detached, so a cancelled caller (e.g. a
+            # disconnected client) does not fail the others sharing it
+            task = asyncio.create_task(self._fetch(key, normalized))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: tuple, normalized: str) -> list[float]:
+        if self.batcher is not None:
+            embedding = await self.batcher.embed(normalized)
+        else:
+            [embedding] = await self.backend.embed(self.model, [normalized])
+        self.cache.set(key, embedding)
+        return embedding
+
+    def _forget(self, key: tuple, task: asyncio.Task):
+        del self._pending[key]
+        if not task.cancelled():
+            # retrieved here in case every caller was cancelled meanwhile
+            task.exception()
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed several queries, fetching every cache miss in a single call."""
+        normalized = [normalize_query(text) for text in texts]
+        embeddings = {}
+        missing = []
+        for text in dict.fromkeys(normalized):
+            cached = self.cache.get((self.model, text))
+            if cached is None:
+                missing.append(text)
+            else:
+                embeddings[text] = cached
+
+        if missing:
+            fetched = await self.backend.embed(self.model, missing)
+            for text, embedding in zip(missing, fetched):
+                self.cache.set((self.model, text), embedding)
+                embeddings[text] = embedding
+
+        return [embeddings[text] for text in normalized]
+
+
+def _ollama_model_name(name: str) -> str:
+    return name.removesuffix(":latest")
+
+
+def check_local_model_matches(equivalent: str, vectorizer_model: str):
+    """Refuse a local model that does not reproduce the vectorizer's vectors.
+
+    Only queries are embedded locally, page chunks are still embedded by the
+    pgai vectorizer through Ollama. ``equivalent`` is the Ollama model the
+    local model is known to match, it must be the one the vectorizer uses.
+    """
+    if _ollama_model_name(equivalent) != _ollama_model_name(vectorizer_model):
+        raise RuntimeError(
+            f"EMBEDDING_BACKEND=local matches the Ollama model {equivalent!r}, "
+            f"but pages are embedded with {vectorizer_model!r}; set "
+            "LOCAL_EMBEDDING_MODEL and LOCAL_EMBEDDING_OLLAMA_MODEL to the "
+            "vectorizer's model"
+        )
+
+
+@lru_cache
+def get_embedding_backend() -> EmbeddingBackend:
+    if CONFIG.EMBEDDING_BACKEND == "local":
+        check_local_model_matches(
+            CONFIG.LOCAL_EMBEDDING_OLLAMA_MODEL, CONFIG.OLLAMA_EMBEDDING_MODEL
+        )
+        return LocalEmbeddingBackend.from_pretrained(
+            CONFIG.LOCAL_EMBEDDING_MODEL,
+            CONFIG.LOCAL_EMBEDDING_RUNTIME,
+            CONFIG.LOCAL_EMBEDDING_BATCH_SIZE,
+            CONFIG.LOCAL_EMBEDDING_QUERY_PREFIX,
+            CONFIG.LOCAL_EMBEDDING_THREADS,
+            CONFIG.LOCAL_EMBEDDING_TRUST_REMOTE_CODE,
+        )
+    return get_llm_client()
+
+
+def embedding_model_name() -> str:
+    if CONFIG.EMBEDDING_BACKEND == "local":
+        return CONFIG.LOCAL_EMBEDDING_MODEL
+    return CONFIG.OLLAMA_EMBEDDING_MODEL
+
+
+@lru_cache
+def get_embedding_service() -> EmbeddingService:
+    backend = get_embedding_backend()
+    model = embedding_model_name()
+    batcher = None
+    if CONFIG.EMBEDDING_BATCHING:
+        batcher = EmbeddingBatcher(
+            backend,
+            model,
+            CONFIG.EMBEDDING_BATCH_MAX_SIZE,
+            CONFIG.EMBEDDING_BATCH_MAX_WAIT,
+        )
+    return EmbeddingService(
+        backend,
+        model,
+        EmbeddingCache(CONFIG.EMBEDDING_CACHE_SIZE, CONFIG.EMBEDDING_CACHE_TTL),
+        batcher,
+    )
+
+
+async def close_embedding_backend():
+    if (
+        CONFIG.EMBEDDING_BACKEND == "local"
+        and get_embedding_backend.cache_info().currsize
+    ):
+        await get_embedding_backend().close()
+        get_embedding_backend.cache_clear()
+        get_embedding_service.cache_clear()
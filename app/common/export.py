@@ -0,0 +1,134 @@
+"""Streaming snapshot of pages and their embeddings.
+
+Rows are read through a server-side cursor and written out as they arrive,
+so memory use does not depend on the size of the corpus. Two formats are
+supported:
+
+``ndjson``
+    One JSON object per line. Pages have ``"type": "page"``, chunks have
+    ``"type": "embedding"`` with the vector as base64 of little-endian float32
+    bytes.
+
+``binary``
+    The magic ``PGAIEXP1`` followed by the vector dimensions as uint32, then
+    one frame per record: a type byte (``P`` or ``E``), the length of the JSON
+    metadata as uint32, the metadata, and for embeddings the raw little-endian
+    float32 vector. All integers are little-endian.
+"""
+
+import json
+import struct
+from base64 import b64encode
+from collections.abc import AsyncIterator
+from enum import Enum
+
+import numpy as np
+from sqlalchemy import select
+
+from app.common.models import EMBEDDING_DIMENSIONS, Page
+from config import CONFIG
+
+BINARY_MAGIC = b"PGAIEXP1"
+PAGE_RECORD = b"P"
+EMBEDDING_RECORD = b"E"
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    BINARY = "binary"
+
+    @property
+    def media_type(self) -> str:
+        if self is ExportFormat.NDJSON:
+            return "application/x-ndjson"
+        return "application/octet-stream"
+
+
+def vector_to_bytes(vector) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+async def _stream_rows(session, stmt):
+    result = await session.stream(
+        stmt.execution_options(yield_per=CONFIG.EXPORT_BATCH_SIZE)
+    )
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+async def iter_export_records(
+    session, include_embeddings: bool = True
+) -> AsyncIterator[tuple[bytes, dict, bytes | None]]:
+    """Yield ``(record type, metadata, vector bytes)`` for pages, then chunks."""
+    pages = select(
+        Page.id, Page.uuid, Page.title, Page.content, Page.created_at, Page.updated_at
+    ).order_by(Page.id)
+    async for row in _stream_rows(session, pages):
+        metadata = row._asdict()
+        metadata["uuid"] = str(metadata["uuid"])
+        metadata["created_at"] = metadata["created_at"].isoformat()
+        metadata["updated_at"] = metadata["updated_at"].isoformat()
+        yield PAGE_RECORD, metadata, None
+
+    if not include_embeddings:
+        return
+
+    embeddings_model = Page.content_embeddings
+    chunks = select(
+        embeddings_model.id,
+        embeddings_model.chunk_seq,
+        embeddings_model.chunk,
+        embeddings_model.embedding,
+    ).order_by(embeddings_model.id, embeddings_model.chunk_seq)
+    async for row in _stream_rows(session, chunks):
+        metadata = {"page_id": row.id, "chunk_seq": row.chunk_seq, "chunk": row.chunk}
+        yield EMBEDDING_RECORD, metadata, vector_to_bytes(row.embedding)
+
+
+async def export_ndjson(session, include_embeddings: bool = True):
+    async for record_type, metadata, vector in iter_export_records(
+        session, include_embeddings
+    ):
+        if record_type == PAGE_RECORD:
+            record = {"type": "page", **metadata}
+        else:
+            record = {
+                "type": "embedding",
+                **metadata,
+                "embedding": b64encode(vector).decode(),
+            }
+        yield (json.dumps(record) + "\n").encode()
+
+
+async def export_binary(session, include_embeddings: bool = True):
+    yield BINARY_MAGIC + struct.pack("<I", EMBEDDING_DIMENSIONS)
+    async for record_type, metadata, vector in iter_export_records(
+        session, include_embeddings
+    ):
+        encoded = json.dumps(metadata).encode()
+        yield record_type + struct.pack("<I", len(encoded)) + encoded + (vector or b"")
+
+
+def export_pages(
+    session, export_format: ExportFormat, include_embeddings: bool = True
+) -> AsyncIterator[bytes]:
+    if export_format is ExportFormat.BINARY:
+        return export_binary(session, include_embeddings)
+    return export_ndjson(session, include_embeddings)
+
+
+def read_binary_export(stream):
+    """Parse a binary export from a file object into ``(type, metadata, vector)``."""
+    header = stream.read(len(BINARY_MAGIC) + 4)
+    if header[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Not a binary page export")
+    (dimensions,) = struct.unpack("<I", header[len(BINARY_MAGIC) :])
+
+    while record_type := stream.read(1):
+        (length,) = struct.unpack("<I", stream.read(4))
+        metadata = json.loads(stream.read(length))
+        vector = None
+        if record_type == EMBEDDING_RECORD:
+            vector = np.frombuffer(stream.read(dimensions * 4), dtype="<f4")
+        yield record_type, metadata, vector
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import aclosing, asynccontextmanager
+from functools import lru_cache
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException
+
+from app.common.metrics import observe_stage, record_generation
+from config import CONFIG
+
+if TYPE_CHECKING:
+    import ollama
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClient:
+    """Pooled async Ollama client shared by every request of a worker.
+
+    Calls towards Ollama are bounded by a semaphore so a burst of chats queues
+    here instead of piling up on the model server, and each call runs under a
+    deadline so a stuck generation cannot hold a slot forever.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_concurrency: int,
+        request_timeout: float,
+        queue_timeout: float,
+        max_connections: int,
+        stream_idle_timeout: float | None = None,
+    ):
+        # ollama and httpx take a noticeable part of the import time, load them
+        # with the first client instead of when a worker boots
+        import httpx
+        import ollama
+
+        self.request_timeout = request_timeout
+        self.queue_timeout = queue_timeout
+        self.stream_idle_timeout = (
+            request_timeout if stream_idle_timeout is None else stream_idle_timeout
+        )
+        self._timeout_errors = (TimeoutError, httpx.TimeoutException)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # ollama has no public way to close its httpx client, so the pool is
+        # created, and closed, here and handed to it as the transport
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+        )
+        self._client = ollama.AsyncClient(
+            host=host,
+            timeout=httpx.Timeout(request_timeout, connect=5.0),
+            transport=self._transport,
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrency slots for the duration of the block."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except TimeoutError as exc:
+            logger.warning("no free model slot after %ss", self.queue_timeout)
+            raise HTTPException(
+                HTTPStatus.SERVICE_UNAVAILABLE, "Model is busy, try again later"
+            ) from exc
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def chat(self, model: str, messages, **kwargs) -> "ollama.ChatResponse":
+        async with self.slot():
+            try:
+                with observe_stage("generation"):
+                    async with asyncio.timeout(self.request_timeout):
+                        response = await self._client.chat(
+                            model=model, messages=messages, **kwargs
+                        )
+            except self._timeout_errors as exc:
+                logger.warning("model %s timed out", model)
+                raise HTTPException(
+                    HTTPStatus.GATEWAY_TIMEOUT, "Model request timed out"
+                ) from exc
+
+        record_generation(model, response)
+        return response
+
+    async def chat_stream(
+        self, model: str, messages, **kwargs
+    ) -> AsyncIterator["ollama.ChatResponse"]:
+        """Yield response parts as the model produces them.
+
+        Opening the stream and the first part must arrive within
+        ``request_timeout``, every later part within ``stream_idle_timeout``
+        of the previous one. Time spent by the consumer between parts (a slow
+        client) does not count against either deadline.
+
+        The part with ``done`` set is yielded after the upstream stream is
+        closed, the concurrency slot released and the generation timer
+        stopped, so a client slow to read the end of the answer neither holds
+        a slot nor inflates the generation metric.
+
+        Closing the generator early (e.g. when the client disconnects) closes
+        the upstream HTTP stream, which makes Ollama stop generating.
+        """
+        final = None
+        async with self.slot():
+            with observe_stage("generation"):
+                loop = asyncio.get_running_loop()
+                first_part_deadline = loop.time() + self.request_timeout
+                async with self._stream_deadline(model, first_part_deadline):
+                    stream = await self._client.chat(
+                        model=model, messages=messages, stream=True, **kwargs
+                    )
+                async with aclosing(stream):
+                    deadline = first_part_deadline
+                    while True:
+                        async with self._stream_deadline(model, deadline):
+                            try:
+                                part = await stream.__anext__()
+                            except StopAsyncIteration:
+                                break
+                        deadline = loop.time() + self.stream_idle_timeout
+                        # only the final part carries eval counts
+                        record_generation(model, part)
+                        if part.done:
+                            final = part
+                            break
+                        yield part
+        if final is not None:
+            yield final
+
+    @asynccontextmanager
+    async def _stream_deadline(self, model: str, deadline: float):
+        """Run the block before ``deadline`` (loop time) or fail with 504."""
+        try:
+            async with asyncio.timeout_at(deadline):
+                yield
+        except self._timeout_errors as exc:
+            logger.warning("model %s timed out while streaming", model)
+            raise HTTPException(
+                HTTPStatus.GATEWAY_TIMEOUT, "Model request timed out"
+            ) from exc
+
+    async def embed(self, model: str, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in one call.
+
+        Embeddings are cheap compared to generation, so they do not take a
+        generation slot; the HTTP connection pool bounds them instead.
+        """
+        try:
+            async with asyncio.timeout(self.request_timeout):
+                response = await self._client.embed(model=model, input=texts)
+        except self._timeout_errors as exc:
+            logger.warning("embedding model %s timed out", model)
+            raise HTTPException(
+                HTTPStatus.GATEWAY_TIMEOUT, "Embedding request timed out"
+            ) from exc
+        return [list(embedding) for embedding in response.embeddings]
+
+    async def close(self):
+        await self._transport.aclose()
+
+
+@lru_cache
+def get_llm_client() -> LLMClient:
+    return LLMClient(
+        host=CONFIG.OLLAMA_HOST,
+        max_concurrency=CONFIG.OLLAMA_MAX_CONCURRENCY,
+        request_timeout=CONFIG.OLLAMA_REQUEST_TIMEOUT,
+        queue_timeout=CONFIG.OLLAMA_QUEUE_TIMEOUT,
+        max_connections=CONFIG.OLLAMA_MAX_CONNECTIONS,
+        stream_idle_timeout=CONFIG.OLLAMA_STREAM_IDLE_TIMEOUT,
+    )
+
+
+async def close_llm_client():
+    if get_llm_client.cache_info().currsize:
+        await get_llm_client().close()
+        get_llm_client.cache_clear()
@@ -0,0 +1,477 @@
+"""In-process vector search over a memory-mapped snapshot of the chunks.
+
+With ``RETRIEVAL_BACKEND=memory``, vector retrieval scans every chunk
+embedding with a single matrix product instead of querying Postgres. For a
+few hundred thousand chunks, this is faster than the database round trip.
+
+The chunks are kept in a snapshot under ``MEMORY_INDEX_DIR``:
+
+- the unit-length embeddings as one contiguous float32 ``.npy`` matrix,
+- the chunk ids, page ids and insertion sequence numbers,
+- the chunk texts and page titles as UTF-8 blobs with offset arrays.
+
+Every file is memory-mapped read-only, so all gunicorn workers on a host
+share the same page cache. Each worker polls ``pages_embeddings_store`` for
+rows with a ``seq`` above its high-water mark. When a page has new chunks,
+its rows are replaced in a small in-memory delta. Every
+``MEMORY_INDEX_REBUILD_INTERVAL`` seconds one worker writes a new snapshot,
+which also drops the chunks of deleted pages, and the others remap it.
+Postgres stays the source of truth: a missing snapshot is rebuilt from it,
+and until one is loaded the queries go to Postgres.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import shutil
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.common.models import EMBEDDING_DIMENSIONS, EMBEDDINGS_STORE, Page
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+
+
+@dataclass(frozen=True)
+class ChunkRow:
+    seq: int
+    chunk_id: UUID
+    page_id: int
+    title: str
+    chunk: str
+    embedding: Sequence[float]
+
+
+def chunk_rows_query():
+    store = EMBEDDINGS_STORE
+    return (
+        select(
+            store.c.seq,
+            store.c.embedding_uuid,
+            store.c.id,
+            Page.title,
+            store.c.chunk,
+            store.c.embedding,
+        )
+        .join(Page, Page.id == store.c.id)
+        .order_by(store.c.seq)
+    )
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SnapshotWriter:
+    """Writes one snapshot generation; readers see it after ``commit()``."""
+
+    def __init__(self, directory: Path, rows: int):
+        self.directory = directory
+        self.generation = str(time.time_ns())
+        self.path = directory / self.generation
+        self.path.mkdir(parents=True)
+        self.rows = rows
+        self.vectors = np.lib.format.open_memmap(
+            self.path / "vectors.npy",
+            mode="w+",
+            dtype=np.float32,
+            shape=(rows, EMBEDDING_DIMENSIONS),
+        )
+        self.seqs = np.zeros(rows, dtype=np.int64)
+        self.page_ids = np.zeros(rows, dtype=np.int64)
+        self.chunk_ids = np.zeros((rows, 16), dtype=np.uint8)
+        self.chunks = _BlobWriter(self.path / "chunks.bin", rows)
+        self.titles = _BlobWriter(self.path / "titles.bin", rows)
+        self.written = 0
+
+    def add(self, rows: Iterable[ChunkRow]):
+        for row in rows:
+            index = self.written
+            self.vectors[index] = _unit(row.embedding)
+            self.seqs[index] = row.seq
+            self.page_ids[index] = row.page_id
+            self.chunk_ids[index] = np.frombuffer(
+                UUID(str(row.chunk_id)).bytes, dtype=np.uint8
+            )
+            self.chunks.add(row.chunk)
+            self.titles.add(row.title)
+            self.written += 1
+
+    def commit(self) -> Path:
+        if self.written != self.rows:
+            raise ValueError(f"expected {self.rows} rows, got {self.written}")
+
+        self.vectors.flush()
+        del self.vectors
+        np.save(self.path / "seqs.npy", self.seqs)
+        np.save(self.path / "page_ids.npy", self.page_ids)
+        np.save(self.path / "chunk_ids.npy", self.chunk_ids)
+        self.chunks.close()
+        self.titles.close()
+        high_water_mark = int(self.seqs.max()) if self.rows else 0
+        (self.path / "meta.json").write_text(
+            json.dumps(
+                {
+                    "rows": self.rows,
+                    "high_water_mark": high_water_mark,
+                    "created_at": time.time(),
+                }
+            )
+        )
+
+        # switch readers over in one rename, then drop older generations;
+        # workers still mapping them keep their open files until they remap
+        pointer = self.directory / f"{CURRENT_FILE}.tmp"
+        pointer.write_text(self.generation)
+        pointer.replace(self.directory / CURRENT_FILE)
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name != self.generation:
+                shutil.rmtree(path, ignore_errors=True)
+        return self.path
+
+
+class _BlobWriter:
+    def __init__(self, path: Path, rows: int):
+        self.path = path
+        self.file = open(path, "wb")
+        self.offsets = np.zeros(rows + 1, dtype=np.int64)
+        self.count = 0
+
+    def add(self, text: str):
+        data = text.encode()
+        self.file.write(data)
+        self.offsets[self.count + 1] = self.offsets[self.count] + len(data)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        np.save(self.path.with_suffix(".offsets.npy"), self.offsets)
+
+
+class _Blob:
+    def __init__(self, path: Path):
+        self.offsets = np.load(path.with_suffix(".offsets.npy"), mmap_mode="r")
+        # np.memmap cannot map an empty file
+        self.data = (
+            np.memmap(path, dtype=np.uint8, mode="r")
+            if path.stat().st_size
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode()
+
+
+@dataclass
+class _Snapshot:
+    generation: str
+    created_at: float
+    high_water_mark: int
+    vectors: np.ndarray
+    seqs: np.ndarray
+    page_ids: np.ndarray
+    chunk_ids: np.ndarray
+    chunks: _Blob
+    titles: _Blob
+
+    @classmethod
+    def load(cls, path: Path) -> "_Snapshot":
+        meta = json.loads((path / "meta.json").read_text())
+        return cls(
+            generation=path.name,
+            created_at=meta["created_at"],
+            high_water_mark=meta["high_water_mark"],
+            vectors=np.load(path / "vectors.npy", mmap_mode="r"),
+            seqs=np.load(path / "seqs.npy", mmap_mode="r"),
+            page_ids=np.load(path / "page_ids.npy", mmap_mode="r"),
+            chunk_ids=np.load(path / "chunk_ids.npy", mmap_mode="r"),
+            chunks=_Blob(path / "chunks.bin"),
+            titles=_Blob(path / "titles.bin"),
+        )
+
+
+@dataclass(frozen=True)
+class _Delta:
+    """Per-worker changes on top of the snapshot, replaced as a whole."""
+
+    alive: np.ndarray | None = None
+    pages: dict[int, tuple[ChunkRow, ...]] = field(default_factory=dict)
+    rows: tuple[ChunkRow, ...] = ()
+    vectors: np.ndarray = field(
+        default_factory=lambda: np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    )
+    seqs: frozenset[int] = frozenset()
+
+
+class MemoryVectorIndex:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.high_water_mark = 0
+        # the snapshot and its delta are swapped together in one assignment,
+        # so searches running in other threads always see a matching pair
+        self._state: tuple[_Snapshot | None, _Delta] = (None, _Delta())
+
+    @property
+    def ready(self) -> bool:
+        return self._state[0] is not None
+
+    def current_generation(self) -> str | None:
+        try:
+            return (self.directory / CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            return None
+
+    def snapshot_age(self) -> float | None:
+        """Seconds since the loaded snapshot was written, None if none is."""
+        snapshot = self._state[0]
+        if snapshot is None:
+            return None
+        return time.time() - snapshot.created_at
+
+    def load(self) -> bool:
+        """Map the current snapshot if it changed; True if one was mapped."""
+        generation = self.current_generation()
+        current = self._state[0]
+        if generation is None or (
+            current is not None and current.generation == generation
+        ):
+            return False
+
+        snapshot = _Snapshot.load(self.directory / generation)
+        self._state = (snapshot, _Delta())
+        self.high_water_mark = snapshot.high_water_mark
+        logger.info(
+            "loaded vector snapshot %s with %s chunks",
+            generation,
+            snapshot.vectors.shape[0],
+        )
+        return True
+
+    def unknown_seqs(self, seqs: np.ndarray) -> np.ndarray:
+        """Mask of the ``seqs`` neither in the snapshot nor in the delta."""
+        snapshot, delta = self._state
+        known = np.isin(seqs, np.fromiter(delta.seqs, dtype=np.int64))
+        if snapshot is not None and len(snapshot.seqs):
+            # snapshot rows are written in seq order
+            positions = np.searchsorted(snapshot.seqs, seqs)
+            positions = np.minimum(positions, len(snapshot.seqs) - 1)
+            known |= snapshot.seqs[positions] == seqs
+        return ~known
+
+    def replace_pages(self, page_ids: Iterable[int], rows: Iterable[ChunkRow]):
+        """Make ``rows`` the only chunks of ``page_ids``."""
+        snapshot, delta = self._state
+        page_ids = set(page_ids)
+        pages = {
+            page_id: chunks
+            for page_id, chunks in delta.pages.items()
+            if page_id not in page_ids
+        }
+        replaced: dict[int, list[ChunkRow]] = {}
+        for row in rows:
+            replaced.setdefault(row.page_id, []).append(row)
+        pages.update((page_id, tuple(chunks)) for page_id, chunks in replaced.items())
+
+        alive = delta.alive
+        if snapshot is not None and len(snapshot.page_ids):
+            stale = np.isin(snapshot.page_ids, list(page_ids))
+            if stale.any():
+                alive = (np.ones(len(stale), bool) if alive is None else alive) & ~stale
+
+        delta_rows = tuple(row for chunks in pages.values() for row in chunks)
+        vectors = (
+            np.stack([_unit(row.embedding) for row in delta_rows])
+            if delta_rows
+            else np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        )
+        self._state = (
+            snapshot,
+            _Delta(
+                alive=alive,
+                pages=pages,
+                rows=delta_rows,
+                vectors=vectors,
+                seqs=frozenset(row.seq for row in delta_rows),
+            ),
+        )
+
+    def search(
+        self, query_embedding: list[float], limit: int, similarity_threshold: float
+    ) -> list[tuple]:
+        """Top ``limit`` chunks by cosine distance, closer than the threshold.
+
+        Rows are ``(chunk_id, page_id, title, chunk, distance)``, the columns
+        of the Postgres vector search.
+        """
+        snapshot, delta = self._state
+        if snapshot is None:
+            raise RuntimeError("the vector snapshot is not loaded")
+
+        query = _unit(query_embedding)
+        scores = snapshot.vectors @ query
+        if delta.alive is not None:
+            scores = np.where(delta.alive, scores, -np.inf)
+        if delta.rows:
+            scores = np.concatenate([scores, delta.vectors @ query])
+
+        k = min(limit, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        base_rows = snapshot.vectors.shape[0]
+        results = []
+        for index in top:
+            distance = 1.0 - float(scores[index])
+            if not distance < similarity_threshold:
+                break
+            if index < base_rows:
+                results.append(
+                    (
+                        UUID(bytes=snapshot.chunk_ids[index].tobytes()),
+                        int(snapshot.page_ids[index]),
+                        snapshot.titles[index],
+                        snapshot.chunks[index],
+                        distance,
+                    )
+                )
+            else:
+                row = delta.rows[index - base_rows]
+                results.append(
+                    (row.chunk_id, row.page_id, row.title, row.chunk, distance)
+                )
+        return results
+
+
+async def build_snapshot(engine, directory: Path) -> Path:
+    """Write a new snapshot of every chunk, read in one consistent transaction."""
+    directory.mkdir(parents=True, exist_ok=True)
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(
+            isolation_level="REPEATABLE READ"
+        )
+        async with connection.begin():
+            rows = await connection.scalar(
+                select(func.count()).select_from(
+                    chunk_rows_query().order_by(None).subquery()
+                )
+            )
+            writer = SnapshotWriter(directory, rows)
+            result = await connection.stream(chunk_rows_query())
+            async for partition in result.partitions(1000):
+                # copying into the memory map is blocking, keep it off the loop
+                await asyncio.to_thread(
+                    writer.add, [ChunkRow(*row) for row in partition]
+                )
+    path = await asyncio.to_thread(writer.commit)
+    logger.info("wrote vector snapshot %s with %s chunks", path.name, rows)
+    return path
+
+
+async def maybe_rebuild_snapshot(index: MemoryVectorIndex, engine, max_age: float):
+    """Rebuild a missing or stale snapshot, in one worker at a time."""
+    index.load()
+    age = index.snapshot_age()
+    if age is not None and age < max_age:
+        return
+
+    index.directory.mkdir(parents=True, exist_ok=True)
+    with open(index.directory / LOCK_FILE, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # another worker is writing it, pick it up on a later poll
+            return
+        try:
+            # it may have been rebuilt while this worker was checking
+            index.load()
+            age = index.snapshot_age()
+            if age is None or age >= max_age:
+                await build_snapshot(engine, index.directory)
+                index.load()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+async def refresh_memory_index(index: MemoryVectorIndex, engine, overlap: int):
+    """Apply the chunks inserted since the high-water mark.
+
+    Sequence values are allocated before commit, so rows up to ``overlap``
+    below the mark are checked again for late commits; only pages with
+    unseen rows are reloaded.
+    """
+    store = EMBEDDINGS_STORE
+    async with engine.connect() as connection:
+        recent = (
+            await connection.execute(
+                select(store.c.id, store.c.seq).where(
+                    store.c.seq > index.high_water_mark - overlap
+                )
+            )
+        ).all()
+        if not recent:
+            return
+
+        page_ids = np.array([row.id for row in recent], dtype=np.int64)
+        seqs = np.array([row.seq for row in recent], dtype=np.int64)
+        changed = {int(page_id) for page_id in page_ids[index.unknown_seqs(seqs)]}
+        if changed:
+            rows = await connection.execute(
+                chunk_rows_query().where(store.c.id.in_(changed))
+            )
+            index.replace_pages(changed, [ChunkRow(*row) for row in rows])
+            logger.debug("reloaded the chunks of %s pages", len(changed))
+
+    index.high_water_mark = max(index.high_water_mark, int(seqs.max()))
+
+
+async def keep_memory_index_fresh(
+    index: MemoryVectorIndex,
+    engine,
+    poll_interval: float,
+    rebuild_interval: float,
+    overlap: int,
+):
+    while True:
+        try:
+            await maybe_rebuild_snapshot(index, engine, rebuild_interval)
+            if index.ready:
+                await refresh_memory_index(index, engine, overlap)
+        except Exception:
+            logger.exception("failed to refresh the in-memory vector index")
+        await asyncio.sleep(poll_interval)
+
+
+@lru_cache
+def get_memory_index() -> MemoryVectorIndex:
+    return MemoryVectorIndex(Path(CONFIG.MEMORY_INDEX_DIR))
+
+
+def start_memory_index_refresher(engine) -> asyncio.Task | None:
+    if CONFIG.RETRIEVAL_BACKEND != "memory":
+        return None
+    return asyncio.create_task(
+        keep_memory_index_fresh(
+            get_memory_index(),
+            engine,
+            CONFIG.MEMORY_INDEX_POLL_INTERVAL,
+            CONFIG.MEMORY_INDEX_REBUILD_INTERVAL,
+            CONFIG.MEMORY_INDEX_SEQ_OVERLAP,
+        )
+    )
@@ -0,0 +1,169 @@
+"""Prometheus metrics.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (see ``start.sh``) every gunicorn
+worker writes its samples to that directory and ``/metrics`` aggregates them,
+so a scrape sees the whole server rather than whichever worker answered.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the last body byte is sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+RAG_STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of each retrieval augmented generation stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_GENERATED_TOKENS = Counter(
+    "llm_generated_tokens_total", "Tokens generated by the model", ["model"]
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration)",
+    ["model"],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400),
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Query embeddings sent to Ollama per batched call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "embedding_queue_wait_seconds",
+    "Time a query embedding waited for its batch to be sent",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_OVERFLOW_EVENTS = Counter(
+    "db_pool_overflow_events_total", "Connections opened beyond the pool size"
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that timed out waiting for a connection"
+)
+
+# every worker polls the same queue, so the freshest reading is the right one
+VECTORIZER_PENDING_ITEMS = Gauge(
+    "vectorizer_pending_items",
+    "Items waiting in the vectorizer queue, 10001 meaning more than 10000",
+    ["vectorizer"],
+    multiprocess_mode="livemostrecent",
+)
+VECTORIZER_FAILED_ITEMS = Gauge(
+    "vectorizer_failed_items",
+    "Items moved to the vectorizer's failed queue after exhausting retries",
+    ["vectorizer"],
+    multiprocess_mode="livemostrecent",
+)
+VECTORIZER_LAG_SECONDS = Gauge(
+    "vectorizer_lag_seconds",
+    "Age of the oldest item in the vectorizer queue",
+    ["vectorizer"],
+    multiprocess_mode="livemostrecent",
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time the enclosed block as one RAG stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        RAG_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_generation(model: str, response):
+    """Record token counts and speed from a final Ollama chat response."""
+    eval_count = getattr(response, "eval_count", None)
+    eval_duration = getattr(response, "eval_duration", None)
+    if not eval_count:
+        return
+
+    LLM_GENERATED_TOKENS.labels(model).inc(eval_count)
+    if eval_duration:
+        # eval_duration is reported in nanoseconds
+        LLM_TOKENS_PER_SECOND.labels(model).observe(eval_count / (eval_duration / 1e9))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing request latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route.path if route is not None else "<unmatched>",
+                str(status),
+            ).observe(time.perf_counter() - start)
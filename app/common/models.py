@@ -1,9 +1,16 @@
+from uuid import UUID
+
 from pgai.sqlalchemy import vectorizer_relationship
-from sqlalchemy import String
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Index, Integer, String, column, table
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.dialects.postgresql import UUID as PgUUID
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.common.database import BaseDbModel
 
+EMBEDDING_DIMENSIONS = 768
+
 
 class User(BaseDbModel):
     __tablename__ = "users"
@@ -19,5 +26,35 @@ class Page(BaseDbModel):
 
     # Add vector embeddings for the content field
     content_embeddings = vectorizer_relationship(
-        dimensions=768, target_table="pages_embeddings"
+        dimensions=EMBEDDING_DIMENSIONS, target_table="pages_embeddings"
     )
+
+
+# the answer cache compares its entries with the newest page; declared outside
+# the class because pgai's vectorizer_relationship reads __table_args__ as a dict
+Index("ix_pages_created_at", Page.created_at)
+
+
+# The vectorizer writes chunks to this table and exposes it through the
+# ``pages_embeddings`` view; the full-text and sequence columns only exist on
+# the table.
+EMBEDDINGS_STORE = table(
+    "pages_embeddings_store",
+    column("embedding_uuid"),
+    column("id"),
+    column("chunk"),
+    column("embedding", Vector(EMBEDDING_DIMENSIONS)),
+    column("chunk_tsv", TSVECTOR),
+    column("seq"),
+)
+
+
+class AnswerCache(BaseDbModel):
+    __tablename__ = "answer_cache"
+
+    query_embedding: Mapped[list[float]] = mapped_column(Vector(EMBEDDING_DIMENSIONS))
+    chunk_ids: Mapped[list[UUID]] = mapped_column(ARRAY(PgUUID(as_uuid=True)))
+    page_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer))
+    model: Mapped[str]
+    template_version: Mapped[str] = mapped_column(String(64))
+    answer: Mapped[str]
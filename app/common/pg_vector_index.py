@@ -0,0 +1,254 @@
+# pylint: disable=unused-argument,invalid-name,line-too-long
+
+from alembic.operations import MigrateOperation, Operations
+
+
+# Approximate nearest neighbour (ANN) indexes for pgvector columns.
+# https://github.com/pgvector/pgvector#indexing
+# https://github.com/timescale/pgvectorscale#usage
+
+VECTOR_INDEX_METHODS = ("hnsw", "diskann")
+
+
+def _format_options(options: dict | None) -> str:
+    if not options:
+        return ""
+    return ", ".join(f"{key} = {value}" for key, value in options.items())
+
+
+class PgVectorIndexOp(MigrateOperation):
+    """Base PgVectorIndexOp for Create, Alter and Drop statements."""
+
+    def __init__(
+        self,
+        index_name: str,
+        table_name: str = None,
+        column_name: str = "embedding",
+        method: str = "hnsw",
+        opclass: str = "vector_cosine_ops",
+        options: dict = None,
+        schema: str = None,
+        if_not_exists=True,
+        concurrently=False,
+    ):
+        if method not in VECTOR_INDEX_METHODS:
+            raise ValueError(f"Unsupported vector index method: {method}")
+
+        self.index_name = index_name
+        self.table_name = table_name
+        self.column_name = column_name
+        self.method = method
+        self.opclass = opclass
+        self.options = options or {}
+        self.schema = schema
+        self.if_not_exists = if_not_exists
+        self.concurrently = concurrently
+
+    @property
+    def qualified_index_name(self) -> str:
+        if self.schema:
+            return f"{self.schema}.{self.index_name}"
+        return self.index_name
+
+    @property
+    def qualified_table_name(self) -> str:
+        if self.schema:
+            return f"{self.schema}.{self.table_name}"
+        return self.table_name
+
+
+class PgCreateVectorIndexOp(PgVectorIndexOp):
+    """Create an HNSW (pgvector) or StreamingDiskANN (pgvectorscale) index.
+
+    **Parameters:**
+
+    * **index_name** - *str*: Name of the index
+    * **table_name** - *str*: Table holding the vector column
+    * **method** - *str*: ``hnsw`` or ``diskann``
+    * **options** - *dict*: Build parameters e.g. ``{"m": 16, "ef_construction": 64}``
+    """
+
+    operation_name = "create_vector_index"
+
+    @classmethod
+    def create_vector_index(
+        cls,
+        operations: Operations,
+        index_name: str,
+        table_name: str,
+        column_name: str = "embedding",
+        method: str = "hnsw",
+        opclass: str = "vector_cosine_ops",
+        options: dict = None,
+        schema: str = None,
+        if_not_exists=True,
+        concurrently=False,
+    ):
+        """
+        Creates a custom operation to create a vector index.
+
+        Args:
+            index_name (str): The name of the index.
+            table_name (str): The table holding the vector column.
+            column_name (str, optional): The vector column. Defaults to "embedding".
+            method (str, optional): The index access method, "hnsw" or "diskann". Defaults to "hnsw".
+            opclass (str, optional): The distance operator class. Defaults to "vector_cosine_ops".
+            options (dict, optional): Index build parameters. Defaults to None.
+            schema (str, optional): The schema of the table. Defaults to None.
+            if_not_exists (bool, optional): Whether to create the index only if it does not exist. Defaults to True.
+            concurrently (bool, optional): Whether to build the index without locking writes. Defaults to False.
+
+        Returns:
+            OpMessage: A custom operation instance.
+        """
+        op = cls(
+            index_name,
+            table_name,
+            column_name,
+            method,
+            opclass,
+            options,
+            schema,
+            if_not_exists,
+            concurrently,
+        )
+        return operations.invoke(op)
+
+    def to_sql_statement_create(self) -> str:
+        """Generates a SQL "create index" statement"""
+        sql = "CREATE INDEX"
+        if self.concurrently:
+            sql += " CONCURRENTLY"
+        if self.if_not_exists:
+            sql += " IF NOT EXISTS"
+        sql += f" {self.index_name} ON {self.qualified_table_name}"
+        sql += f" USING {self.method} ({self.column_name} {self.opclass})"
+        if self.options:
+            sql += f" WITH ({_format_options(self.options)})"
+
+        return sql
+
+
+class PgAlterVectorIndexOp(PgVectorIndexOp):
+    """Change storage parameters of an existing vector index.
+
+    **Parameters:**
+
+    * **index_name** - *str*: Name of the index
+    * **options** - *dict*: Parameters to set e.g. ``{"ef_construction": 128}``
+    """
+
+    operation_name = "alter_vector_index"
+
+    @classmethod
+    def alter_vector_index(
+        cls,
+        operations: Operations,
+        index_name: str,
+        options: dict,
+        schema: str = None,
+    ):
+        """
+        Creates a custom operation to tune a vector index.
+
+        Parameters that only affect the build (such as ``m`` or
+        ``ef_construction``) take effect on the next ``REINDEX``.
+
+        Args:
+            index_name (str): The name of the index.
+            options (dict): Index parameters to set.
+            schema (str, optional): The schema of the index. Defaults to None.
+
+        Returns:
+            OpMessage: A custom operation instance.
+        """
+        op = cls(index_name, options=options, schema=schema)
+        return operations.invoke(op)
+
+    def to_sql_statement_alter(self) -> str:
+        """Generates a SQL "alter index" statement"""
+        return f"ALTER INDEX {self.qualified_index_name} SET ({_format_options(self.options)})"
+
+
+class PgDropVectorIndexOp(PgVectorIndexOp):
+    """Drop a vector index.
+
+    **Parameters:**
+
+    * **index_name** - *str*: Name of the index
+    """
+
+    operation_name = "drop_vector_index"
+
+    @classmethod
+    def drop_vector_index(
+        cls,
+        operations: Operations,
+        index_name: str,
+        schema: str = None,
+        if_exists=True,
+        concurrently=False,
+    ):
+        """
+        Creates a custom operation to drop a vector index.
+
+        Args:
+            index_name (str): The name of the index.
+            schema (str, optional): The schema of the index. Defaults to None.
+            if_exists (bool, optional): Whether to ignore a missing index. Defaults to True.
+            concurrently (bool, optional): Whether to drop the index without locking the table. Defaults to False.
+
+        Returns:
+            OpMessage: A custom operation instance.
+        """
+        op = cls(
+            index_name,
+            schema=schema,
+            if_not_exists=if_exists,
+            concurrently=concurrently,
+        )
+        return operations.invoke(op)
+
+    def to_sql_statement_drop(self) -> str:
+        """Generates a SQL "drop index" statement"""
+        sql = "DROP INDEX"
+        if self.concurrently:
+            sql += " CONCURRENTLY"
+        if self.if_not_exists:
+            sql += " IF EXISTS"
+
+        return f"{sql} {self.qualified_index_name}"
+
+
+def create_vector_index(operations: Operations, operation: PgCreateVectorIndexOp):
+    operations.execute(operation.to_sql_statement_create())
+
+
+def alter_vector_index(operations: Operations, operation: PgAlterVectorIndexOp):
+    operations.execute(operation.to_sql_statement_alter())
+
+
+def drop_vector_index(operations: Operations, operation: PgDropVectorIndexOp):
+    operations.execute(operation.to_sql_statement_drop())
+
+
+_operations_registered = False
+
+
+def register_operations():
+    global _operations_registered
+
+    if not _operations_registered:
+        Operations.register_operation(PgCreateVectorIndexOp.operation_name)(
+            PgCreateVectorIndexOp
+        )
+        Operations.implementation_for(PgCreateVectorIndexOp)(create_vector_index)
+        Operations.register_operation(PgAlterVectorIndexOp.operation_name)(
+            PgAlterVectorIndexOp
+        )
+        Operations.implementation_for(PgAlterVectorIndexOp)(alter_vector_index)
+        Operations.register_operation(PgDropVectorIndexOp.operation_name)(
+            PgDropVectorIndexOp
+        )
+        Operations.implementation_for(PgDropVectorIndexOp)(drop_vector_index)
+        _operations_registered = True
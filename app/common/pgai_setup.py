@@ -0,0 +1,63 @@
+"""One-time installation of the pgai library objects into the database.
+
+``pgai.install`` runs the whole ``ai`` schema script, so it is done once per
+deploy (``python cli.py install-pgai``) or, when a local run opts in with
+``PGAI_INSTALL_ON_STARTUP``, once by whichever worker takes the advisory lock
+first. Workers that find the current version already installed do no DDL.
+"""
+
+import logging
+
+import pgai
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# arbitrary key shared by every process installing pgai into the database
+PGAI_INSTALL_LOCK_ID = 7_146_011_042
+
+
+async def installed_pgai_version(connection) -> str | None:
+    """Version of the pgai library recorded in the database, if installed."""
+    table = await connection.scalar(select(func.to_regclass("ai.pgai_lib_version")))
+    if table is None:
+        return None
+    return await connection.scalar(
+        text("SELECT version FROM ai.pgai_lib_version WHERE name = 'ai'")
+    )
+
+
+async def ensure_pgai_installed(engine, db_url: str | None = None) -> bool:
+    """Install pgai unless the current version already is; True if installed.
+
+    The check and the install run under an advisory lock, so concurrent
+    workers wait for the first one instead of racing on the DDL. The version
+    check is committed before installing so this connection holds no table
+    locks the install script could wait on.
+    """
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(
+                select(func.pg_advisory_lock(PGAI_INSTALL_LOCK_ID))
+            )
+            try:
+                version = await installed_pgai_version(connection)
+                await connection.commit()
+                if version == pgai.__version__:
+                    logger.info("pgai %s already installed", version)
+                    return False
+
+                logger.info("installing pgai %s (found %s)", pgai.__version__, version)
+                await pgai.ainstall(db_url=db_url or CONFIG.PGAI_DATABASE_URL)
+                return True
+            finally:
+                await connection.execute(
+                    select(func.pg_advisory_unlock(PGAI_INSTALL_LOCK_ID))
+                )
+                await connection.commit()
+    except SQLAlchemyError as e:
+        logger.exception("%s", e)
+        raise
@@ -0,0 +1,122 @@
+"""Registry of the compiled prompt templates.
+
+Every template in ``PROMPT_TEMPLATES_DIR`` is compiled once when the registry
+is created, so rendering is a dictionary lookup plus the render itself, with
+no filesystem access. With ``PROMPT_HOT_RELOAD`` enabled a background task
+polls the template mtimes every ``PROMPT_RELOAD_INTERVAL`` seconds and
+recompiles the changed ones; requests still never stat a file.
+"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, Template
+
+from config import CONFIG, PROMPT_TEMPLATES_DIR
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = (".j2", ".jinja", ".jinja2", ".txt")
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    template: Template
+    version: str
+    mtime_ns: int
+
+
+class PromptRegistry:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        # templates are only reloaded through refresh(), never by Jinja itself
+        self._env = Environment(
+            loader=FileSystemLoader(str(directory)), autoescape=True, auto_reload=False
+        )
+        self._prompts: dict[str, CompiledPrompt] = {}
+        self.refresh()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._prompts
+
+    def _compile(self, path: Path, mtime_ns: int) -> CompiledPrompt:
+        source = path.read_text()
+        return CompiledPrompt(
+            template=self._env.from_string(source),
+            version=hashlib.sha256(source.encode()).hexdigest()[:16],
+            mtime_ns=mtime_ns,
+        )
+
+    def refresh(self) -> list[str]:
+        """Compile new and modified templates, forget deleted ones.
+
+        Returns the names of the templates that were (re)compiled.
+        """
+        found = {}
+        for path in sorted(self.directory.iterdir()):
+            if path.is_file() and path.suffix in TEMPLATE_SUFFIXES:
+                found[path.name] = path
+
+        changed = []
+        prompts = {}
+        for name, path in found.items():
+            mtime_ns = path.stat().st_mtime_ns
+            current = self._prompts.get(name)
+            if current is not None and current.mtime_ns == mtime_ns:
+                prompts[name] = current
+                continue
+            try:
+                prompts[name] = self._compile(path, mtime_ns)
+            except Exception:
+                if current is None:
+                    raise
+                # keep serving the last good version of a broken edit
+                logger.exception("failed to reload prompt template %s", name)
+                prompts[name] = current
+                continue
+            changed.append(name)
+
+        # swap in one assignment so concurrent renders see a consistent dict
+        self._prompts = prompts
+        return changed
+
+    def get(self, name: str) -> CompiledPrompt:
+        try:
+            return self._prompts[name]
+        except KeyError:
+            raise ValueError(f"Template not found: {self.directory / name}") from None
+
+    def version(self, name: str) -> str:
+        return self.get(name).version
+
+    def render(self, name: str, context) -> str:
+        return self.get(name).template.render(context)
+
+    async def watch(self, interval: float):
+        """Reload changed templates every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("failed to reload prompt templates")
+                continue
+            if changed:
+                logger.info("reloaded prompt templates: %s", ", ".join(changed))
+
+
+@lru_cache
+def get_prompt_registry() -> PromptRegistry:
+    return PromptRegistry(PROMPT_TEMPLATES_DIR)
+
+
+def start_prompt_reloader() -> asyncio.Task | None:
+    if not CONFIG.PROMPT_HOT_RELOAD:
+        return None
+    return asyncio.create_task(
+        get_prompt_registry().watch(CONFIG.PROMPT_RELOAD_INTERVAL)
+    )
@@ -1,34 +1,279 @@
-from jinja2 import Environment, FileSystemLoader
-from sqlalchemy import func, select
+import asyncio
+from enum import Enum
 
-from app.common.models import Page
-from config import CONFIG, PROMPT_TEMPLATES_DIR
+from sqlalchemy import Float, cast, func, literal, null, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
 
-_env_cache = Environment(
-    loader=FileSystemLoader(str(PROMPT_TEMPLATES_DIR)), autoescape=True
-)
+from app.common.memory_index import get_memory_index
+from app.common.metrics import observe_stage
+from app.common.models import EMBEDDINGS_STORE, Page
+from app.common.prompts import get_prompt_registry
+from config import CONFIG
 
 
-async def retrieve_embeddings_for_page_query(
-    session, query: str, limit: int = 5, similarity_threshold: float = 0.5
+class RetrievalMode(str, Enum):
+    VECTOR = "vector"
+    TEXT = "text"
+    HYBRID = "hybrid"
+
+
+def vector_search_settings() -> dict[str, str]:
+    """Per-query ANN search parameters for the configured index method."""
+    if CONFIG.VECTOR_INDEX_METHOD == "diskann":
+        return {
+            "diskann.query_search_list_size": str(
+                CONFIG.DISKANN_QUERY_SEARCH_LIST_SIZE
+            ),
+            "diskann.query_rescore": str(CONFIG.DISKANN_QUERY_RESCORE),
+        }
+    return {"hnsw.ef_search": str(CONFIG.HNSW_EF_SEARCH)}
+
+
+async def apply_vector_search_settings(session):
+    """Set the ANN search parameters for the current transaction only."""
+    settings = [
+        func.set_config(name, value, True)
+        for name, value in vector_search_settings().items()
+    ]
+    await session.execute(select(*settings))
+
+
+class RetrievedChunk:
+    """One retrieved chunk without its embedding vector.
+
+    ``distance`` is the cosine distance to the query, ``None`` when the chunk
+    was only found by full-text search. ``score`` is the full-text rank or the
+    fused score, ``None`` for pure vector search.
+    """
+
+    __slots__ = ("chunk_id", "page_id", "title", "chunk", "distance", "score")
+
+    def __init__(
+        self,
+        chunk_id,
+        page_id: int,
+        title: str,
+        chunk: str,
+        distance: float | None,
+        score: float | None = None,
+    ):
+        self.chunk_id = chunk_id
+        self.page_id = page_id
+        self.title = title
+        self.chunk = chunk
+        self.distance = distance
+        self.score = score
+
+    def __repr__(self):
+        return (
+            f"RetrievedChunk(page_id={self.page_id!r}, title={self.title!r}, "
+            f"distance={self.distance!r}, score={self.score!r})"
+        )
+
+
+def nearest_chunks_query(
+    query_embedding: list[float], limit: int, similarity_threshold: float
+):
+    """Select the nearest chunks with their page title, without the vectors.
+
+    The distance is computed once in a subquery that only orders and limits,
+    which the ANN index can serve directly; the threshold is applied to those
+    top ``limit`` rows afterwards.
+    """
+    embeddings_model = Page.content_embeddings
+    distance = embeddings_model.embedding.cosine_distance(query_embedding).label(
+        "distance"
+    )
+    nearest = (
+        select(
+            embeddings_model.embedding_uuid,
+            embeddings_model.id,
+            embeddings_model.chunk,
+            distance,
+        )
+        .order_by(distance)
+        .limit(limit)
+        .subquery("nearest")
+    )
+    return (
+        select(
+            nearest.c.embedding_uuid,
+            nearest.c.id,
+            Page.title,
+            nearest.c.chunk,
+            nearest.c.distance,
+        )
+        .join(Page, Page.id == nearest.c.id)
+        .where(nearest.c.distance < similarity_threshold)
+        .order_by(nearest.c.distance)
+    )
+
+
+def text_search_query(query_text: str):
+    return func.websearch_to_tsquery(
+        cast(literal(CONFIG.FULL_TEXT_SEARCH_CONFIG), REGCONFIG), query_text
+    )
+
+
+def text_chunks_query(query_text: str, limit: int):
+    """Select the chunks best matching ``query_text`` by ``ts_rank_cd``."""
+    store = EMBEDDINGS_STORE
+    tsquery = text_search_query(query_text)
+    rank = func.ts_rank_cd(store.c.chunk_tsv, tsquery).label("score")
+    return (
+        select(
+            store.c.embedding_uuid,
+            store.c.id,
+            Page.title,
+            store.c.chunk,
+            null().label("distance"),
+            rank,
+        )
+        .join(Page, Page.id == store.c.id)
+        .where(store.c.chunk_tsv.bool_op("@@")(tsquery))
+        .order_by(rank.desc())
+        .limit(limit)
+    )
+
+
+def hybrid_chunks_query(
+    query_embedding: list[float],
+    query_text: str,
+    limit: int,
+    similarity_threshold: float,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
 ):
-    embedding_query = func.ai.ollama_embed(CONFIG.OLLAMA_EMBEDDING_MODEL, query)
-    similarity_score = Page.content_embeddings.embedding.cosine_distance(
-        embedding_query
-    )
-    stmt = (
-        select(Page.content_embeddings)
-        .filter(similarity_score < similarity_threshold)
-        .order_by(similarity_score)
+    """Fuse a vector and a full-text leg with reciprocal rank fusion.
+
+    Each leg ranks its own candidates and a chunk scores
+    ``weight / (RRF_K + rank)`` per leg it appears in. Both legs run in the
+    same statement, so hybrid search costs a single round trip.
+    """
+    store = EMBEDDINGS_STORE
+
+    distance = store.c.embedding.cosine_distance(query_embedding).label("distance")
+    nearest = (
+        select(store.c.embedding_uuid, distance)
+        .order_by(distance)
+        .limit(CONFIG.HYBRID_VECTOR_CANDIDATES)
+        .subquery("nearest")
+    )
+    vector_leg = (
+        select(
+            nearest.c.embedding_uuid,
+            nearest.c.distance,
+            func.row_number().over(order_by=nearest.c.distance).label("rank"),
+        )
+        .where(nearest.c.distance < similarity_threshold)
+        .cte("vector_leg")
+    )
+
+    tsquery = text_search_query(query_text)
+    text_rank = func.ts_rank_cd(store.c.chunk_tsv, tsquery)
+    text_leg = (
+        select(
+            store.c.embedding_uuid,
+            func.row_number().over(order_by=text_rank.desc()).label("rank"),
+        )
+        .where(store.c.chunk_tsv.bool_op("@@")(tsquery))
+        .order_by(text_rank.desc())
+        .limit(CONFIG.HYBRID_TEXT_CANDIDATES)
+        .cte("text_leg")
+    )
+
+    def leg_score(weight: float, rank):
+        return func.coalesce(
+            literal(weight, Float) / cast(CONFIG.RRF_K + rank, Float), 0.0
+        )
+
+    fused = (
+        select(
+            func.coalesce(vector_leg.c.embedding_uuid, text_leg.c.embedding_uuid).label(
+                "embedding_uuid"
+            ),
+            vector_leg.c.distance,
+            (
+                leg_score(vector_weight, vector_leg.c.rank)
+                + leg_score(text_weight, text_leg.c.rank)
+            ).label("score"),
+        )
+        .select_from(
+            vector_leg.outerjoin(
+                text_leg,
+                vector_leg.c.embedding_uuid == text_leg.c.embedding_uuid,
+                full=True,
+            )
+        )
+        .cte("fused")
+    )
+
+    return (
+        select(
+            fused.c.embedding_uuid,
+            store.c.id,
+            Page.title,
+            store.c.chunk,
+            fused.c.distance,
+            fused.c.score,
+        )
+        .select_from(fused)
+        .join(store, store.c.embedding_uuid == fused.c.embedding_uuid)
+        .join(Page, Page.id == store.c.id)
+        .order_by(fused.c.score.desc())
         .limit(limit)
     )
-    results = await session.execute(stmt)
-    return results.scalars().all()
+
+
+async def retrieve_chunks_for_query(
+    session,
+    query_embedding: list[float],
+    limit: int = 5,
+    similarity_threshold: float = 0.5,
+    mode: RetrievalMode = RetrievalMode.VECTOR,
+    query_text: str | None = None,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+) -> list[RetrievedChunk]:
+    if mode is not RetrievalMode.VECTOR and not query_text:
+        raise ValueError(f"{mode.value} retrieval needs the query text")
+
+    if mode is RetrievalMode.VECTOR and CONFIG.RETRIEVAL_BACKEND == "memory":
+        index = get_memory_index()
+        # until the snapshot is loaded, Postgres answers
+        if index.ready:
+            with observe_stage("memory_search"):
+                rows = await asyncio.to_thread(
+                    index.search, query_embedding, limit, similarity_threshold
+                )
+            return [RetrievedChunk(*row) for row in rows]
+
+    if mode is RetrievalMode.TEXT:
+        stmt = text_chunks_query(query_text, limit)
+    elif mode is RetrievalMode.HYBRID:
+        stmt = hybrid_chunks_query(
+            query_embedding,
+            query_text,
+            limit,
+            similarity_threshold,
+            vector_weight,
+            text_weight,
+        )
+    else:
+        stmt = nearest_chunks_query(query_embedding, limit, similarity_threshold)
+
+    with observe_stage(f"{mode.value}_search"):
+        if mode is not RetrievalMode.TEXT:
+            await apply_vector_search_settings(session)
+        results = await session.execute(stmt)
+        return [RetrievedChunk(*row) for row in results.tuples()]
 
 
 def render_from_template(template_file: str, context) -> str:
-    template_path = PROMPT_TEMPLATES_DIR / template_file
-    if not template_path.exists():
-        raise ValueError(f"Template not found: {template_path}")
-    template = _env_cache.get_template(template_file)
-    return template.render(context)
+    with observe_stage("prompt_render"):
+        return get_prompt_registry().render(template_file, context)
+
+
+def template_version(template_file: str) -> str:
+    """Short content hash of a prompt template, usable as a cache key."""
+    return get_prompt_registry().version(template_file)
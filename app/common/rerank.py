@@ -0,0 +1,223 @@
+"""Post-retrieval refinement of the chunks that go into the prompt.
+
+The vectorizer splits pages into 800 character chunks overlapping by 400, so
+the nearest chunks often repeat each other. Before the prompt is rendered the
+retrieved chunks are:
+
+1. deduplicated, dropping chunks mostly contained in a better ranked one,
+2. reranked by a pluggable scorer (MMR by default),
+3. trimmed to ``CONTEXT_TOKEN_BUDGET`` estimated tokens.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import zlib
+from functools import lru_cache
+from typing import Protocol
+
+import numpy as np
+
+from app.common.metrics import observe_stage
+from app.common.rag import RetrievedChunk
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 5
+HASHED_TERM_DIMENSIONS = 1024
+
+
+class Reranker(Protocol):
+    def rerank(
+        self, query: str, chunks: list[RetrievedChunk], k: int
+    ) -> list[RetrievedChunk]: ...
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; the generation model's tokenizer is not available."""
+    return math.ceil(len(text) / CONFIG.CHARS_PER_TOKEN)
+
+
+def _words(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = _words(text)
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {
+        tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def deduplicate_chunks(
+    chunks: list[RetrievedChunk], threshold: float
+) -> list[RetrievedChunk]:
+    """Drop chunks whose word shingles are mostly in an earlier chunk.
+
+    Chunks are compared only within the same page, in retrieval order, so the
+    better ranked of two overlapping chunks is kept.
+    """
+    kept: list[tuple[RetrievedChunk, set]] = []
+    for chunk in chunks:
+        shingles = _shingles(chunk.chunk)
+        duplicate = any(
+            other.page_id == chunk.page_id
+            and len(shingles & other_shingles) / len(shingles) >= threshold
+            for other, other_shingles in kept
+        )
+        if not duplicate:
+            kept.append((chunk, shingles))
+    return [chunk for chunk, _ in kept]
+
+
+def hashed_term_vectors(texts: list[str]) -> np.ndarray:
+    """L2-normalized bag-of-words vectors using the hashing trick."""
+    vectors = np.zeros((len(texts), HASHED_TERM_DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in _words(text):
+            vectors[row, zlib.crc32(word.encode()) % HASHED_TERM_DIMENSIONS] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def relevance(chunks: list[RetrievedChunk]) -> np.ndarray:
+    """Retrieval relevance scaled to [0, 1], higher is better."""
+    if all(chunk.distance is not None for chunk in chunks):
+        values = np.array([1.0 - chunk.distance for chunk in chunks])
+    else:
+        values = np.array([chunk.score or 0.0 for chunk in chunks], dtype=float)
+    spread = values.max() - values.min()
+    if spread == 0:
+        return np.ones(len(chunks))
+    return (values - values.min()) / spread
+
+
+class MMRReranker:
+    """Maximal marginal relevance over the retrieval ranking.
+
+    Each step picks the chunk maximizing
+    ``lambda * relevance - (1 - lambda) * max similarity to picked chunks``.
+    Similarity is the cosine of hashed term vectors, so the chunk embeddings
+    do not have to be loaded from the database.
+    """
+
+    def __init__(self, diversity_lambda: float):
+        self.diversity_lambda = diversity_lambda
+
+    def rerank(
+        self, query: str, chunks: list[RetrievedChunk], k: int
+    ) -> list[RetrievedChunk]:
+        if len(chunks) <= 1:
+            return chunks[:k]
+
+        scores = relevance(chunks)
+        vectors = hashed_term_vectors([chunk.chunk for chunk in chunks])
+        similarity = vectors @ vectors.T
+
+        selected = [int(np.argmax(scores))]
+        candidates = set(range(len(chunks))) - set(selected)
+        while candidates and len(selected) < k:
+            remaining = sorted(candidates)
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            mmr = (
+                self.diversity_lambda * scores[remaining]
+                - (1 - self.diversity_lambda) * redundancy
+            )
+            best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            candidates.remove(best)
+        return [chunks[index] for index in selected]
+
+
+class CrossEncoderReranker:
+    """Scores ``(query, chunk)`` pairs with a Hugging Face cross-encoder on CPU."""
+
+    def __init__(self, model_name: str):
+        try:
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "RERANKER=cross_encoder needs the torch and transformers packages, "
+                "install the rerank extra: uv sync --extra rerank"
+            ) from exc
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+
+    def rerank(
+        self, query: str, chunks: list[RetrievedChunk], k: int
+    ) -> list[RetrievedChunk]:
+        if not chunks:
+            return chunks
+
+        features = self.tokenizer(
+            [query] * len(chunks),
+            [chunk.chunk for chunk in chunks],
+            padding=True,
+            truncation=True,
+            return_tensors="pt",
+        )
+        with self._torch.inference_mode():
+            logits = self.model(**features).logits
+        scores = logits[:, -1].tolist()
+        ranked = sorted(zip(scores, chunks), key=lambda item: item[0], reverse=True)
+        return [chunk for _, chunk in ranked[:k]]
+
+
+class PassthroughReranker:
+    def rerank(
+        self, query: str, chunks: list[RetrievedChunk], k: int
+    ) -> list[RetrievedChunk]:
+        return chunks[:k]
+
+
+@lru_cache
+def get_reranker() -> Reranker:
+    if CONFIG.RERANKER == "cross_encoder":
+        return CrossEncoderReranker(CONFIG.RERANK_MODEL)
+    if CONFIG.RERANKER == "mmr":
+        return MMRReranker(CONFIG.MMR_LAMBDA)
+    return PassthroughReranker()
+
+
+def trim_to_token_budget(
+    chunks: list[RetrievedChunk], budget: int
+) -> list[RetrievedChunk]:
+    """Keep chunks in order while their estimated tokens fit the budget.
+
+    The first chunk is always kept so the prompt is never left without context.
+    """
+    trimmed = []
+    used = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.chunk)
+        if trimmed and used + tokens > budget:
+            break
+        trimmed.append(chunk)
+        used += tokens
+    return trimmed
+
+
+async def refine_chunks(
+    query: str, chunks: list[RetrievedChunk], reranker: Reranker | None = None
+) -> list[RetrievedChunk]:
+    with observe_stage("rerank"):
+        # the first call may load a model, keep that off the event loop too
+        reranker = reranker or await asyncio.to_thread(get_reranker)
+        unique = deduplicate_chunks(chunks, CONFIG.DEDUPE_THRESHOLD)
+        # scoring is CPU bound, keep it off the event loop
+        ranked = await asyncio.to_thread(
+            reranker.rerank, query, unique, CONFIG.CONTEXT_MAX_CHUNKS
+        )
+        refined = trim_to_token_budget(ranked, CONFIG.CONTEXT_TOKEN_BUDGET)
+
+    logger.debug("refined %s retrieved chunks to %s", len(chunks), len(refined))
+    return refined
@@ -3,5 +3,9 @@ from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.common.database import get_session
+from app.common.embeddings import EmbeddingService, get_embedding_service
+from app.common.llm import LLMClient, get_llm_client
 
 Session = Annotated[AsyncSession, Depends(get_session)]
+LLM = Annotated[LLMClient, Depends(get_llm_client)]
+Embedder = Annotated[EmbeddingService, Depends(get_embedding_service)]
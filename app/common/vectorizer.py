@@ -0,0 +1,187 @@
+"""Backlog of the pgai vectorizer and read-your-writes for new pages.
+
+Pages are embedded by the external ``vectorizer_worker``: a trigger queues the
+page id in the vectorizer's queue table, and the worker deletes the queue row
+in the same transaction that writes the page's chunks. A page is therefore
+searchable exactly when its id is no longer queued, and the age of the oldest
+queued row is how far behind the worker is.
+
+Unless a vectorizer is named, these look at the active one, the vectorizer
+writing to ``pages_embeddings_store`` (see ``app.common.embedding_profiles``).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import column, exists, func, select, table, text
+
+from app.common.database import SessionLocal
+from app.common.metrics import (
+    VECTORIZER_FAILED_ITEMS,
+    VECTORIZER_LAG_SECONDS,
+    VECTORIZER_PENDING_ITEMS,
+)
+from app.common.models import EMBEDDINGS_STORE
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# see the migration creating the vectorizer
+VECTORIZER_NAME = "pages_content_embedder"
+ACTIVE_STORE = "pages_embeddings_store"
+# what ai.vectorizer_queue_pending reports when it stopped counting
+PENDING_OVERFLOW = 2**63 - 1
+PENDING_COUNT_LIMIT = 10000
+
+
+@dataclass
+class VectorizerBacklog:
+    name: str
+    disabled: bool
+    pending_items: int | None
+    failed_items: int
+    oldest_queued_at: datetime | None
+    lag_seconds: float
+
+
+@dataclass
+class _QueueTables:
+    name: str
+    disabled: bool
+    queue: object
+    failed: object | None
+
+
+async def _queue_tables(session, name: str | None) -> _QueueTables:
+    query = (
+        "SELECT name, disabled, queue_schema, queue_table, queue_failed_table "
+        "FROM ai.vectorizer WHERE "
+    )
+    if name is None:
+        query += "config -> 'destination' ->> 'target_table' = :store"
+    else:
+        query += "name = :name"
+    row = (
+        await session.execute(text(query), {"name": name, "store": ACTIVE_STORE})
+    ).one_or_none()
+    if row is None and name is None:
+        raise LookupError(f"no vectorizer writes to {ACTIVE_STORE}")
+    if row is None:
+        raise LookupError(f"vectorizer {name!r} does not exist")
+
+    def queue_table(table_name):
+        return table(
+            table_name, column("id"), column("queued_at"), schema=row.queue_schema
+        )
+
+    return _QueueTables(
+        name=row.name,
+        disabled=row.disabled,
+        queue=queue_table(row.queue_table),
+        failed=queue_table(row.queue_failed_table) if row.queue_failed_table else None,
+    )
+
+
+async def vectorizer_backlog(
+    session, name: str | None = None, exact: bool = False
+) -> VectorizerBacklog:
+    """Queue depth and lag of a vectorizer.
+
+    Without ``exact`` pgai stops counting past 10000 queued items, which keeps
+    the query cheap on a large backlog; ``pending_items`` is then None.
+    """
+    tables = await _queue_tables(session, name)
+    pending = await session.scalar(
+        select(func.ai.vectorizer_queue_pending(tables.name, exact))
+    )
+    oldest, lag = (
+        await session.execute(
+            select(
+                func.min(tables.queue.c.queued_at),
+                func.extract("epoch", func.now() - func.min(tables.queue.c.queued_at)),
+            )
+        )
+    ).one()
+    failed = 0
+    if tables.failed is not None:
+        failed = await session.scalar(select(func.count()).select_from(tables.failed))
+
+    return VectorizerBacklog(
+        name=tables.name,
+        disabled=tables.disabled,
+        pending_items=None if pending == PENDING_OVERFLOW else pending,
+        failed_items=failed,
+        oldest_queued_at=oldest,
+        lag_seconds=float(lag or 0.0),
+    )
+
+
+def record_backlog(backlog: VectorizerBacklog):
+    pending = backlog.pending_items
+    if pending is None:
+        pending = PENDING_COUNT_LIMIT + 1
+    VECTORIZER_PENDING_ITEMS.labels(backlog.name).set(pending)
+    VECTORIZER_FAILED_ITEMS.labels(backlog.name).set(backlog.failed_items)
+    VECTORIZER_LAG_SECONDS.labels(backlog.name).set(backlog.lag_seconds)
+
+
+async def page_embedding_state(session, page_id: int, name: str | None = None):
+    """``(queued, embedded)`` for one page."""
+    tables = await _queue_tables(session, name)
+    queued, embedded = (
+        await session.execute(
+            select(
+                exists().where(tables.queue.c.id == page_id),
+                exists().where(EMBEDDINGS_STORE.c.id == page_id),
+            )
+        )
+    ).one()
+    return queued, embedded
+
+
+async def wait_for_page_embeddings(
+    page_id: int,
+    timeout: float,
+    interval: float,
+    name: str | None = None,
+    session_factory=SessionLocal,
+) -> bool:
+    """Wait until the worker has processed ``page_id``; False on timeout.
+
+    Every poll uses a short-lived session so no pooled connection is held
+    while waiting. A page that left the queue without chunks (empty content,
+    or moved to the failed queue) counts as not embedded.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        async with session_factory() as session:
+            queued, embedded = await page_embedding_state(session, page_id, name)
+        if not queued:
+            return embedded
+        if time.monotonic() >= deadline:
+            logger.info(
+                "page %s still queued for embedding after %ss", page_id, timeout
+            )
+            return False
+        await asyncio.sleep(interval)
+
+
+async def keep_backlog_metrics(
+    interval: float, name: str | None = None, session_factory=SessionLocal
+):
+    while True:
+        try:
+            async with session_factory() as session:
+                record_backlog(await vectorizer_backlog(session, name))
+        except Exception:
+            logger.exception("failed to read the vectorizer backlog")
+        await asyncio.sleep(interval)
+
+
+def start_vectorizer_monitor() -> asyncio.Task | None:
+    if CONFIG.VECTORIZER_METRICS_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(keep_backlog_metrics(CONFIG.VECTORIZER_METRICS_INTERVAL))
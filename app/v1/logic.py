@@ -1,15 +1,56 @@
+import json
 import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4
+
+import asyncpg
 
 from fastapi import HTTPException
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, text
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.common.answer_cache import lookup_cached_answer, store_answer
+from app.common.expansion import retrieve_expanded, split_query
+from app.common.metrics import observe_stage
 from app.common.models import Page, User
-from app.v1.schema import UserSchema, PageSchema
+from app.common.rag import (
+    RetrievalMode,
+    render_from_template,
+    retrieve_chunks_for_query,
+    template_version,
+)
+from app.common.rerank import refine_chunks
+from app.v1.schema import (
+    BulkItemError,
+    BulkPagesResponse,
+    MessageSchema,
+    PageCount,
+    PageListResponse,
+    PageOut,
+    PageSchema,
+    StreamFormat,
+    UserSchema,
+)
+from config import CONFIG
 
 logger = logging.getLogger(__name__)
 
+CHAT_PROMPT_TEMPLATE = "page_prompt.j2"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonlines")
+
+
+@dataclass
+class ChatContext:
+    query_embedding: list[float]
+    template_version: str
+    chunks: list = field(default_factory=list)
+    prompt: str | None = None
+    cached_answer: str | None = None
+
 
 async def get_all_users(session):
     user_results = await session.execute(select(User))
@@ -65,11 +106,205 @@ async def create_page_content(session, page_payload: PageSchema):
     return page
 
 
-async def get_all_pages(session):
-    page_results = await session.execute(select(Page))
+async def iter_bulk_items(request) -> AsyncIterator[tuple[int, object]]:
+    """Yield ``(index, item)`` from a JSON array or an NDJSON request body.
+
+    NDJSON is parsed line by line as the body arrives, so large uploads are
+    never held in memory as a whole. Lines that are not valid JSON are yielded
+    as the exception raised while decoding them.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith(NDJSON_CONTENT_TYPES):
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _decode_json_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _decode_json_line(buffer)
+        return
+
+    items = await request.json()
+    if not isinstance(items, list):
+        raise RequestValidationError("Expected a JSON array of pages")
+    for index, item in enumerate(items):
+        yield index, item
+
+
+def _decode_json_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return exc
+
+
+async def insert_page_batch(session, payloads: list[PageSchema]) -> list[UUID]:
+    """Insert pages in one transaction and return their uuids in order."""
+    uuids = [uuid4() for _ in payloads]
+
+    if CONFIG.BULK_INSERT_METHOD == "copy":
+        # SQLAlchemy's asyncpg adapter sends BEGIN lazily with the first
+        # statement; issue one so the raw COPY below joins the session's
+        # transaction instead of autocommitting on its own
+        await session.execute(text("SELECT 1"))
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Page.__tablename__,
+            records=[
+                (page_uuid, payload.title, payload.content)
+                for page_uuid, payload in zip(uuids, payloads)
+            ],
+            columns=["uuid", "title", "content"],
+        )
+    else:
+        await session.execute(
+            insert(Page).values(
+                [
+                    dict(uuid=page_uuid, **payload.model_dump())
+                    for page_uuid, payload in zip(uuids, payloads)
+                ]
+            )
+        )
+
+    await session.commit()
+    return uuids
+
+
+async def bulk_create_pages(
+    session, items: AsyncIterator[tuple[int, object]], batch_size: int
+) -> BulkPagesResponse:
+    result = BulkPagesResponse(created=0, failed=0, pages=[], errors=[])
+    batch: list[tuple[int, PageSchema]] = []
+
+    async def flush():
+        try:
+            uuids = await insert_page_batch(session, [payload for _, payload in batch])
+        except (SQLAlchemyError, asyncpg.PostgresError) as e:
+            logger.exception("%s", e)
+            await session.rollback()
+            result.errors.extend(
+                BulkItemError(index=index, error=str(e)) for index, _ in batch
+            )
+        else:
+            result.pages.extend(uuids)
+        batch.clear()
+
+    async for index, item in items:
+        if isinstance(item, Exception):
+            result.errors.append(BulkItemError(index=index, error=str(item)))
+            continue
+        try:
+            batch.append((index, PageSchema.model_validate(item)))
+        except ValidationError as e:
+            result.errors.append(BulkItemError(index=index, error=str(e)))
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    result.created = len(result.pages)
+    result.failed = len(result.errors)
+    return result
+
+
+async def get_all_pages(
+    session,
+    after: int | None = None,
+    limit: int | None = None,
+    fields: list[str] | None = None,
+):
+    """Pages ordered by id, optionally starting after a keyset and projected.
+
+    Without ``fields`` ORM objects are returned, otherwise rows holding only
+    the requested columns.
+    """
+    columns = [getattr(Page, name) for name in fields] if fields else [Page]
+    query = select(*columns).order_by(Page.id)
+    if after is not None:
+        query = query.where(Page.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+
+    page_results = await session.execute(query)
+    if fields:
+        return page_results.all()
     return page_results.scalars().all()
 
 
+def encode_cursor(page_id: int) -> str:
+    return urlsafe_b64encode(str(page_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise RequestValidationError("Invalid cursor provided") from exc
+
+
+def parse_page_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = set(requested) - set(PageOut.model_fields)
+    if unknown:
+        raise RequestValidationError(f"Unknown page fields: {sorted(unknown)}")
+
+    # the keyset column is always needed to build the next cursor
+    return ["id"] + [name for name in requested if name != "id"]
+
+
+async def count_pages(session, mode: PageCount) -> int | None:
+    if mode is PageCount.NONE:
+        return None
+
+    if mode is PageCount.ESTIMATE:
+        estimate = await session.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'pages'::regclass")
+        )
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    return await session.scalar(select(func.count()).select_from(Page))
+
+
+async def list_pages(
+    session,
+    cursor: str | None,
+    limit: int,
+    fields: str | None,
+    count: PageCount = PageCount.NONE,
+) -> PageListResponse:
+    after = decode_cursor(cursor) if cursor else None
+    columns = parse_page_fields(fields)
+
+    # fetch one extra row to know whether another page follows
+    rows = await get_all_pages(session, after=after, limit=limit + 1, fields=columns)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if columns:
+        pages = [PageOut(**row._asdict()) for row in rows]
+    else:
+        pages = [PageOut.model_validate(row) for row in rows]
+
+    return PageListResponse(
+        pages=pages,
+        next_cursor=encode_cursor(rows[-1].id) if has_more else None,
+        total=await count_pages(session, count),
+    )
+
+
 async def get_page(session, page_id):
     query = select(Page).where(Page.uuid == page_id)
 
@@ -87,3 +322,99 @@ async def get_page(session, page_id):
         raise HTTPException(404, f"page with id '{page_id}' not found")
 
     return page
+
+
+async def prepare_chat(session, embedder, payload: MessageSchema) -> ChatContext:
+    message = payload.message
+    expand = CONFIG.QUERY_EXPANSION if payload.expand is None else payload.expand
+    queries = (
+        split_query(message, CONFIG.QUERY_EXPANSION_MAX_QUERIES)
+        if expand
+        else [message]
+    )
+
+    # embed before touching the database so no connection is held meanwhile
+    with observe_stage("embed"):
+        if len(queries) > 1:
+            query_embeddings = await embedder.embed_queries(queries)
+        else:
+            query_embeddings = [await embedder.embed_query(message)]
+    query_embedding = query_embeddings[0]
+    context = ChatContext(
+        query_embedding=query_embedding,
+        template_version=template_version(CHAT_PROMPT_TEMPLATE),
+    )
+
+    if CONFIG.ANSWER_CACHE_ENABLED:
+        with observe_stage("answer_cache"):
+            context.cached_answer = await lookup_cached_answer(
+                session,
+                query_embedding,
+                CONFIG.OLLAMA_GENERATION_MODEL,
+                context.template_version,
+            )
+        if context.cached_answer is not None:
+            logger.info("serving cached answer")
+            return context
+
+    mode = payload.mode or RetrievalMode(CONFIG.RETRIEVAL_MODE)
+    if len(queries) > 1:
+        # the sub-queries search on their own connections, return this one
+        await session.close()
+        candidates = await retrieve_expanded(
+            queries,
+            query_embeddings,
+            limit=CONFIG.RETRIEVAL_CANDIDATES,
+            mode=mode,
+            vector_weight=payload.vector_weight,
+            text_weight=payload.text_weight,
+        )
+    else:
+        candidates = await retrieve_chunks_for_query(
+            session,
+            query_embedding,
+            limit=CONFIG.RETRIEVAL_CANDIDATES,
+            mode=mode,
+            query_text=message,
+            vector_weight=payload.vector_weight,
+            text_weight=payload.text_weight,
+        )
+    context.chunks = await refine_chunks(message, candidates)
+    logger.debug("similar posts: %s", context.chunks)
+
+    retrieved_text = "\n".join([post.chunk for post in context.chunks])
+
+    ctx = {"question": message, "retrieved_text": retrieved_text}
+
+    context.prompt = render_from_template(CHAT_PROMPT_TEMPLATE, ctx)
+    return context
+
+
+async def remember_chat_answer(session, context: ChatContext, answer: str):
+    if not CONFIG.ANSWER_CACHE_ENABLED or not context.chunks:
+        return
+
+    try:
+        await store_answer(
+            session,
+            context.query_embedding,
+            context.chunks,
+            CONFIG.OLLAMA_GENERATION_MODEL,
+            context.template_version,
+            answer,
+        )
+    except SQLAlchemyError as e:
+        # a failed cache write must not fail the chat itself
+        logger.exception("%s", e)
+        await session.rollback()
+
+
+def encode_stream_event(
+    stream_format: StreamFormat, data: dict, event: str | None = None
+) -> str:
+    payload = json.dumps(data)
+    if stream_format is StreamFormat.NDJSON:
+        return f"{payload}\n"
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
@@ -1,13 +1,39 @@
 import logging
+from contextlib import aclosing
 
-import ollama
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from app.common.dependencies import is_valid
-from app.common.rag import render_from_template, retrieve_embeddings_for_page_query
-from app.common.types import Session
-from app.v1.logic import create_page_content, get_all_pages, get_page
-from app.v1.schema import MessageSchema, PageSchema, Response
+from app.common.export import ExportFormat, export_pages
+from app.common.types import LLM, Embedder, Session
+from app.common.vectorizer import (
+    record_backlog,
+    vectorizer_backlog,
+    wait_for_page_embeddings,
+)
+from app.v1.logic import (
+    bulk_create_pages,
+    create_page_content,
+    encode_stream_event,
+    get_page,
+    iter_bulk_items,
+    list_pages,
+    prepare_chat,
+    remember_chat_answer,
+)
+from app.v1.schema import (
+    BulkPagesResponse,
+    ChatResponse,
+    MessageSchema,
+    PageCount,
+    PageCreatedResponse,
+    PageListResponse,
+    PageOut,
+    PageSchema,
+    StreamFormat,
+    VectorizerStatusResponse,
+)
 from config import CONFIG
 
 logger = logging.getLogger(__name__)
@@ -19,32 +45,100 @@ router = APIRouter()
     "/pages",
     summary="Create page endpoint",
     description="Create page endpoint description",
-    responses={"200": {"model": Response}},
+    response_model=PageCreatedResponse,
+    response_model_exclude_none=True,
 )
-async def create_page_handler(page_payload: PageSchema, session: Session):
+async def create_page_handler(
+    page_payload: PageSchema,
+    session: Session,
+    wait_for_embeddings: bool = Query(
+        False,
+        description=(
+            "Respond once the vectorizer has embedded the page, or after "
+            "PAGE_EMBEDDING_WAIT_TIMEOUT seconds"
+        ),
+    ),
+):
     logger.info("creating page content...")
     page = await create_page_content(session, page_payload)
-    return {"page": page.uuid}
+    if not wait_for_embeddings:
+        return {"page": page.uuid}
+
+    page_id, page_uuid = page.id, page.uuid
+    # release the pooled connection while the worker catches up
+    await session.close()
+    embedded = await wait_for_page_embeddings(
+        page_id,
+        CONFIG.PAGE_EMBEDDING_WAIT_TIMEOUT,
+        CONFIG.PAGE_EMBEDDING_WAIT_INTERVAL,
+    )
+    return {"page": page_uuid, "embedded": embedded}
+
+
+@router.post(
+    "/pages:bulk",
+    summary="Bulk create pages endpoint",
+    description=(
+        "Create many pages from a JSON array or an NDJSON stream "
+        "(Content-Type: application/x-ndjson). Pages are written in batches, "
+        "one transaction per batch, and failures are reported per item."
+    ),
+    response_model=BulkPagesResponse,
+)
+async def bulk_create_pages_handler(request: Request, session: Session):
+    logger.info("bulk creating page content...")
+    return await bulk_create_pages(
+        session, iter_bulk_items(request), CONFIG.BULK_INSERT_BATCH_SIZE
+    )
+
+
+@router.get(
+    "/pages:export",
+    summary="Export pages endpoint",
+    description=(
+        "Stream every page and, optionally, its chunk embeddings as NDJSON or "
+        "in a compact binary format with raw float32 vectors"
+    ),
+    dependencies=[Depends(is_valid)],
+)
+async def export_pages_handler(
+    session: Session,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    embeddings: bool = Query(True, description="Include chunk embeddings"),
+):
+    logger.info("exporting pages...")
+    return StreamingResponse(
+        export_pages(session, export_format, embeddings),
+        media_type=export_format.media_type,
+    )
 
 
 @router.get(
     "/pages",
     summary="pages endpoint",
-    description="pages endpoint description",
-    responses={"200": {"model": Response}},
+    description="Pages ordered by id, paginated with an opaque keyset cursor",
+    response_model=PageListResponse,
+    response_model_exclude_unset=True,
     dependencies=[Depends(is_valid)],
 )
-async def get_all_pages_handler(session: Session):
+async def get_all_pages_handler(
+    session: Session,
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(CONFIG.PAGES_DEFAULT_LIMIT, ge=1, le=CONFIG.PAGES_MAX_LIMIT),
+    fields: str | None = Query(
+        None, description="Comma-separated page fields to return, e.g. id,title"
+    ),
+    count: PageCount = Query(PageCount.NONE),
+):
     logger.info("getting all pages...")
-    pages = await get_all_pages(session)
-    return {"pages": pages}
+    return await list_pages(session, cursor, limit, fields, count)
 
 
 @router.get(
     "/pages/{page_id}",
     summary="page endpoint",
     description="page endpoint description",
-    responses={"200": {"model": Response}},
+    response_model=PageOut,
     dependencies=[Depends(is_valid)],
 )
 async def get_page_handler(page_id, session: Session):
@@ -52,25 +146,115 @@ async def get_page_handler(page_id, session: Session):
     return await get_page(session, page_id)
 
 
-@router.post("/chat")
-async def make_chat(payload: MessageSchema, session: Session):
-    logger.info("calling model: %s", CONFIG.OLLAMA_GENERATION_MODEL)
+@router.get(
+    "/vectorizer/status",
+    summary="Vectorizer backlog endpoint",
+    description=(
+        "Pages waiting to be embedded by the vectorizer worker and the age of "
+        "the oldest one"
+    ),
+    response_model=VectorizerStatusResponse,
+    dependencies=[Depends(is_valid)],
+)
+async def vectorizer_status_handler(
+    session: Session,
+    exact: bool = Query(False, description="Count the whole queue, however long"),
+):
+    logger.info("getting vectorizer status...")
+    try:
+        backlog = await vectorizer_backlog(session, exact=exact)
+    except LookupError as exc:
+        raise HTTPException(404, str(exc)) from exc
+    record_backlog(backlog)
+    return backlog
+
 
-    similar_posts = await retrieve_embeddings_for_page_query(session, payload.message)
-    logger.info("similar posts: %s", similar_posts)
+@router.post("/chat", response_model=ChatResponse)
+async def make_chat(
+    payload: MessageSchema, session: Session, llm: LLM, embedder: Embedder
+):
+    logger.info("calling model: %s", CONFIG.OLLAMA_GENERATION_MODEL)
 
-    retrieved_text = "\n".join([post.chunk for post in similar_posts])
+    context = await prepare_chat(session, embedder, payload)
+    if context.cached_answer is not None:
+        return {"response": context.cached_answer, "cached": True}
 
-    ctx = {"question": payload.message, "retrieved_text": retrieved_text}
+    # release the pooled connection before the (slow) generation starts
+    await session.close()
 
-    chat_response: ollama.ChatResponse = ollama.chat(
+    chat_response = await llm.chat(
         model=CONFIG.OLLAMA_GENERATION_MODEL,
-        messages=[
-            ollama.Message(
-                role="user",
-                content=render_from_template("page_prompt.j2", ctx),
-            ),
-        ],
+        messages=[{"role": "user", "content": context.prompt}],
     )
+    answer = chat_response.message.content
+
+    await remember_chat_answer(session, context, answer)
+
+    return {"response": answer, "cached": False}
+
 
-    return {"response": chat_response.message.content}
+@router.post(
+    "/chat/stream",
+    summary="Streaming chat endpoint",
+    description="Stream generated tokens as server-sent events or NDJSON",
+)
+async def make_chat_stream(
+    payload: MessageSchema,
+    request: Request,
+    session: Session,
+    llm: LLM,
+    embedder: Embedder,
+    stream_format: StreamFormat = Query(StreamFormat.SSE, alias="format"),
+):
+    logger.info("streaming model: %s", CONFIG.OLLAMA_GENERATION_MODEL)
+
+    context = await prepare_chat(session, embedder, payload)
+    await session.close()
+
+    async def cached_stream():
+        yield encode_stream_event(stream_format, {"token": context.cached_answer})
+        yield encode_stream_event(
+            stream_format, {"done": True, "cached": True}, event="done"
+        )
+
+    async def token_stream():
+        tokens = []
+        parts = llm.chat_stream(
+            model=CONFIG.OLLAMA_GENERATION_MODEL,
+            messages=[{"role": "user", "content": context.prompt}],
+        )
+        async with aclosing(parts):
+            try:
+                async for part in parts:
+                    if await request.is_disconnected():
+                        logger.info("client disconnected, cancelling generation")
+                        return
+                    # Ollama may put the last token on the done part
+                    if part.message.content:
+                        tokens.append(part.message.content)
+                        yield encode_stream_event(
+                            stream_format, {"token": part.message.content}
+                        )
+                    if part.done:
+                        yield encode_stream_event(
+                            stream_format,
+                            {
+                                "done": True,
+                                "cached": False,
+                                "eval_count": part.eval_count,
+                            },
+                            event="done",
+                        )
+            except HTTPException as exc:
+                yield encode_stream_event(
+                    stream_format, {"error": exc.detail}, event="error"
+                )
+                return
+
+        await remember_chat_answer(session, context, "".join(tokens))
+
+    return StreamingResponse(
+        cached_stream() if context.cached_answer is not None else token_stream(),
+        media_type=stream_format.media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,55 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
 
+from pydantic import BaseModel, ConfigDict, Field
 
-class Response(BaseModel):
-    message: str = Field(
-        ..., json_schema_extra=(dict(description="Message", example="Hello V1"))
+from app.common.rag import RetrievalMode
+
+
+class PageCreatedResponse(BaseModel):
+    page: UUID = Field(
+        ..., json_schema_extra=(dict(description="uuid of the created page"))
+    )
+    embedded: bool | None = Field(
+        None,
+        json_schema_extra=(
+            dict(description="With wait_for_embeddings, whether the page is searchable")
+        ),
+    )
+
+
+class VectorizerStatusResponse(BaseModel):
+    name: str
+    disabled: bool
+    pending_items: int | None = Field(
+        ...,
+        json_schema_extra=(
+            dict(description="Queued items, null above 10000 unless exact=true")
+        ),
+    )
+    failed_items: int = Field(
+        ...,
+        json_schema_extra=(
+            dict(description="Items the worker gave up on after its retries")
+        ),
+    )
+    oldest_queued_at: datetime | None
+    lag_seconds: float = Field(
+        ...,
+        json_schema_extra=(
+            dict(description="Age of the oldest queued item, 0 when caught up")
+        ),
+    )
+
+
+class ChatResponse(BaseModel):
+    response: str
+    cached: bool = Field(
+        ...,
+        json_schema_extra=(
+            dict(description="Whether the answer came from the answer cache")
+        ),
     )
 
 
@@ -15,6 +61,32 @@ class MessageSchema(BaseModel):
     message: str = Field(
         ..., json_schema_extra=(dict(description="message", example="message"))
     )
+    mode: RetrievalMode | None = Field(
+        default=None,
+        json_schema_extra=(
+            dict(description="Retrieval mode, defaults to RETRIEVAL_MODE")
+        ),
+    )
+    vector_weight: float = Field(
+        default=1.0,
+        ge=0,
+        json_schema_extra=(dict(description="Weight of the vector leg in hybrid mode")),
+    )
+    text_weight: float = Field(
+        default=1.0,
+        ge=0,
+        json_schema_extra=(
+            dict(description="Weight of the full-text leg in hybrid mode")
+        ),
+    )
+    expand: bool | None = Field(
+        default=None,
+        json_schema_extra=(
+            dict(
+                description="Split the question into sub-queries, defaults to QUERY_EXPANSION"
+            )
+        ),
+    )
 
 
 class PageSchema(BaseModel):
@@ -24,3 +96,68 @@ class PageSchema(BaseModel):
     content: str = Field(
         ..., json_schema_extra=(dict(description="content", example="content"))
     )
+
+
+class BulkItemError(BaseModel):
+    index: int = Field(
+        ..., json_schema_extra=(dict(description="Position of the item in the input"))
+    )
+    error: str
+
+
+class BulkPagesResponse(BaseModel):
+    created: int
+    failed: int
+    pages: list[UUID] = Field(
+        ...,
+        json_schema_extra=(
+            dict(description="uuids of the created pages, in input order")
+        ),
+    )
+    errors: list[BulkItemError]
+
+
+class PageOut(BaseModel):
+    """A page, or the subset of its fields requested with ``fields=``."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int | None = None
+    uuid: UUID | None = None
+    title: str | None = None
+    content: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+class PageListResponse(BaseModel):
+    pages: list[PageOut]
+    next_cursor: str | None = Field(
+        None,
+        json_schema_extra=(
+            dict(description="Cursor for the next page, null on the last page")
+        ),
+    )
+    total: int | None = Field(
+        None,
+        json_schema_extra=(
+            dict(description="Total number of pages, when requested with count=")
+        ),
+    )
+
+
+class PageCount(str, Enum):
+    NONE = "none"
+    ESTIMATE = "estimate"
+    EXACT = "exact"
+
+
+class StreamFormat(str, Enum):
+    SSE = "sse"
+    NDJSON = "ndjson"
+
+    @property
+    def media_type(self) -> str:
+        if self is StreamFormat.SSE:
+            return "text/event-stream"
+        return "application/x-ndjson"
@@ -0,0 +1,73 @@
+"""Latency of cheap reads while chats are in flight.
+
+Fires ``--chats`` concurrent ``POST /v1/chat`` requests against a running
+server and, for as long as they run, keeps polling ``GET /v1/pages``. A
+blocked event loop shows up directly in the p99 of the page reads.
+
+Usage:
+
+    python -m benchmarks.chat_concurrency --base-url http://localhost:8000 --chats 8
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import summarize
+
+
+async def run_chat(client: httpx.AsyncClient, message: str, samples: list[float]):
+    start = time.perf_counter()
+    response = await client.post("/v1/chat", json={"message": message})
+    samples.append(time.perf_counter() - start)
+    response.raise_for_status()
+
+
+async def poll_pages(
+    client: httpx.AsyncClient, done: asyncio.Event, samples: list[float]
+):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get("/v1/pages")
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def main(args):
+    chat_samples: list[float] = []
+    page_samples: list[float] = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        pollers = [
+            asyncio.create_task(poll_pages(client, done, page_samples))
+            for _ in range(args.pollers)
+        ]
+        await asyncio.gather(
+            *(run_chat(client, args.message, chat_samples) for _ in range(args.chats))
+        )
+        done.set()
+        await asyncio.gather(*pollers)
+
+    print(
+        json.dumps(
+            {
+                "chats": args.chats,
+                "chat": summarize(chat_samples),
+                "pages_during_chat": summarize(page_samples),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--chats", type=int, default=8)
+    parser.add_argument("--pollers", type=int, default=2)
+    parser.add_argument("--message", default="What is this content about?")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,215 @@
+"""Deterministic stand-in for the Ollama HTTP API.
+
+Serves ``/api/embed`` and ``/api/chat`` (streaming and not) with configurable
+latency, so the RAG path can be load tested without a GPU or the network.
+
+Embeddings are the normalized sum of one pseudo-random vector per word, so
+texts sharing words are close and the vector search returns sensible
+neighbours. Answers are built from the words of the last message.
+
+Usage:
+
+    python -m benchmarks.fake_ollama --port 11434 --token-latency 0.02
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# same as app.common.models.EMBEDDING_DIMENSIONS; not imported from there so
+# the load test can start this server before the application reads its config
+EMBEDDING_DIMENSIONS = 768
+
+WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class FakeOllamaSettings:
+    embed_latency: float = 0.005
+    first_token_latency: float = 0.05
+    token_latency: float = 0.01
+    tokens: int = 32
+    dimensions: int = EMBEDDING_DIMENSIONS
+    # like some Ollama models, send the last token on the done part
+    last_token_on_done: bool = False
+
+
+@lru_cache(maxsize=65536)
+def _word_vector(word: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> list[float]:
+    """The embedding the fake server returns for ``text``."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in WORD_RE.findall(text.lower()):
+        vector += _word_vector(word, dimensions)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector.tolist()
+    return (vector / norm).tolist()
+
+
+def fake_answer_tokens(prompt: str, tokens: int) -> list[str]:
+    words = WORD_RE.findall(prompt) or ["ok"]
+    return [f"{words[index % len(words)]} " for index in range(tokens)]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def create_fake_ollama(settings: FakeOllamaSettings) -> Starlette:
+    async def embed(request: Request):
+        payload = await request.json()
+        texts = payload["input"]
+        if isinstance(texts, str):
+            texts = [texts]
+        await asyncio.sleep(settings.embed_latency)
+        return JSONResponse(
+            {
+                "model": payload["model"],
+                "embeddings": [
+                    fake_embedding(text, settings.dimensions) for text in texts
+                ],
+                "total_duration": int(settings.embed_latency * 1e9),
+                "prompt_eval_count": sum(len(text.split()) for text in texts),
+            }
+        )
+
+    async def chat(request: Request):
+        payload = await request.json()
+        model = payload["model"]
+        prompt = payload["messages"][-1]["content"] if payload["messages"] else ""
+        tokens = fake_answer_tokens(prompt, settings.tokens)
+        eval_duration = int(settings.token_latency * len(tokens) * 1e9)
+
+        def final(content: str) -> dict:
+            return {
+                "model": model,
+                "created_at": _now(),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": eval_duration
+                + int(settings.first_token_latency * 1e9),
+                "prompt_eval_count": len(prompt.split()),
+                "eval_count": len(tokens),
+                "eval_duration": eval_duration,
+            }
+
+        if not payload.get("stream", True):
+            await asyncio.sleep(
+                settings.first_token_latency + settings.token_latency * len(tokens)
+            )
+            return JSONResponse(final("".join(tokens)))
+
+        async def parts():
+            streamed = tokens[:-1] if settings.last_token_on_done else tokens
+            await asyncio.sleep(settings.first_token_latency)
+            for token in streamed:
+                await asyncio.sleep(settings.token_latency)
+                part = {
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {"role": "assistant", "content": token},
+                    "done": False,
+                }
+                yield json.dumps(part) + "\n"
+            yield json.dumps(final("".join(tokens[len(streamed) :]))) + "\n"
+
+        return StreamingResponse(parts(), media_type="application/x-ndjson")
+
+    async def tags(request: Request):
+        return JSONResponse({"models": []})
+
+    async def version(request: Request):
+        return JSONResponse({"version": "0.0.0-fake"})
+
+    return Starlette(
+        routes=[
+            Route("/api/embed", embed, methods=["POST"]),
+            Route("/api/chat", chat, methods=["POST"]),
+            Route("/api/tags", tags),
+            Route("/api/version", version),
+        ]
+    )
+
+
+class FakeOllama:
+    """Run the fake server on a free local port in a background thread.
+
+    ::
+
+        with FakeOllama(FakeOllamaSettings(token_latency=0)) as server:
+            client = ollama.AsyncClient(host=server.url)
+    """
+
+    def __init__(self, settings: FakeOllamaSettings | None = None):
+        self.settings = settings or FakeOllamaSettings()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        host, port = self._socket.getsockname()
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                create_fake_ollama(self.settings), log_level="warning", lifespan="off"
+            )
+        )
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True
+        )
+
+    def __enter__(self) -> "FakeOllama":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("fake Ollama server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.should_exit = True
+        self._thread.join()
+        self._socket.close()
+
+
+def main(args):
+    settings = FakeOllamaSettings(
+        embed_latency=args.embed_latency,
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        tokens=args.tokens,
+    )
+    uvicorn.run(
+        create_fake_ollama(settings), host=args.host, port=args.port, lifespan="off"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=32)
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""Page ingestion throughput: single inserts against the bulk endpoint.
+
+Creates ``--pages`` synthetic pages through ``POST /v1/pages`` (one request
+per page, ``--concurrency`` at a time) and the same number through
+``POST /v1/pages:bulk`` as an NDJSON stream, and reports rows/sec for both.
+
+Usage:
+
+    python -m benchmarks.ingest --base-url http://localhost:8000 --pages 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def synthetic_pages(count: int, prefix: str):
+    for index in range(count):
+        yield {
+            "title": f"{prefix} page {index}",
+            "content": f"Synthetic content for {prefix} page {index}. " * 20,
+        }
+
+
+async def single_inserts(client: httpx.AsyncClient, pages: list[dict], concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(page):
+        async with semaphore:
+            response = await client.post("/v1/pages", json=page)
+            response.raise_for_status()
+
+    await asyncio.gather(*(create(page) for page in pages))
+
+
+async def bulk_insert(client: httpx.AsyncClient, pages: list[dict]):
+    async def body():
+        for page in pages:
+            yield (json.dumps(page) + "\n").encode()
+
+    response = await client.post(
+        "/v1/pages:bulk",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        single_pages = list(synthetic_pages(args.pages, "single"))
+        bulk_pages = list(synthetic_pages(args.pages, "bulk"))
+
+        single_seconds = await timed(
+            single_inserts(client, single_pages, args.concurrency)
+        )
+        bulk_seconds = await timed(bulk_insert(client, bulk_pages))
+
+    print(
+        json.dumps(
+            {
+                "pages": args.pages,
+                "single": {
+                    "seconds": round(single_seconds, 3),
+                    "rows_per_sec": round(args.pages / single_seconds, 1),
+                },
+                "bulk": {
+                    "seconds": round(bulk_seconds, 3),
+                    "rows_per_sec": round(args.pages / bulk_seconds, 1),
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,54 @@
+"""Prompt rendering cost per call.
+
+Compares the registry, which renders a template compiled at startup, with
+the previous approach: a ``Path.exists()`` check plus ``get_template`` on an
+auto-reloading Jinja environment, which stats the file on every call.
+
+Usage:
+
+    python -m benchmarks.prompt_render --calls 20000
+"""
+
+import argparse
+import timeit
+
+from jinja2 import Environment, FileSystemLoader
+
+from app.common.prompts import PromptRegistry
+from config import PROMPT_TEMPLATES_DIR
+
+TEMPLATE = "page_prompt.j2"
+CONTEXT = {
+    "question": "How do I tune the vector index?",
+    "retrieved_text": "Raise ef_search for better recall. " * 40,
+}
+
+
+def main(args):
+    env = Environment(
+        loader=FileSystemLoader(str(PROMPT_TEMPLATES_DIR)), autoescape=True
+    )
+    registry = PromptRegistry(PROMPT_TEMPLATES_DIR)
+
+    def stat_and_load():
+        if not (PROMPT_TEMPLATES_DIR / TEMPLATE).exists():
+            raise ValueError(TEMPLATE)
+        return env.get_template(TEMPLATE).render(CONTEXT)
+
+    def registry_render():
+        return registry.render(TEMPLATE, CONTEXT)
+
+    assert stat_and_load() == registry_render()
+    for name, func in (
+        ("stat + get_template", stat_and_load),
+        ("registry", registry_render),
+    ):
+        seconds = min(timeit.repeat(func, number=args.calls, repeat=args.repeat))
+        print(f"{name:>20}: {seconds / args.calls * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
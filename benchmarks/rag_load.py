@@ -0,0 +1,265 @@
+"""Offline load test of the RAG path.
+
+Starts the Postgres image the test suite uses (testcontainers) and the fake
+Ollama server from ``benchmarks.fake_ollama``, migrates the database, seeds
+``--pages`` pages with ``PageFactory`` plus synthetic chunk vectors, then
+drives concurrent ``POST /v1/chat`` and ``GET /v1/pages`` requests against
+the application in-process. Needs Docker, but no GPU and no network.
+
+The report is JSON: throughput and p50/p95/p99 per endpoint and per RAG
+stage. Save one with ``--output`` and pass it as ``--baseline`` to a later
+run to compare; the run fails when a p95 regresses by more than
+``--tolerance``.
+
+Usage:
+
+    python -m benchmarks.rag_load --pages 500 --chats 200 --output base.json
+    python -m benchmarks.rag_load --baseline base.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from testcontainers.postgres import PostgresContainer
+
+from benchmarks.common import summarize
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaSettings, fake_embedding
+
+# same image as tests/conftest.py
+POSTGRES_IMAGE = "timescale/timescaledb-ha:pg17"
+
+# the vectorizer's chunking, see the migration creating it
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 400
+
+
+class StageRecorder:
+    """Stands in for ``RAG_STAGE_LATENCY`` and keeps every observation."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def labels(self, stage):
+        return _StageObserver(self, stage)
+
+
+class _StageObserver:
+    def __init__(self, recorder: StageRecorder, stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def observe(self, value: float):
+        self.recorder.samples[self.stage].append(value)
+        self.recorder.histogram.labels(self.stage).observe(value)
+
+
+def configure_environment(postgres: PostgresContainer, ollama: FakeOllama):
+    """Point the application config at the containers; must run before import."""
+    os.environ.update(
+        POSTGRES_USER=postgres.POSTGRES_USER,
+        POSTGRES_PASSWORD=postgres.POSTGRES_PASSWORD,
+        POSTGRES_DB=postgres.POSTGRES_DB,
+        POSTGRES_HOST=postgres.get_container_host_ip(),
+        POSTGRES_PORT=str(postgres.get_exposed_port(5432)),
+        OLLAMA_HOST=ollama.url,
+        OLLAMA_GENERATION_MODEL="fake-generation",
+        OLLAMA_EMBEDDING_MODEL="fake-embedding",
+        PGAI_INSTALL_ON_STARTUP="false",
+    )
+
+
+def chunk_text(text: str) -> list[str]:
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    return [text[i : i + CHUNK_SIZE] for i in range(0, max(len(text) - step, 1), step)]
+
+
+async def prepare_database(pages: int, seed: int) -> list[str]:
+    """Migrate, seed pages and their chunk vectors; return the page titles."""
+    from faker import Faker
+    from pgvector.sqlalchemy import Vector
+    from sqlalchemy import column, insert, table, text
+
+    from app.common.database import ENGINE, SessionLocal
+    from app.common.factories import PageFactory
+    from app.common.models import EMBEDDING_DIMENSIONS
+    from app.common.pgai_setup import ensure_pgai_installed
+
+    async with ENGINE.begin() as connection:
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    await ensure_pgai_installed(ENGINE)
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], check=True)
+
+    store = table(
+        "pages_embeddings_store",
+        column("id"),
+        column("chunk_seq"),
+        column("chunk"),
+        column("embedding", Vector(EMBEDDING_DIMENSIONS)),
+    )
+    Faker.seed(seed)
+    titles = []
+    async with SessionLocal() as session:
+        PageFactory._meta.sqlalchemy_session = session
+        for _ in range(pages):
+            page = await PageFactory()
+            titles.append(page.title)
+            rows = [
+                {
+                    "id": page.id,
+                    "chunk_seq": seq,
+                    "chunk": chunk,
+                    # the vectorizer embeds "$title - $chunk"
+                    "embedding": fake_embedding(f"{page.title} - {chunk}"),
+                }
+                for seq, chunk in enumerate(chunk_text(page.content))
+            ]
+            await session.execute(insert(store), rows)
+            await session.commit()
+    return titles
+
+
+async def timed_requests(send, count: int, concurrency: int, result: dict):
+    samples, errors = [], 0
+    remaining = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for index in remaining:
+            start = time.perf_counter()
+            try:
+                response = await send(index)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result.update(
+        summarize(samples),
+        errors=errors,
+        throughput_rps=round(len(samples) / elapsed, 2) if elapsed else 0.0,
+    )
+
+
+async def run_load(args, titles: list[str]) -> dict:
+    import app.common.metrics as metrics
+    from app import create_app
+    from app.common.llm import close_llm_client
+
+    recorder = StageRecorder(metrics.RAG_STAGE_LATENCY)
+    metrics.RAG_STAGE_LATENCY = recorder
+
+    rng = random.Random(args.seed)
+    questions = [
+        f"What does {rng.choice(titles).rstrip('.')} say?" for _ in range(args.chats)
+    ]
+    report = {"chat": {}, "pages": {}}
+    transport = httpx.ASGITransport(app=create_app())
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            await asyncio.gather(
+                timed_requests(
+                    lambda i: client.post("/v1/chat", json={"message": questions[i]}),
+                    args.chats,
+                    args.chat_concurrency,
+                    report["chat"],
+                ),
+                timed_requests(
+                    lambda i: client.get("/v1/pages", params={"limit": args.page_size}),
+                    args.page_requests,
+                    args.page_concurrency,
+                    report["pages"],
+                ),
+            )
+    finally:
+        await close_llm_client()
+
+    report["stages"] = {
+        stage: summarize(samples) for stage, samples in sorted(recorder.samples.items())
+    }
+    return report
+
+
+def _p95s(report: dict) -> dict[str, float]:
+    p95s = {group: report[group]["p95_ms"] for group in ("chat", "pages")}
+    for stage, summary in report["stages"].items():
+        p95s[f"stage {stage}"] = summary["p95_ms"]
+    return p95s
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """p95 regressions beyond ``tolerance`` (0.2 = 20% slower)."""
+    previous = _p95s(baseline)
+    return [
+        f"{name}: p95 {previous[name]} -> {p95} ms"
+        for name, p95 in _p95s(report).items()
+        if previous.get(name) and p95 > previous[name] * (1 + tolerance)
+    ]
+
+
+def main(args):
+    settings = FakeOllamaSettings(
+        embed_latency=args.embed_latency,
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        tokens=args.tokens,
+    )
+    with PostgresContainer(POSTGRES_IMAGE) as postgres, FakeOllama(settings) as ollama:
+        configure_environment(postgres, ollama)
+
+        async def run():
+            titles = await prepare_database(args.pages, args.seed)
+            return await run_load(args, titles)
+
+        report = asyncio.run(run())
+
+    report["settings"] = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "baseline", "tolerance")
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--chat-concurrency", type=int, default=16)
+    parser.add_argument("--page-requests", type=int, default=400)
+    parser.add_argument("--page-concurrency", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    main(parser.parse_args())
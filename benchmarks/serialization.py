@@ -0,0 +1,81 @@
+"""Bytes on the wire and serialization time of a ``/pages`` response.
+
+A page list with full ``content`` is serialized the way each response class
+does it: ``JSONResponse`` (``jsonable_encoder`` + ``json.dumps``, the FastAPI
+default) and ``ORJSONResponse`` (the application default). The rendered body
+is then compressed with every encoder available to ``CompressionMiddleware``.
+
+Usage:
+
+    python -m benchmarks.serialization --pages 1000 --content-size 4000
+"""
+
+import argparse
+import random
+import string
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.common.compression import available_encoders
+from app.v1.schema import PageListResponse, PageOut
+
+WORDS = ["".join(random.choices(string.ascii_lowercase, k=n)) for n in range(2, 12)]
+
+
+def make_response(pages: int, content_size: int) -> PageListResponse:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for index in range(pages):
+        words = random.choices(WORDS * 50, k=content_size // 6)
+        rows.append(
+            PageOut(
+                id=index,
+                uuid=uuid.uuid4(),
+                title=f"page {index}",
+                content=" ".join(words)[:content_size],
+                created_at=now,
+                updated_at=now,
+            )
+        )
+    return PageListResponse(pages=rows, next_cursor="b64cursor")
+
+
+def main(args):
+    payload = make_response(args.pages, args.content_size)
+
+    renderers = {
+        "JSONResponse": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        "ORJSONResponse": lambda: ORJSONResponse(payload.model_dump(mode="json")).body,
+    }
+    body = b""
+    print(f"{args.pages} pages of {args.content_size} characters:")
+    for name, render in renderers.items():
+        seconds = min(timeit.repeat(render, number=args.calls, repeat=args.repeat))
+        body = render()
+        print(
+            f"{name:>16}: {seconds / args.calls * 1000:8.2f} ms/request"
+            f"  {len(body):>10} bytes"
+        )
+
+    for encoding, compress in available_encoders().items():
+        seconds = min(
+            timeit.repeat(lambda: compress(body), number=args.calls, repeat=args.repeat)
+        )
+        size = len(compress(body))
+        print(
+            f"{'+ ' + encoding:>16}: {seconds / args.calls * 1000:8.2f} ms/request"
+            f"  {size:>10} bytes ({size / len(body):.1%})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--content-size", type=int, default=4000)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,186 @@
+"""Worker cold start: import time breakdown and time to first response.
+
+Each run starts a fresh interpreter, imports ``app``, builds an application
+with ``create_app()``, runs its lifespan startup the way uvicorn does and
+serves one request to it in-process, so only the cost of booting a worker is
+measured, not the network or the database. Like the workers ``start.sh``
+starts, the probe runs with ``PGAI_INSTALL_ON_STARTUP=false``; the backlog
+monitor is off because there is no database to poll.
+
+The slowest imports come from ``python -X importtime``, both by their own
+time and by the cumulative time of the application's direct imports.
+
+Usage:
+
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import summarize
+
+# Budget for import + create_app() + lifespan startup + first response of a
+# fresh worker, in seconds. The benchmark-marked test in
+# tests/common/test_startup.py fails when a change exceeds it.
+COLD_START_BUDGET = 4.0
+# Headroom for shared CI runners; the default test run fails only past
+# COLD_START_BUDGET * COLD_START_CI_MULTIPLIER, which still catches an
+# eagerly imported heavy dependency.
+COLD_START_CI_MULTIPLIER = 2.0
+
+PROBE_ENV = {"PGAI_INSTALL_ON_STARTUP": "false", "VECTORIZER_METRICS_INTERVAL": "0"}
+
+RESULT_PREFIX = "cold-start: "
+PROBE = (
+    """
+import asyncio, json, sys, time
+
+RESULT_PREFIX = "%s"
+
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+
+async def start_lifespan():
+    # drive the ASGI lifespan protocol like a server does
+    received = asyncio.Queue()
+    sent = asyncio.Queue()
+    task = asyncio.create_task(
+        application({"type": "lifespan", "asgi": {"version": "3.0"}}, received.get, sent.put)
+    )
+    await received.put({"type": "lifespan.startup"})
+    message = await sent.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(message)
+
+    async def shutdown():
+        await received.put({"type": "lifespan.shutdown"})
+        await sent.get()
+        await task
+
+    return shutdown
+
+async def first_response():
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/metrics", "raw_path": b"/metrics",
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+    }
+    await application(scope, receive, send)
+    return messages[0]["status"]
+
+async def boot():
+    global started
+    shutdown = await start_lifespan()
+    started = time.perf_counter()
+    status = await first_response()
+    responded = time.perf_counter()
+    await shutdown()
+    return status, responded
+
+status, responded = asyncio.run(boot())
+print(RESULT_PREFIX + json.dumps({
+    "status": status,
+    "import_s": imported - start,
+    "create_app_s": created - imported,
+    "startup_s": started - created,
+    "first_response_s": responded - started,
+    "total_s": responded - start,
+    "modules": sorted(sys.modules),
+}))
+"""
+    % RESULT_PREFIX
+)
+
+
+def measure_cold_start() -> dict:
+    """Boot one fresh worker process and return its startup timings."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, **PROBE_ENV},
+    )
+    # the application logs to stdout too, pick the probe's own line
+    [line] = [
+        line for line in result.stdout.splitlines() if line.startswith(RESULT_PREFIX)
+    ]
+    timings = json.loads(line[len(RESULT_PREFIX) :])
+    timings["process_s"] = time.perf_counter() - start
+    return timings
+
+
+def import_breakdown() -> list[tuple[str, int, int, int]]:
+    """``(module, depth, self us, cumulative us)`` for every import of ``app``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def print_breakdown(modules, top: int):
+    print(f"slowest imports by own time (top {top}):")
+    for name, _, self_us, _ in sorted(modules, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    # depth 1 are the modules imported directly while importing ``app``
+    direct = [module for module in modules if module[1] == 1]
+    print(f"slowest direct imports of app by cumulative time (top {top}):")
+    for name, _, _, cumulative_us in sorted(direct, key=lambda m: m[3], reverse=True)[
+        :top
+    ]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+
+def main(args):
+    print_breakdown(import_breakdown(), args.top)
+
+    runs = [measure_cold_start() for _ in range(args.runs)]
+    report = {
+        stage: summarize([run[stage] for run in runs])
+        for stage in (
+            "import_s",
+            "create_app_s",
+            "startup_s",
+            "first_response_s",
+            "total_s",
+        )
+    }
+    report["budget_s"] = COLD_START_BUDGET
+    report["within_budget"] = max(run["total_s"] for run in runs) <= COLD_START_BUDGET
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    main(parser.parse_args())
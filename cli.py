@@ -0,0 +1,206 @@
+"""Operational commands for the application.
+
+Usage:
+
+    python cli.py install-pgai
+    python cli.py export-pages --output pages.ndjson
+    python cli.py build-vector-snapshot
+    python cli.py create-embedding-profile recursive_800_80
+    python cli.py embedding-profile-report --recall-target 0.9
+    python cli.py switch-embedding-profile recursive_800_80
+    python cli.py drop-embedding-profile default
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+from app.common.database import ENGINE, SessionLocal
+from app.common.embedding_profiles import (
+    PROFILES,
+    SWITCHABLE_PROFILES,
+    cheapest_meeting_target,
+    create_profile,
+    drop_profile,
+    get_profile,
+    profile_report,
+    switch_profile,
+)
+from app.common.export import ExportFormat, export_pages
+from app.common.memory_index import build_snapshot
+from app.common.pgai_setup import ensure_pgai_installed
+from config import CONFIG
+
+
+async def install_pgai_command(args):
+    try:
+        await ensure_pgai_installed(ENGINE)
+    finally:
+        await ENGINE.dispose()
+
+
+async def export_pages_command(args):
+    output = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    try:
+        async with SessionLocal() as session:
+            async for chunk in export_pages(
+                session, ExportFormat(args.format), not args.no_embeddings
+            ):
+                output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        await ENGINE.dispose()
+
+
+async def build_vector_snapshot_command(args):
+    try:
+        await build_snapshot(ENGINE, Path(args.directory))
+    finally:
+        await ENGINE.dispose()
+
+
+async def create_embedding_profile_command(args):
+    try:
+        await create_profile(ENGINE, get_profile(args.profile))
+    finally:
+        await ENGINE.dispose()
+
+
+async def switch_embedding_profile_command(args):
+    try:
+        await switch_profile(
+            ENGINE, get_profile(args.profile), args.max_pending, args.grace
+        )
+        if CONFIG.RETRIEVAL_BACKEND == "memory":
+            # the snapshot holds the outgoing chunks, workers map the new one
+            await build_snapshot(ENGINE, Path(CONFIG.MEMORY_INDEX_DIR))
+    finally:
+        await ENGINE.dispose()
+
+
+async def drop_embedding_profile_command(args):
+    try:
+        await drop_profile(ENGINE, get_profile(args.profile))
+    finally:
+        await ENGINE.dispose()
+
+
+async def embedding_profile_report_command(args):
+    queries = None
+    if args.queries:
+        with open(args.queries) as file:
+            queries = [json.loads(line) for line in file if line.strip()]
+    try:
+        reports = await profile_report(ENGINE, queries, args.sample, args.k, args.seed)
+    finally:
+        await ENGINE.dispose()
+
+    result = {"k": args.k, "profiles": [asdict(report) for report in reports]}
+    if args.recall_target is not None:
+        best = cheapest_meeting_target(reports, args.recall_target)
+        result["recall_target"] = args.recall_target
+        result["recommended"] = best.profile if best else None
+    print(json.dumps(result, indent=2))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gen AI LLM API commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    install_parser = commands.add_parser(
+        "install-pgai", help="Install or upgrade the pgai library in the database"
+    )
+    install_parser.set_defaults(handler=install_pgai_command)
+
+    export_parser = commands.add_parser(
+        "export-pages", help="Stream pages and their embeddings to a file"
+    )
+    export_parser.add_argument(
+        "--output", default="-", help="File to write, '-' for stdout"
+    )
+    export_parser.add_argument(
+        "--format", choices=[item.value for item in ExportFormat], default="ndjson"
+    )
+    export_parser.add_argument(
+        "--no-embeddings", action="store_true", help="Only export the pages"
+    )
+    export_parser.set_defaults(handler=export_pages_command)
+
+    snapshot_parser = commands.add_parser(
+        "build-vector-snapshot",
+        help="Write the snapshot the in-memory vector index maps",
+    )
+    snapshot_parser.add_argument("--directory", default=CONFIG.MEMORY_INDEX_DIR)
+    snapshot_parser.set_defaults(handler=build_vector_snapshot_command)
+
+    create_profile_parser = commands.add_parser(
+        "create-embedding-profile",
+        help="Create a profile's vectorizer next to the active one and backfill it",
+    )
+    create_profile_parser.add_argument("profile", choices=sorted(PROFILES))
+    create_profile_parser.set_defaults(handler=create_embedding_profile_command)
+
+    evaluation_only = sorted(set(PROFILES) - set(SWITCHABLE_PROFILES))
+    switch_profile_parser = commands.add_parser(
+        "switch-embedding-profile",
+        help="Point retrieval at a backfilled profile in one transaction",
+        description="Evaluation-only profiles cannot be switched to: "
+        + ", ".join(evaluation_only),
+    )
+    switch_profile_parser.add_argument("profile", choices=SWITCHABLE_PROFILES)
+    switch_profile_parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=0,
+        help="Pages the profile may still have queued",
+    )
+    switch_profile_parser.add_argument(
+        "--grace",
+        type=float,
+        default=5.0,
+        help="Seconds the worker gets to finish a batch of the outgoing profile",
+    )
+    switch_profile_parser.set_defaults(handler=switch_embedding_profile_command)
+
+    drop_profile_parser = commands.add_parser(
+        "drop-embedding-profile",
+        help="Drop an inactive profile's vectorizer and tables",
+    )
+    drop_profile_parser.add_argument("profile", choices=sorted(PROFILES))
+    drop_profile_parser.set_defaults(handler=drop_embedding_profile_command)
+
+    report_parser = commands.add_parser(
+        "embedding-profile-report",
+        help="Storage and recall of every created profile, as JSON",
+        description="Profiles with evaluation_only set are measured but never "
+        "recommended, they cannot be switched to",
+    )
+    report_parser.add_argument(
+        "--queries",
+        help='JSON lines of {"question": ..., "page": <page uuid>}; '
+        "by default a sentence is sampled from random pages",
+    )
+    report_parser.add_argument("--sample", type=int, default=200)
+    report_parser.add_argument("--k", type=int, default=CONFIG.RETRIEVAL_CANDIDATES)
+    report_parser.add_argument("--seed", type=int, default=0)
+    report_parser.add_argument(
+        "--recall-target",
+        type=float,
+        help="Recommend the smallest profile with at least this recall",
+    )
+    report_parser.set_defaults(handler=embedding_profile_report_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
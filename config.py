@@ -1,7 +1,12 @@
+import atexit
+import json
+import logging
+import random
 from functools import lru_cache
 from logging.config import dictConfig
+from logging.handlers import QueueHandler
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 from decouple import config
 from pydantic import Field, PostgresDsn, ValidationInfo, field_validator
@@ -10,12 +15,74 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 BASE_DIR = Path.cwd()
 
 LOG_LEVEL = config("LOG_LEVEL", default="debug").upper()
+# "rich" for local development, "json" for production
+LOG_FORMAT = config("LOG_FORMAT", default="rich").lower()
+LOG_DEBUG_SAMPLE_RATE = config("LOG_DEBUG_SAMPLE_RATE", default=0.01, cast=float)
 LOG_DIR = BASE_DIR / "logs"
 PROMPT_TEMPLATES_DIR = BASE_DIR / "app/common/prompt_templates"
 
 
-dictConfig(
-    dict(
+class RichConsoleHandler(logging.Handler):
+    """RichHandler created on the first record, so importing rich does not
+    slow down worker boot."""
+
+    def __init__(self, **options):
+        super().__init__()
+        self._options = options
+        self._handler = None
+
+    def emit(self, record):
+        if self._handler is None:
+            from rich.logging import RichHandler
+
+            self._handler = RichHandler(level=self.level, **self._options)
+            self._handler.setFormatter(self.formatter)
+        self._handler.emit(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Lets through only a ``rate`` fraction of the DEBUG records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them.
+
+    ``QueueHandler.prepare`` formats the message in the calling thread so
+    records can cross process boundaries. The listener is a thread of the
+    same process, so the message is built there, off the event loop.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def rich_logging_config() -> dict:
+    """Colored console output, for local development."""
+    return dict(
         version=1,
         formatters={
             "default": {
@@ -25,7 +92,7 @@ dictConfig(
         },
         handlers={
             "console": {
-                "class": "rich.logging.RichHandler",
+                "()": RichConsoleHandler,
                 "formatter": "rich",
                 "level": "DEBUG",
                 "rich_tracebacks": True,
@@ -49,7 +116,54 @@ dictConfig(
             }
         },
     )
-)
+
+
+def json_logging_config() -> dict:
+    """JSON lines written by a background thread, for production.
+
+    Loggers only put records on a queue; a ``QueueListener`` thread formats
+    and writes them. DEBUG records are sampled before they are queued.
+    """
+    return dict(
+        version=1,
+        formatters={"json": {"()": JsonFormatter}},
+        filters={
+            "debug_sampler": {"()": DebugSampler, "rate": LOG_DEBUG_SAMPLE_RATE},
+            "app_only": {"name": "app"},
+        },
+        handlers={
+            "stdout": {
+                "class": "logging.StreamHandler",
+                "formatter": "json",
+                "stream": "ext://sys.stdout",
+            },
+            "file": {
+                "formatter": "json",
+                "filters": ["app_only"],
+                "class": "logging.handlers.TimedRotatingFileHandler",
+                "filename": LOG_DIR / "app.log",
+                "when": "D",
+                "interval": 1,
+                "backupCount": 7,
+            },
+            "queue": {
+                "class": BackgroundQueueHandler,
+                "handlers": ["stdout", "file"],
+                "filters": ["debug_sampler"],
+            },
+        },
+        root={"handlers": ["queue"], "level": "INFO"},
+        loggers={"app": {"level": LOG_LEVEL}},
+    )
+
+
+if LOG_FORMAT == "json":
+    dictConfig(json_logging_config())
+    _log_listener = logging.getHandlerByName("queue").listener
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+else:
+    dictConfig(rich_logging_config())
 
 
 class Config(BaseSettings):
@@ -61,6 +175,14 @@ class Config(BaseSettings):
     POSTGRES_HOST: str = Field(default="localhost")
     POSTGRES_PORT: int = Field(default=5432)
     POSTGRES_DB: str = Field(default="postgres")
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    DB_POOL_TIMEOUT: float = Field(default=30.0)
+    DB_POOL_RECYCLE: int = Field(default=1800)
+    DB_POOL_PRE_PING: bool = Field(default=False)
+    DB_POOL_SLOW_CHECKOUT: float = Field(default=0.1)
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=100)
+    DB_PGBOUNCER_MODE: bool = Field(default=False)
     OLLAMA_DOMAIN: str = Field(default="localhost")
     OLLAMA_PORT: str = Field(default="11434")
     OLLAMA_GENERATION_MODEL: str
@@ -68,7 +190,77 @@ class Config(BaseSettings):
 
     DATABASE_URL: str = Field(default="")
     PGAI_DATABASE_URL: str = Field(default="")
+    PGAI_INSTALL_ON_STARTUP: bool = Field(default=False)
     OLLAMA_HOST: str = Field(default="")
+    OLLAMA_MAX_CONCURRENCY: int = Field(default=4)
+    OLLAMA_MAX_CONNECTIONS: int = Field(default=10)
+    OLLAMA_REQUEST_TIMEOUT: float = Field(default=120.0)
+    OLLAMA_QUEUE_TIMEOUT: float = Field(default=30.0)
+    OLLAMA_STREAM_IDLE_TIMEOUT: float = Field(default=30.0)
+
+    EMBEDDING_CACHE_SIZE: int = Field(default=1024)
+    EMBEDDING_CACHE_TTL: float = Field(default=3600.0)
+    EMBEDDING_BATCHING: bool = Field(default=True)
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(default=32)
+    EMBEDDING_BATCH_MAX_WAIT: float = Field(default=0.005)
+    EMBEDDING_BACKEND: Literal["ollama", "local"] = Field(default="ollama")
+    LOCAL_EMBEDDING_MODEL: str = Field(default="nomic-ai/nomic-embed-text-v1.5")
+    LOCAL_EMBEDDING_RUNTIME: Literal["torch", "onnx"] = Field(default="torch")
+    LOCAL_EMBEDDING_QUERY_PREFIX: str = Field(default="")
+    LOCAL_EMBEDDING_BATCH_SIZE: int = Field(default=32)
+    LOCAL_EMBEDDING_THREADS: int = Field(default=1)
+    LOCAL_EMBEDDING_TRUST_REMOTE_CODE: bool = Field(default=False)
+    LOCAL_EMBEDDING_OLLAMA_MODEL: str = Field(default="nomic-embed-text")
+
+    PAGES_DEFAULT_LIMIT: int = Field(default=100)
+    PAGES_MAX_LIMIT: int = Field(default=1000)
+
+    BULK_INSERT_BATCH_SIZE: int = Field(default=1000)
+    BULK_INSERT_METHOD: Literal["copy", "insert"] = Field(default="copy")
+    PAGE_EMBEDDING_WAIT_TIMEOUT: float = Field(default=30.0)
+    PAGE_EMBEDDING_WAIT_INTERVAL: float = Field(default=0.5)
+    VECTORIZER_METRICS_INTERVAL: float = Field(default=15.0)
+
+    EXPORT_BATCH_SIZE: int = Field(default=500)
+
+    ANSWER_CACHE_ENABLED: bool = Field(default=True)
+    ANSWER_CACHE_MAX_DISTANCE: float = Field(default=0.05)
+
+    VECTOR_INDEX_METHOD: Literal["hnsw", "diskann"] = Field(default="hnsw")
+    HNSW_M: int = Field(default=16)
+    HNSW_EF_CONSTRUCTION: int = Field(default=64)
+    HNSW_EF_SEARCH: int = Field(default=40)
+    DISKANN_NUM_NEIGHBORS: int = Field(default=50)
+    DISKANN_SEARCH_LIST_SIZE: int = Field(default=100)
+    DISKANN_QUERY_SEARCH_LIST_SIZE: int = Field(default=100)
+    DISKANN_QUERY_RESCORE: int = Field(default=50)
+
+    RETRIEVAL_MODE: Literal["vector", "text", "hybrid"] = Field(default="vector")
+    RETRIEVAL_BACKEND: Literal["postgres", "memory"] = Field(default="postgres")
+    MEMORY_INDEX_DIR: str = Field(default="data/vector_index")
+    MEMORY_INDEX_POLL_INTERVAL: float = Field(default=5.0)
+    MEMORY_INDEX_REBUILD_INTERVAL: float = Field(default=900.0)
+    MEMORY_INDEX_SEQ_OVERLAP: int = Field(default=100)
+    FULL_TEXT_SEARCH_CONFIG: str = Field(default="english")
+    HYBRID_VECTOR_CANDIDATES: int = Field(default=10)
+    HYBRID_TEXT_CANDIDATES: int = Field(default=20)
+    RRF_K: int = Field(default=60)
+
+    RETRIEVAL_CANDIDATES: int = Field(default=10)
+    QUERY_EXPANSION: bool = Field(default=False)
+    QUERY_EXPANSION_MAX_QUERIES: int = Field(default=4)
+    RERANKER: Literal["none", "mmr", "cross_encoder"] = Field(default="mmr")
+    RERANK_MODEL: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    MMR_LAMBDA: float = Field(default=0.7)
+    DEDUPE_THRESHOLD: float = Field(default=0.5)
+    CONTEXT_MAX_CHUNKS: int = Field(default=5)
+    CONTEXT_TOKEN_BUDGET: int = Field(default=1024)
+    CHARS_PER_TOKEN: float = Field(default=4.0)
+
+    PROMPT_HOT_RELOAD: bool = Field(default=False)
+    PROMPT_RELOAD_INTERVAL: float = Field(default=2.0)
+
+    COMPRESSION_MIN_SIZE: int = Field(default=1024)
 
     @field_validator("DATABASE_URL", mode="before")
     @classmethod
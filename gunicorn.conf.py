@@ -0,0 +1,9 @@
+import os
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # drop the live gauges of a worker that exited so /metrics stops summing them
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -11,11 +11,15 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from app.common.database import Base
 from app.common.pg_extension import register_operations as pg_ext_register_operations
+from app.common.pg_vector_index import (
+    register_operations as pg_vector_index_register_operations,
+)
 from config import CONFIG
 
 
 pgai_register_operations()
 pg_ext_register_operations()
+pg_vector_index_register_operations()
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,42 @@
+"""add ANN index on pages_embeddings_store
+
+Revision ID: 5859f65566a5
+Revises: 02798e54b562
+Create Date: 2026-10-18 09:40:12.318204
+
+"""
+
+from alembic import op
+from config import CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision = "5859f65566a5"
+down_revision = "02798e54b562"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if CONFIG.VECTOR_INDEX_METHOD == "diskann":
+        op.create_extension("vectorscale", cascade=True)
+        options = {
+            "num_neighbors": CONFIG.DISKANN_NUM_NEIGHBORS,
+            "search_list_size": CONFIG.DISKANN_SEARCH_LIST_SIZE,
+        }
+    else:
+        options = {
+            "m": CONFIG.HNSW_M,
+            "ef_construction": CONFIG.HNSW_EF_CONSTRUCTION,
+        }
+
+    op.create_vector_index(
+        "ix_pages_embeddings_embedding",
+        "pages_embeddings_store",
+        method=CONFIG.VECTOR_INDEX_METHOD,
+        options=options,
+    )
+
+
+def downgrade() -> None:
+    op.drop_vector_index("ix_pages_embeddings_embedding")
@@ -0,0 +1,55 @@
+"""add answer_cache table
+
+Revision ID: 8a873273e910
+Revises: 5859f65566a5
+Create Date: 2026-10-18 10:05:41.902113
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "8a873273e910"
+down_revision = "5859f65566a5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "answer_cache",
+        sa.Column("query_embedding", Vector(768), nullable=False),
+        sa.Column(
+            "chunk_ids", postgresql.ARRAY(postgresql.UUID(as_uuid=True)), nullable=False
+        ),
+        sa.Column("page_ids", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("template_version", sa.String(length=64), nullable=False),
+        sa.Column("answer", sa.String(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("uuid", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_answer_cache_uuid"), "answer_cache", ["uuid"], unique=True)
+    op.create_vector_index(
+        "ix_answer_cache_query_embedding",
+        "answer_cache",
+        column_name="query_embedding",
+    )
+
+
+def downgrade() -> None:
+    op.drop_vector_index("ix_answer_cache_query_embedding")
+    op.drop_index(op.f("ix_answer_cache_uuid"), table_name="answer_cache")
+    op.drop_table("answer_cache")
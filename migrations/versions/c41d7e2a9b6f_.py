@@ -0,0 +1,46 @@
+"""add full-text search column on pages_embeddings_store
+
+Revision ID: c41d7e2a9b6f
+Revises: 8a873273e910
+Create Date: 2026-10-18 11:02:37.540918
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from config import CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision = "c41d7e2a9b6f"
+down_revision = "8a873273e910"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "pages_embeddings_store",
+        sa.Column(
+            "chunk_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                f"to_tsvector('{CONFIG.FULL_TEXT_SEARCH_CONFIG}'::regconfig, chunk)",
+                persisted=True,
+            ),
+        ),
+    )
+    op.create_index(
+        "ix_pages_embeddings_store_chunk_tsv",
+        "pages_embeddings_store",
+        ["chunk_tsv"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_pages_embeddings_store_chunk_tsv", table_name="pages_embeddings_store"
+    )
+    op.drop_column("pages_embeddings_store", "chunk_tsv")
@@ -0,0 +1,32 @@
+"""add insertion sequence on pages_embeddings_store
+
+Revision ID: d5e8f1a3b7c2
+Revises: c41d7e2a9b6f
+Create Date: 2026-10-18 14:21:05.118462
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d5e8f1a3b7c2"
+down_revision = "c41d7e2a9b6f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # monotonically increasing per inserted chunk, the high-water mark the
+    # in-memory vector index polls for new rows with
+    op.add_column(
+        "pages_embeddings_store",
+        sa.Column("seq", sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    )
+    op.create_index("ix_pages_embeddings_store_seq", "pages_embeddings_store", ["seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pages_embeddings_store_seq", table_name="pages_embeddings_store")
+    op.drop_column("pages_embeddings_store", "seq")
@@ -0,0 +1,25 @@
+"""add index on pages.created_at
+
+Revision ID: f3c9a6d2e8b1
+Revises: d5e8f1a3b7c2
+Create Date: 2026-10-18 16:12:44.287310
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f3c9a6d2e8b1"
+down_revision = "d5e8f1a3b7c2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the answer cache lookup checks for pages newer than an entry
+    op.create_index("ix_pages_created_at", "pages", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pages_created_at", table_name="pages")
@@ -1,5 +1,15 @@
 #!/bin/sh
 
+# JSON logs written by a background thread, see readme "Logging"
+export LOG_FORMAT="${LOG_FORMAT:-json}"
+
+# database setup happens once per deploy, so workers boot without any DDL
+python cli.py install-pgai
 alembic upgrade head
 
+# shared directory for the per-worker Prometheus samples, emptied on every start
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 gunicorn --worker-class uvicorn.workers.UvicornWorker -w 4 -b :8000 "app:create_app()"
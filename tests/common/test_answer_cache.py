@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from app.common.answer_cache import lookup_cached_answer, store_answer
+from app.common.models import EMBEDDING_DIMENSIONS, AnswerCache
+from app.common.rag import RetrievedChunk
+from app.v1.logic import create_page_content, insert_page_batch
+from app.v1.schema import PageSchema
+
+
+def unit_vector(index):
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    vector[index] = 1.0
+    return vector
+
+
+async def cache_answer(session, page, query_embedding, answer="cached answer"):
+    chunk = RetrievedChunk(uuid4(), page.id, page.title, "test content", 0.0)
+    await store_answer(session, query_embedding, [chunk], "model", "v1", answer)
+
+
+@pytest.mark.asyncio
+async def test_lookup_cached_answer_matches_close_queries(test_session):
+    page = await create_page_content(
+        test_session, PageSchema(title="testpage", content="test content")
+    )
+    await cache_answer(test_session, page, unit_vector(0))
+
+    hit = await lookup_cached_answer(test_session, unit_vector(0), "model", "v1")
+    miss = await lookup_cached_answer(test_session, unit_vector(1), "model", "v1")
+    other_template = await lookup_cached_answer(
+        test_session, unit_vector(0), "model", "v2"
+    )
+
+    assert hit == "cached answer"
+    assert miss is None
+    assert other_template is None
+
+
+@pytest.mark.asyncio
+async def test_new_pages_make_older_answers_miss(test_session):
+    page = await create_page_content(
+        test_session, PageSchema(title="testpage", content="test content")
+    )
+    await cache_answer(test_session, page, unit_vector(0))
+
+    await create_page_content(
+        test_session, PageSchema(title="another", content="more content")
+    )
+
+    # the entry is kept, it is only skipped
+    entries = (await test_session.execute(select(AnswerCache))).scalars().all()
+    assert len(entries) == 1
+    assert (
+        await lookup_cached_answer(test_session, unit_vector(0), "model", "v1") is None
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_inserted_pages_make_older_answers_miss(test_session):
+    page = await create_page_content(
+        test_session, PageSchema(title="testpage", content="test content")
+    )
+    await cache_answer(test_session, page, unit_vector(0))
+
+    await insert_page_batch(
+        test_session, [PageSchema(title="another", content="more content")]
+    )
+
+    assert (
+        await lookup_cached_answer(test_session, unit_vector(0), "model", "v1") is None
+    )
+
+
+@pytest.mark.asyncio
+async def test_updating_a_source_page_skips_its_cached_answers(test_session):
+    page = await create_page_content(
+        test_session, PageSchema(title="testpage", content="test content")
+    )
+    await cache_answer(test_session, page, unit_vector(0))
+
+    page.content = "changed content"
+    await test_session.commit()
+
+    assert (
+        await lookup_cached_answer(test_session, unit_vector(0), "model", "v1") is None
+    )
@@ -0,0 +1,113 @@
+import importlib.util
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from httpx import AsyncClient
+
+from app.common.compression import (
+    CompressionMiddleware,
+    available_encoders,
+    choose_encoding,
+)
+
+LARGE = {"content": "lorem ipsum dolor sit amet " * 200}
+
+
+def make_app():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, min_size=1024)
+
+    @app.get("/large")
+    async def large():
+        return LARGE
+
+    @app.get("/small")
+    async def small():
+        return {"content": "tiny"}
+
+    @app.get("/stream")
+    async def stream():
+        async def parts():
+            for _ in range(3):
+                yield b"x" * 2048
+
+        return StreamingResponse(parts(), media_type="application/x-ndjson")
+
+    return app
+
+
+def test_choose_encoding_honours_q_values_and_preference():
+    encodings = ["zstd", "br", "gzip"]
+    assert choose_encoding("gzip, deflate, br, zstd", encodings) == "zstd"
+    assert choose_encoding("zstd;q=0.5, gzip", encodings) == "gzip"
+    assert choose_encoding("gzip;q=0, deflate", encodings) is None
+    assert choose_encoding("*", encodings) == "zstd"
+    assert choose_encoding("identity", encodings) is None
+
+
+@pytest.mark.asyncio
+async def test_large_responses_are_gzipped():
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(LARGE["content"])
+    # httpx decodes gzip transparently
+    assert response.json() == LARGE
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("zstandard") is None,
+    reason="zstandard is not installed (compression extra)",
+)
+@pytest.mark.asyncio
+async def test_zstd_is_preferred_when_available():
+    assert "zstd" in available_encoders()
+
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get(
+            "/large", headers={"Accept-Encoding": "gzip, br, zstd"}
+        )
+
+    assert response.headers["content-encoding"] == "zstd"
+    # httpx decodes zstd transparently when zstandard is installed
+    assert response.json() == LARGE
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("brotli") is None,
+    reason="brotli is not installed (compression extra)",
+)
+@pytest.mark.asyncio
+async def test_brotli_is_used_when_zstd_is_not_accepted():
+    assert "br" in available_encoders()
+
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    # httpx decodes brotli transparently when brotli is installed
+    assert response.json() == LARGE
+
+
+@pytest.mark.asyncio
+async def test_small_and_streaming_responses_are_not_compressed():
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        stream = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"content": "tiny"}
+    assert "content-encoding" not in stream.headers
+    assert stream.content == b"x" * 6144
+
+
+@pytest.mark.asyncio
+async def test_without_accept_encoding_the_body_is_identity():
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == LARGE
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.common import database
+from app.common.database import InstrumentedQueuePool, PoolStats
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_overflow_and_timeouts(monkeypatch):
+    stats = PoolStats()
+    monkeypatch.setattr(database, "POOL_STATS", stats)
+    pool = InstrumentedQueuePool(
+        FakeConnection, pool_size=1, max_overflow=1, timeout=0.01
+    )
+
+    def exhaust_pool():
+        connections = [pool.connect(), pool.connect()]
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        return connections
+
+    connections = await greenlet_spawn(exhaust_pool)
+
+    snapshot = stats.snapshot(pool)
+    assert snapshot["checkouts"] == 2
+    assert snapshot["overflow_events"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checked_out"] == 2
+    assert snapshot["overflow"] == 1
+    assert len(connections) == 2
+
+
+def test_engine_options_pgbouncer_mode(monkeypatch):
+    monkeypatch.setattr(database.CONFIG, "DB_PGBOUNCER_MODE", True)
+
+    connect_args = database.engine_options()["connect_args"]
+
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["prepared_statement_name_func"]().startswith("__asyncpg_")
@@ -0,0 +1,111 @@
+import pytest
+from pgai.vectorizer.configuration import (
+    DestinationTableConfig,
+    EmbeddingOllamaConfig,
+    FormattingPythonTemplateConfig,
+    LoadingColumnConfig,
+)
+from pgai.vectorizer.create_vectorizer import CreateVectorizer
+from sqlalchemy import text
+
+from app.common.database import Base
+from app.common.embedding_profiles import (
+    ACTIVE_DESTINATION,
+    PROFILES,
+    create_profile,
+    profile_states,
+    store_extension_statements,
+    switch_profile,
+)
+from app.common.models import AnswerCache, Page
+from app.common.pgai_setup import ensure_pgai_installed
+
+
+def active_vectorizer_sql():
+    """What migration 02798e54b562 creates, the default profile while active."""
+    default = PROFILES["default"]
+    return CreateVectorizer(
+        source=Page.__tablename__,
+        name=default.vectorizer_name,
+        destination=DestinationTableConfig(destination=ACTIVE_DESTINATION),
+        loading=LoadingColumnConfig(column_name="content"),
+        embedding=EmbeddingOllamaConfig(
+            model=default.model, dimensions=default.dimensions
+        ),
+        chunking=default.chunking,
+        formatting=FormattingPythonTemplateConfig(template=default.template),
+    ).to_sql()
+
+
+async def trigger_source(connection, vectorizer):
+    return await connection.scalar(
+        text(
+            "SELECT p.prosrc FROM ai.vectorizer v "
+            "JOIN pg_proc p ON p.proname = v.trigger_name "
+            "JOIN pg_namespace n ON n.oid = p.pronamespace "
+            "AND n.nspname = v.queue_schema "
+            "WHERE v.name = :name"
+        ),
+        {"name": vectorizer},
+    )
+
+
+@pytest.mark.asyncio
+async def test_switch_profile_repoints_tables_configs_and_triggers(
+    test_engine, postgres_container
+):
+    db_url = postgres_container.get_connection_url().replace(
+        "postgresql+psycopg2://", "postgresql://"
+    )
+    await ensure_pgai_installed(test_engine, db_url)
+    async with test_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Page.__table__.create)
+        await connection.run_sync(AnswerCache.__table__.create)
+        await connection.execute(text(active_vectorizer_sql()))
+        for statement in store_extension_statements(ACTIVE_DESTINATION):
+            await connection.execute(text(statement))
+
+    default = PROFILES["default"]
+    incoming = PROFILES["char_800_100"]
+    try:
+        await create_profile(test_engine, incoming)
+        # no pages, so nothing is left to backfill
+        await switch_profile(test_engine, incoming, grace=0)
+
+        async with test_engine.connect() as connection:
+            states = await profile_states(connection)
+            assert states[incoming.name].active
+            assert states[incoming.name].store == f"{ACTIVE_DESTINATION}_store"
+            assert not states[default.name].active
+            assert states[default.name].store == f"{default.destination}_store"
+            assert states[default.name].disabled
+
+            # the triggers delete from the tables they now write to
+            assert f"{ACTIVE_DESTINATION}_store" in await trigger_source(
+                connection, incoming.vectorizer_name
+            )
+            assert f"{default.destination}_store" in await trigger_source(
+                connection, default.vectorizer_name
+            )
+
+            # page writes are queued for the incoming vectorizer
+            await connection.execute(
+                text(
+                    "INSERT INTO pages (uuid, title, content) "
+                    "VALUES (gen_random_uuid(), 'title', 'content')"
+                )
+            )
+            queued = await connection.scalar(
+                text("SELECT ai.vectorizer_queue_pending(:name, true)"),
+                {"name": incoming.vectorizer_name},
+            )
+            assert queued == 1
+            await connection.rollback()
+    finally:
+        async with test_engine.begin() as connection:
+            for profile in (default, incoming):
+                await connection.execute(
+                    text("SELECT ai.drop_vectorizer(:name, drop_all => true)"),
+                    {"name": profile.vectorizer_name},
+                )
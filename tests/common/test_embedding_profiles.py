@@ -0,0 +1,143 @@
+import random
+
+import pytest
+
+from app.common.embedding_profiles import (
+    ACTIVE_DESTINATION,
+    PROFILES,
+    SWITCHABLE_PROFILES,
+    EmbeddingProfile,
+    ProfileReport,
+    _profile_of,
+    check_pgai_internals,
+    cheapest_meeting_target,
+    renamed,
+    sample_sentences,
+    store_extension_statements,
+    switch_profile,
+)
+from app.common.vectorizer import VECTORIZER_NAME
+
+
+def report(profile, total_bytes, recall, pending=0, evaluation_only=False):
+    return ProfileReport(
+        profile=profile,
+        vectorizer=f"{VECTORIZER_NAME}_{profile}",
+        active=False,
+        disabled=False,
+        model="nomic-embed-text",
+        dimensions=768,
+        evaluation_only=evaluation_only,
+        pending_items=pending,
+        pages=10,
+        chunks=40,
+        chunks_per_page=4.0,
+        table_bytes=total_bytes,
+        index_bytes=0,
+        total_bytes=total_bytes,
+        recall_at_k=recall,
+    )
+
+
+def test_default_profile_is_the_migrated_vectorizer():
+    default = PROFILES["default"]
+
+    assert default.vectorizer_name == VECTORIZER_NAME
+    assert default.chunking.chunk_size == 800
+    assert default.chunking.chunk_overlap == 400
+    assert _profile_of(VECTORIZER_NAME) == "default"
+    assert _profile_of(PROFILES["char_800_100"].vectorizer_name) == "char_800_100"
+    assert _profile_of("other_embedder") is None
+
+
+def test_create_vectorizer_sql_writes_next_to_the_active_table():
+    sql = PROFILES["recursive_800_80"].create_vectorizer_sql()
+
+    assert "name => 'pages_content_embedder_recursive_800_80'" in sql
+    assert "destination=> 'pages_embeddings_recursive_800_80'" in sql
+    assert "ai.chunking_recursive_character_text_splitter(chunk_size=> '800'" in sql
+    assert "template=> '$title - $chunk'" in sql
+
+
+def test_profile_names_are_validated():
+    with pytest.raises(ValueError):
+        EmbeddingProfile("Bad-Name", PROFILES["default"].chunking)
+
+
+def test_other_dimensions_are_evaluation_only():
+    with pytest.raises(ValueError, match="evaluation-only"):
+        EmbeddingProfile("small", PROFILES["default"].chunking, dimensions=384)
+
+    assert PROFILES["minilm_384"].evaluation_only
+    assert "minilm_384" not in SWITCHABLE_PROFILES
+    assert "recursive_800_80" in SWITCHABLE_PROFILES
+
+
+@pytest.mark.asyncio
+async def test_evaluation_only_profiles_cannot_be_switched_to():
+    # refused before the engine is touched
+    with pytest.raises(ValueError, match="evaluation-only"):
+        await switch_profile(None, PROFILES["minilm_384"])
+
+
+def test_switching_renames_indexes_to_the_migrations_names():
+    destination = PROFILES["sentences_500_50"].destination
+    indexes = [
+        statement.split()[2].strip('"')
+        for statement in store_extension_statements(destination)
+        if statement.startswith("CREATE INDEX")
+    ] + [f"{destination}_store_pkey"]
+
+    assert [renamed(index, destination, ACTIVE_DESTINATION) for index in indexes] == [
+        "ix_pages_embeddings_store_chunk_tsv",
+        "ix_pages_embeddings_store_seq",
+        "ix_pages_embeddings_embedding",
+        "pages_embeddings_store_pkey",
+    ]
+    assert renamed("unrelated_index", destination, ACTIVE_DESTINATION) is None
+
+
+def test_sample_sentences_picks_a_long_enough_sentence():
+    content = "Too short. The vectorizer splits every page into chunks! Ok?"
+
+    assert (
+        sample_sentences(content, random.Random(0))
+        == "The vectorizer splits every page into chunks!"
+    )
+    assert sample_sentences("Too short. Really.", random.Random(0)) is None
+
+
+def test_cheapest_meeting_target_ignores_unfinished_and_inaccurate_profiles():
+    reports = [
+        report("default", 1000, 0.95),
+        report("char_800_100", 500, 0.92),
+        report("minilm_384", 50, 0.99, evaluation_only=True),
+        report("sentences_500_50", 100, 0.99, pending=3),
+    ]
+
+    assert cheapest_meeting_target(reports, 0.9).profile == "char_800_100"
+    assert cheapest_meeting_target(reports, 0.99) is None
+
+
+class FakeConnection:
+    def __init__(self, *results):
+        self.results = list(results)
+
+    async def scalar(self, statement, parameters=None):
+        return self.results.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_switch_refuses_unsupported_pgai_versions():
+    # to_regclass(ai.pgai_lib_version), then the recorded version
+    with pytest.raises(RuntimeError, match="0.11.0"):
+        await check_pgai_internals(FakeConnection("ai.pgai_lib_version", "0.11.0"))
+
+    with pytest.raises(RuntimeError, match="_vectorizer_build_trigger_definition"):
+        await check_pgai_internals(
+            FakeConnection("ai.pgai_lib_version", "0.10.0", None)
+        )
+
+    await check_pgai_internals(
+        FakeConnection("ai.pgai_lib_version", "0.10.0", "builder")
+    )
@@ -0,0 +1,209 @@
+import asyncio
+import importlib.util
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from app.common.embeddings import (
+    EmbeddingBatcher,
+    EmbeddingCache,
+    EmbeddingService,
+    LocalEmbeddingBackend,
+    check_local_model_matches,
+    normalize_query,
+)
+from app.common.models import EMBEDDING_DIMENSIONS
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    async def embed(self, model, texts):
+        self.calls.append(texts)
+        await asyncio.sleep(0.01)
+        return [[float(len(text))] for text in texts]
+
+
+def test_normalize_query_collapses_whitespace():
+    assert normalize_query("  What is\tpgai?\n") == "What is pgai?"
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(maxsize=2, ttl=60)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    cache.get("a")
+    cache.set("c", [3.0])
+
+    assert cache.get("a") == [1.0]
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_embedding_cache_expires_entries():
+    cache = EmbeddingCache(maxsize=2, ttl=-1)
+    cache.set("a", [1.0])
+
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_embedding_service_caches_normalized_queries():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder, "model", EmbeddingCache(8, 60))
+
+    first = await service.embed_query("what is pgai")
+    second = await service.embed_query("  what  is pgai ")
+
+    assert first == second
+    assert embedder.calls == [["what is pgai"]]
+
+
+@pytest.mark.asyncio
+async def test_embedding_service_shares_concurrent_misses():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder, "model", EmbeddingCache(8, 60))
+
+    results = await asyncio.gather(*(service.embed_query("pgai") for _ in range(5)))
+
+    assert len(embedder.calls) == 1
+    assert all(result == [4.0] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_fail_shared_misses():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder, "model", EmbeddingCache(8, 60))
+
+    first = asyncio.create_task(service.embed_query("pgai"))
+    second = asyncio.create_task(service.embed_query("pgai"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == [4.0]
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert len(embedder.calls) == 1
+    assert service.cache.get(("model", "pgai")) == [4.0]
+
+
+@pytest.mark.asyncio
+async def test_embed_queries_fetches_misses_in_one_call():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder, "model", EmbeddingCache(8, 60))
+    await service.embed_query("cached")
+
+    embeddings = await service.embed_queries(["cached", "new one", "new  one", "x"])
+
+    assert embeddings == [[6.0], [7.0], [7.0], [1.0]]
+    assert embedder.calls == [["cached"], ["new one", "x"]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_concurrent_requests():
+    embedder = CountingEmbedder()
+    batcher = EmbeddingBatcher(embedder, "model", max_batch_size=8, max_wait=0.01)
+
+    embeddings = await asyncio.gather(
+        *(batcher.embed(text) for text in ["a", "bb", "ccc", "bb"])
+    )
+
+    assert embeddings == [[1.0], [2.0], [3.0], [2.0]]
+    assert embedder.calls == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_full_batches_without_waiting():
+    embedder = CountingEmbedder()
+    batcher = EmbeddingBatcher(embedder, "model", max_batch_size=2, max_wait=60)
+
+    embeddings = await asyncio.wait_for(
+        asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "ccc", "dddd"])),
+        timeout=1,
+    )
+
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0]]
+    assert embedder.calls == [["a", "bb"], ["ccc", "dddd"]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_fans_out_errors():
+    class FailingEmbedder:
+        async def embed(self, model, texts):
+            raise RuntimeError("ollama down")
+
+    batcher = EmbeddingBatcher(FailingEmbedder(), "model", 8, 0.001)
+
+    results = await asyncio.gather(
+        batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size, convert_to_numpy, normalize_embeddings):
+        self.calls.append((texts, threading.current_thread().name))
+        return np.array([[float(len(text))] for text in texts])
+
+
+@pytest.mark.asyncio
+async def test_local_backend_encodes_batches_off_the_event_loop():
+    encoder = RecordingEncoder()
+    backend = LocalEmbeddingBackend(
+        encoder, batch_size=8, query_prefix="q: ", threads=1
+    )
+    try:
+        embeddings = await backend.embed("model", ["a", "bb"])
+    finally:
+        await backend.close()
+
+    [(texts, thread_name)] = encoder.calls
+    assert embeddings == [[4.0], [5.0]]
+    assert texts == ["q: a", "q: bb"]
+    assert thread_name.startswith("embedding")
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("sentence_transformers") is not None,
+    reason="sentence-transformers is installed",
+)
+def test_local_backend_requires_sentence_transformers():
+    with pytest.raises(RuntimeError, match="local-embeddings"):
+        LocalEmbeddingBackend.from_pretrained("model", "torch", 8, "", 1)
+
+
+def test_local_backend_does_not_trust_remote_code_by_default(monkeypatch):
+    loaded = []
+
+    class SentenceTransformer:
+        def __init__(self, model_name, **kwargs):
+            loaded.append(kwargs)
+
+        def get_sentence_embedding_dimension(self):
+            return EMBEDDING_DIMENSIONS
+
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = SentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+
+    LocalEmbeddingBackend.from_pretrained("model", "torch", 8, "", 1)
+    LocalEmbeddingBackend.from_pretrained(
+        "model", "torch", 8, "", 1, trust_remote_code=True
+    )
+
+    assert [kwargs["trust_remote_code"] for kwargs in loaded] == [False, True]
+
+
+def test_local_model_must_match_the_vectorizer_model():
+    check_local_model_matches("nomic-embed-text", "nomic-embed-text:latest")
+
+    with pytest.raises(RuntimeError, match="all-minilm"):
+        check_local_model_matches("nomic-embed-text", "all-minilm")
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.common import expansion
+from app.common.expansion import fuse_rankings, retrieve_expanded, split_query
+from app.common.rag import RetrievedChunk
+
+
+def chunk(chunk_id, distance):
+    return RetrievedChunk(chunk_id, 1, "title", f"text {chunk_id}", distance)
+
+
+def test_split_query_splits_sentences_and_clauses():
+    question = "What is pgai and how does it store vectors? Which index is used?"
+
+    assert split_query(question, 4) == [
+        question,
+        "What is pgai",
+        "how does it store vectors?",
+        "Which index is used?",
+    ]
+    assert len(split_query(question, 2)) == 2
+
+
+def test_split_query_keeps_simple_questions_whole():
+    assert split_query("What is pgai?", 4) == ["What is pgai?"]
+    assert split_query("Compare salt and pepper", 4) == ["Compare salt and pepper"]
+
+
+def test_fuse_rankings_deduplicates_and_keeps_best_distance():
+    fused = fuse_rankings(
+        [[chunk("a", 0.3), chunk("b", 0.4)], [chunk("a", 0.1), chunk("c", 0.2)]],
+        limit=2,
+        rrf_k=60,
+    )
+
+    assert [item.chunk_id for item in fused] == ["a", "b"]
+    assert fused[0].distance == 0.1
+    assert fused[0].score == pytest.approx(2 / 61)
+
+
+@pytest.mark.asyncio
+async def test_retrieve_expanded_searches_concurrently(monkeypatch):
+    sessions = []
+
+    @asynccontextmanager
+    async def session_factory():
+        sessions.append(object())
+        yield sessions[-1]
+
+    async def slow_search(session, embedding, query_text, **kwargs):
+        await asyncio.sleep(0.1)
+        return [chunk(query_text, embedding[0])]
+
+    monkeypatch.setattr(expansion, "retrieve_chunks_for_query", slow_search)
+
+    start = time.perf_counter()
+    results = await retrieve_expanded(
+        ["q1", "q2", "q3"],
+        [[0.1], [0.2], [0.3]],
+        limit=5,
+        session_factory=session_factory,
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.2
+    assert len(set(map(id, sessions))) == 3
+    assert [item.chunk_id for item in results] == ["q1", "q2", "q3"]
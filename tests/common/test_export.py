@@ -0,0 +1,36 @@
+import io
+
+import numpy as np
+import pytest
+
+from app.common import export
+from app.common.models import EMBEDDING_DIMENSIONS
+
+
+async def fake_records(session, include_embeddings=True):
+    yield export.PAGE_RECORD, {"id": 1, "title": "page"}, None
+    yield (
+        export.EMBEDDING_RECORD,
+        {"page_id": 1, "chunk_seq": 0, "chunk": "chunk"},
+        export.vector_to_bytes(np.arange(EMBEDDING_DIMENSIONS)),
+    )
+
+
+@pytest.mark.asyncio
+async def test_binary_export_round_trip(monkeypatch):
+    monkeypatch.setattr(export, "iter_export_records", fake_records)
+
+    data = b"".join([chunk async for chunk in export.export_binary(None)])
+    records = list(export.read_binary_export(io.BytesIO(data)))
+
+    assert [record_type for record_type, _, _ in records] == [b"P", b"E"]
+    assert records[0][1] == {"id": 1, "title": "page"}
+    assert records[1][2].dtype == np.float32
+    assert records[1][2][-1] == EMBEDDING_DIMENSIONS - 1
+
+
+def test_vector_to_bytes_is_raw_float32():
+    assert (
+        export.vector_to_bytes([1.0, 2.0])
+        == np.array([1.0, 2.0], dtype="<f4").tobytes()
+    )
@@ -0,0 +1,87 @@
+from contextlib import aclosing
+
+import httpx
+import numpy as np
+import pytest
+
+from app.common.llm import LLMClient
+from app.common.models import EMBEDDING_DIMENSIONS
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaSettings, fake_embedding
+
+
+@pytest.fixture(scope="module")
+def fake_ollama():
+    settings = FakeOllamaSettings(
+        embed_latency=0, first_token_latency=0, token_latency=0, tokens=4
+    )
+    with FakeOllama(settings) as server:
+        yield server
+
+
+def make_client(server):
+    return LLMClient(
+        host=server.url,
+        max_concurrency=2,
+        request_timeout=5.0,
+        queue_timeout=5.0,
+        max_connections=2,
+    )
+
+
+def test_fake_embeddings_are_deterministic_and_related():
+    vector = np.array(fake_embedding("tuning the vector index"))
+    related = np.array(fake_embedding("how to tune the vector index"))
+    unrelated = np.array(fake_embedding("chocolate cake recipe"))
+
+    assert vector.shape == (EMBEDDING_DIMENSIONS,)  # what the app stores
+    assert fake_embedding("tuning the vector index") == vector.tolist()
+    assert vector @ related > vector @ unrelated
+
+
+@pytest.mark.asyncio
+async def test_llm_client_embeds_against_fake_ollama(fake_ollama):
+    client = make_client(fake_ollama)
+    try:
+        embeddings = await client.embed("fake", ["first text", "second text"])
+    finally:
+        await client.close()
+
+    assert embeddings == [fake_embedding("first text"), fake_embedding("second text")]
+
+
+@pytest.mark.asyncio
+async def test_llm_client_close_closes_its_connection_pool(fake_ollama, monkeypatch):
+    closed = []
+    aclose = httpx.AsyncHTTPTransport.aclose
+
+    async def recording_aclose(transport):
+        closed.append(transport)
+        await aclose(transport)
+
+    monkeypatch.setattr(httpx.AsyncHTTPTransport, "aclose", recording_aclose)
+    client = make_client(fake_ollama)
+    await client.embed("fake", ["text"])
+    await client.close()
+
+    assert closed == [client._transport]
+
+
+@pytest.mark.asyncio
+async def test_llm_client_chats_against_fake_ollama(fake_ollama):
+    client = make_client(fake_ollama)
+    messages = [{"role": "user", "content": "alpha beta"}]
+    try:
+        response = await client.chat(model="fake", messages=messages)
+        parts = []
+        async with aclosing(
+            client.chat_stream(model="fake", messages=messages)
+        ) as stream:
+            async for part in stream:
+                parts.append(part)
+    finally:
+        await client.close()
+
+    assert response.message.content == "alpha beta alpha beta "
+    assert response.eval_count == 4
+    assert "".join(part.message.content for part in parts) == response.message.content
+    assert parts[-1].done and parts[-1].eval_count == 4
@@ -0,0 +1,180 @@
+import asyncio
+from contextlib import aclosing
+from dataclasses import dataclass
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+
+from app.common.llm import LLMClient
+
+
+class SlowChat:
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def chat(self, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return kwargs
+
+
+def make_client(delay, **kwargs):
+    options = dict(
+        host="http://ollama.test",
+        max_concurrency=2,
+        request_timeout=1.0,
+        queue_timeout=1.0,
+        max_connections=2,
+    )
+    options.update(kwargs)
+    client = LLMClient(**options)
+    client._client = SlowChat(delay)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_llm_client_bounds_concurrency():
+    client = make_client(0.05)
+
+    await asyncio.gather(*(client.chat("model", []) for _ in range(6)))
+
+    assert client._client.max_active == 2
+
+
+@pytest.mark.asyncio
+async def test_llm_client_times_out_slow_generation():
+    client = make_client(0.5, request_timeout=0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await client.chat("model", [])
+
+    assert exc_info.value.status_code == HTTPStatus.GATEWAY_TIMEOUT
+
+
+@pytest.mark.asyncio
+async def test_llm_client_rejects_when_queue_is_full():
+    client = make_client(0.5, max_concurrency=1, queue_timeout=0.05)
+
+    results = await asyncio.gather(
+        client.chat("model", []), client.chat("model", []), return_exceptions=True
+    )
+
+    assert any(
+        isinstance(result, HTTPException)
+        and result.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        for result in results
+    )
+
+
+@dataclass
+class Part:
+    content: str = "token"
+    done: bool = False
+
+
+class EndlessStream:
+    def __init__(self):
+        self.closed = False
+
+    async def chat(self, stream=False, **kwargs):
+        async def parts():
+            try:
+                while True:
+                    await asyncio.sleep(0)
+                    yield Part()
+            finally:
+                self.closed = True
+
+        return parts()
+
+
+@pytest.mark.asyncio
+async def test_llm_client_stream_closes_upstream_when_abandoned():
+    client = make_client(0)
+    client._client = EndlessStream()
+
+    async with aclosing(client.chat_stream("model", [])) as parts:
+        async for _ in parts:
+            break
+
+    assert client._client.closed
+    assert not client._semaphore.locked()
+
+
+class TimedStream:
+    def __init__(self, gaps):
+        self.gaps = gaps
+
+    async def chat(self, stream=False, **kwargs):
+        async def parts():
+            for gap in self.gaps:
+                await asyncio.sleep(gap)
+                yield Part()
+
+        return parts()
+
+
+@pytest.mark.asyncio
+async def test_llm_client_stream_deadline_ignores_slow_consumers():
+    client = make_client(0, request_timeout=0.1, stream_idle_timeout=0.1)
+    client._client = TimedStream([0, 0, 0])
+
+    parts = []
+    async for part in client.chat_stream("model", []):
+        await asyncio.sleep(0.08)
+        parts.append(part)
+
+    assert parts == [Part()] * 3
+
+
+@pytest.mark.asyncio
+async def test_llm_client_stream_times_out_stalled_upstream():
+    client = make_client(0, request_timeout=1.0, stream_idle_timeout=0.05)
+    client._client = TimedStream([0, 0.5])
+
+    parts = []
+    with pytest.raises(HTTPException) as exc_info:
+        async for part in client.chat_stream("model", []):
+            parts.append(part)
+
+    assert parts == [Part()]
+    assert exc_info.value.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert not client._semaphore.locked()
+
+
+class FinishingStream:
+    def __init__(self):
+        self.closed = False
+
+    async def chat(self, stream=False, **kwargs):
+        async def parts():
+            try:
+                yield Part()
+                yield Part(content="last", done=True)
+            finally:
+                self.closed = True
+
+        return parts()
+
+
+@pytest.mark.asyncio
+async def test_llm_client_stream_releases_the_slot_before_the_final_part():
+    client = make_client(0, max_concurrency=1)
+    client._client = FinishingStream()
+
+    parts = []
+    async for part in client.chat_stream("model", []):
+        if part.done:
+            # a client slow to read the end no longer holds the slot
+            assert client._client.closed
+            assert not client._semaphore.locked()
+        else:
+            assert client._semaphore.locked()
+        parts.append(part)
+
+    assert parts == [Part(), Part(content="last", done=True)]
@@ -0,0 +1,49 @@
+import json
+import logging
+import queue
+
+from config import BackgroundQueueHandler, DebugSampler, JsonFormatter
+
+
+def make_record(level, msg, *args, exc_info=None):
+    return logging.LogRecord("app.test", level, __file__, 1, msg, args, exc_info)
+
+
+def test_json_formatter_writes_one_object_per_record():
+    try:
+        raise ValueError("bad")
+    except ValueError as exc:
+        record = make_record(
+            logging.ERROR,
+            "failed %s",
+            "x",
+            exc_info=(ValueError, exc, exc.__traceback__),
+        )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "failed x"
+    assert "ValueError: bad" in entry["exc_info"]
+
+
+def test_debug_sampler_only_samples_debug_records():
+    sampler = DebugSampler(0.0)
+
+    assert not sampler.filter(make_record(logging.DEBUG, "noise"))
+    assert sampler.filter(make_record(logging.INFO, "kept"))
+    assert DebugSampler(1.0).filter(make_record(logging.DEBUG, "kept"))
+
+
+def test_background_queue_handler_defers_formatting():
+    class Unformattable:
+        def __str__(self):
+            raise AssertionError("formatted on the logging thread")
+
+    records = queue.SimpleQueue()
+    handler = BackgroundQueueHandler(records)
+
+    handler.handle(make_record(logging.INFO, "value %s", Unformattable()))
+
+    assert records.get_nowait().msg == "value %s"
@@ -0,0 +1,106 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.common.memory_index import ChunkRow, MemoryVectorIndex, SnapshotWriter
+from app.common.models import EMBEDDING_DIMENSIONS
+
+
+def unit_vector(*indices):
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    vector[list(indices)] = 1.0
+    return vector
+
+
+def make_row(seq, page_id, embedding, chunk=None):
+    return ChunkRow(
+        seq=seq,
+        chunk_id=uuid4(),
+        page_id=page_id,
+        title=f"page {page_id}",
+        chunk=chunk or f"chunk {seq} of page {page_id}",
+        embedding=embedding,
+    )
+
+
+def write_snapshot(directory, rows):
+    writer = SnapshotWriter(directory, len(rows))
+    writer.add(rows)
+    return writer.commit()
+
+
+@pytest.fixture
+def rows():
+    return [
+        make_row(1, 1, unit_vector(0)),
+        make_row(2, 1, unit_vector(0, 1)),
+        make_row(3, 2, unit_vector(1), chunk="ünïcode chunk"),
+        make_row(5, 3, unit_vector(2)),
+    ]
+
+
+@pytest.fixture
+def index(tmp_path, rows):
+    write_snapshot(tmp_path, rows)
+    index = MemoryVectorIndex(tmp_path)
+    assert index.load()
+    return index
+
+
+def test_search_returns_nearest_chunks_within_threshold(index, rows):
+    results = index.search(unit_vector(0).tolist(), limit=3, similarity_threshold=0.5)
+
+    assert [row[0] for row in results] == [rows[0].chunk_id, rows[1].chunk_id]
+    chunk_id, page_id, title, chunk, distance = results[0]
+    assert (page_id, title, chunk) == (1, "page 1", rows[0].chunk)
+    assert distance == pytest.approx(0.0, abs=1e-6)
+    assert results[1][4] == pytest.approx(1 - 1 / np.sqrt(2), abs=1e-6)
+    assert index.high_water_mark == 5
+
+
+def test_search_decodes_utf8_chunks(index):
+    [result] = index.search(unit_vector(1).tolist(), limit=1, similarity_threshold=0.5)
+
+    assert result[3] == "ünïcode chunk"
+
+
+def test_replace_pages_hides_old_chunks_and_serves_new_ones(index, rows):
+    new_row = make_row(6, 1, unit_vector(3))
+    index.replace_pages([1], [new_row])
+
+    old = index.search(unit_vector(0).tolist(), limit=4, similarity_threshold=0.5)
+    new = index.search(unit_vector(3).tolist(), limit=4, similarity_threshold=0.5)
+
+    assert old == []
+    assert [row[0] for row in new] == [new_row.chunk_id]
+    assert index.unknown_seqs(np.array([1, 4, 5, 6, 7])).tolist() == [
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_load_maps_new_generations_and_resets_the_delta(tmp_path, index, rows):
+    index.replace_pages([3], [])
+    assert index.search(unit_vector(2).tolist(), 1, 0.5) == []
+
+    first_generation = index.current_generation()
+    write_snapshot(tmp_path, rows[2:])
+
+    assert index.load()
+    assert not (tmp_path / first_generation).exists()
+    assert [row[1] for row in index.search(unit_vector(2).tolist(), 1, 0.5)] == [3]
+    assert index.search(unit_vector(0).tolist(), 1, 0.5) == []
+    assert not index.load()
+
+
+def test_empty_snapshot(tmp_path):
+    write_snapshot(tmp_path, [])
+    index = MemoryVectorIndex(tmp_path)
+
+    assert not index.ready
+    assert index.load()
+    assert index.search(unit_vector(0).tolist(), 5, 0.5) == []
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.common.metrics import MetricsMiddleware, observe_stage, record_generation
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_observe_stage_records_latency_even_on_error():
+    before = sample("rag_stage_duration_seconds_count", {"stage": "test_stage"})
+
+    with pytest.raises(RuntimeError):
+        with observe_stage("test_stage"):
+            raise RuntimeError("boom")
+
+    after = sample("rag_stage_duration_seconds_count", {"stage": "test_stage"})
+    assert after == before + 1
+
+
+def test_record_generation_counts_tokens():
+    labels = {"model": "test-model"}
+    record_generation("test-model", SimpleNamespace(eval_count=None))
+    record_generation(
+        "test-model", SimpleNamespace(eval_count=50, eval_duration=2_000_000_000)
+    )
+
+    assert sample("llm_generated_tokens_total", labels) == 50
+    assert sample("llm_tokens_per_second_sum", labels) == 25.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/missing")
+
+    matched = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    unmatched = {"method": "GET", "route": "<unmatched>", "status": "404"}
+    assert sample("http_request_duration_seconds_count", matched) == 2
+    assert sample("http_request_duration_seconds_count", unmatched) == 1
@@ -0,0 +1,51 @@
+import pytest
+
+from app.common.pg_vector_index import (
+    PgAlterVectorIndexOp,
+    PgCreateVectorIndexOp,
+    PgDropVectorIndexOp,
+)
+
+
+def test_create_hnsw_index_statement():
+    op = PgCreateVectorIndexOp(
+        "ix_embedding", "pages_embeddings", options={"m": 16, "ef_construction": 64}
+    )
+
+    assert op.to_sql_statement_create() == (
+        "CREATE INDEX IF NOT EXISTS ix_embedding ON pages_embeddings"
+        " USING hnsw (embedding vector_cosine_ops)"
+        " WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def test_create_diskann_index_statement():
+    op = PgCreateVectorIndexOp(
+        "ix_embedding",
+        "pages_embeddings",
+        method="diskann",
+        schema="public",
+        if_not_exists=False,
+        concurrently=True,
+    )
+
+    assert op.to_sql_statement_create() == (
+        "CREATE INDEX CONCURRENTLY ix_embedding ON public.pages_embeddings"
+        " USING diskann (embedding vector_cosine_ops)"
+    )
+
+
+def test_alter_and_drop_index_statements():
+    alter_op = PgAlterVectorIndexOp("ix_embedding", options={"ef_construction": 128})
+    drop_op = PgDropVectorIndexOp("ix_embedding")
+
+    assert (
+        alter_op.to_sql_statement_alter()
+        == "ALTER INDEX ix_embedding SET (ef_construction = 128)"
+    )
+    assert drop_op.to_sql_statement_drop() == "DROP INDEX IF EXISTS ix_embedding"
+
+
+def test_unknown_index_method_is_rejected():
+    with pytest.raises(ValueError):
+        PgCreateVectorIndexOp("ix_embedding", "pages_embeddings", method="ivfflat")
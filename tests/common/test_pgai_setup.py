@@ -0,0 +1,22 @@
+import pgai
+import pytest
+
+from app.common.pgai_setup import ensure_pgai_installed, installed_pgai_version
+
+
+@pytest.mark.asyncio
+async def test_ensure_pgai_installed_only_installs_once(
+    test_engine, postgres_container
+):
+    db_url = postgres_container.get_connection_url().replace(
+        "postgresql+psycopg2://", "postgresql://"
+    )
+
+    await ensure_pgai_installed(test_engine, db_url)
+    installed_again = await ensure_pgai_installed(test_engine, db_url)
+
+    async with test_engine.connect() as connection:
+        version = await installed_pgai_version(connection)
+
+    assert version == pgai.__version__
+    assert installed_again is False
@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+import pytest
+
+from app.common.prompts import PromptRegistry
+
+
+def write_template(path, source, mtime_ns):
+    path.write_text(source)
+    # set the mtime explicitly, writes within one clock tick keep the same one
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_renders_precompiled_templates(tmp_path):
+    write_template(tmp_path / "hello.j2", "Hello {{ name }}", 1_000)
+
+    registry = PromptRegistry(tmp_path)
+
+    assert registry.render("hello.j2", {"name": "<world>"}) == "Hello &lt;world&gt;"
+    assert len(registry.version("hello.j2")) == 16
+    with pytest.raises(ValueError):
+        registry.render("missing.j2", {})
+
+
+def test_refresh_recompiles_changed_templates_only(tmp_path):
+    write_template(tmp_path / "a.j2", "A {{ x }}", 1_000)
+    write_template(tmp_path / "b.j2", "B {{ x }}", 1_000)
+    registry = PromptRegistry(tmp_path)
+    version_a = registry.version("a.j2")
+
+    write_template(tmp_path / "a.j2", "A2 {{ x }}", 2_000)
+    (tmp_path / "b.j2").unlink()
+
+    assert registry.refresh() == ["a.j2"]
+    assert registry.render("a.j2", {"x": 1}) == "A2 1"
+    assert registry.version("a.j2") != version_a
+    assert "b.j2" not in registry
+
+
+def test_refresh_keeps_last_good_version_of_broken_edit(tmp_path):
+    write_template(tmp_path / "a.j2", "A {{ x }}", 1_000)
+    registry = PromptRegistry(tmp_path)
+
+    write_template(tmp_path / "a.j2", "A {{ x ", 2_000)
+
+    assert registry.refresh() == []
+    assert registry.render("a.j2", {"x": 1}) == "A 1"
+
+
+@pytest.mark.asyncio
+async def test_watch_reloads_in_the_background(tmp_path):
+    write_template(tmp_path / "a.j2", "old", 1_000)
+    registry = PromptRegistry(tmp_path)
+    watcher = asyncio.create_task(registry.watch(0.01))
+
+    write_template(tmp_path / "a.j2", "new", 2_000)
+    for _ in range(100):
+        if registry.render("a.j2", {}) == "new":
+            break
+        await asyncio.sleep(0.01)
+    watcher.cancel()
+
+    assert registry.render("a.j2", {}) == "new"
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.common.models import EMBEDDING_DIMENSIONS
+from app.common.rag import (
+    RetrievalMode,
+    RetrievedChunk,
+    hybrid_chunks_query,
+    nearest_chunks_query,
+    retrieve_chunks_for_query,
+    text_chunks_query,
+)
+
+
+def test_nearest_chunks_query_does_not_select_vectors():
+    stmt = nearest_chunks_query([0.0] * EMBEDDING_DIMENSIONS, 5, 0.5)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    selected = sql.split("FROM", 1)[0]
+    assert "embedding_uuid" in selected
+    assert ".embedding," not in selected
+    assert sql.count("<=>") == 1
+    assert [column.name for column in stmt.selected_columns] == [
+        "embedding_uuid",
+        "id",
+        "title",
+        "chunk",
+        "distance",
+    ]
+
+
+def test_retrieved_chunk_is_slotted():
+    chunk = RetrievedChunk("uuid", 1, "title", "text", 0.25)
+
+    assert not hasattr(chunk, "__dict__")
+    assert (chunk.page_id, chunk.chunk, chunk.distance) == (1, "text", 0.25)
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_text_chunks_query_uses_full_text_index_column():
+    sql = compile_sql(text_chunks_query("product X-100", 5))
+
+    assert "pages_embeddings_store.chunk_tsv @@ websearch_to_tsquery" in sql
+    assert "<=>" not in sql
+
+
+def test_hybrid_chunks_query_fuses_both_legs_in_one_statement():
+    stmt = hybrid_chunks_query([0.0] * EMBEDDING_DIMENSIONS, "X-100", 5, 0.5)
+    sql = compile_sql(stmt)
+
+    assert sql.startswith("WITH vector_leg AS")
+    assert "text_leg AS" in sql
+    assert "FULL OUTER JOIN text_leg" in sql
+    assert sql.count("<=>") == 1
+    assert [column.name for column in stmt.selected_columns][-2:] == [
+        "distance",
+        "score",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_chunks_needs_query_text_outside_vector_mode():
+    with pytest.raises(ValueError):
+        await retrieve_chunks_for_query(None, [], mode=RetrievalMode.HYBRID)
@@ -0,0 +1,75 @@
+import importlib.util
+
+import pytest
+
+from app.common.rag import RetrievedChunk
+from app.common.rerank import (
+    CrossEncoderReranker,
+    MMRReranker,
+    PassthroughReranker,
+    deduplicate_chunks,
+    estimate_tokens,
+    refine_chunks,
+    trim_to_token_budget,
+)
+
+SENTENCE = "the quick brown fox jumps over the lazy dog near the river bank"
+
+
+def make_chunk(text, page_id=1, distance=0.1):
+    return RetrievedChunk(None, page_id, "title", text, distance)
+
+
+def test_deduplicate_chunks_drops_overlap_within_a_page():
+    first = make_chunk(SENTENCE + " while birds sing")
+    overlapping = make_chunk(SENTENCE + " at dawn", distance=0.2)
+    other_page = make_chunk(SENTENCE, page_id=2, distance=0.3)
+    distinct = make_chunk("an entirely different chunk about databases", distance=0.4)
+
+    kept = deduplicate_chunks([first, overlapping, other_page, distinct], 0.5)
+
+    assert kept == [first, other_page, distinct]
+
+
+def test_mmr_prefers_diverse_chunks():
+    relevant = make_chunk("postgres vector index tuning guide", distance=0.10)
+    near_copy = make_chunk("postgres vector index tuning guide again", distance=0.11)
+    diverse = make_chunk("ollama model generation speed", distance=0.20)
+
+    ranked = MMRReranker(0.5).rerank("query", [relevant, near_copy, diverse], 2)
+
+    assert ranked == [relevant, diverse]
+
+
+def test_mmr_uses_text_scores_without_distances():
+    weak = RetrievedChunk(None, 1, "title", "weak match", None, 0.1)
+    strong = RetrievedChunk(None, 1, "title", "strong match", None, 0.9)
+
+    assert MMRReranker(0.7).rerank("query", [weak, strong], 1) == [strong]
+
+
+def test_trim_to_token_budget_keeps_at_least_one_chunk():
+    chunks = [make_chunk("a" * 400), make_chunk("b" * 400), make_chunk("c" * 400)]
+
+    assert estimate_tokens("a" * 400) == 100
+    assert trim_to_token_budget(chunks, 250) == chunks[:2]
+    assert trim_to_token_budget(chunks, 10) == chunks[:1]
+
+
+@pytest.mark.asyncio
+async def test_refine_chunks_runs_the_pipeline():
+    chunks = [make_chunk(SENTENCE), make_chunk(SENTENCE + " again", distance=0.2)]
+
+    refined = await refine_chunks("fox", chunks, PassthroughReranker())
+
+    assert refined == chunks[:1]
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("torch") is not None
+    and importlib.util.find_spec("transformers") is not None,
+    reason="torch and transformers are installed",
+)
+def test_cross_encoder_names_the_rerank_extra():
+    with pytest.raises(RuntimeError, match="rerank extra"):
+        CrossEncoderReranker("model")
@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.startup import (
+    COLD_START_BUDGET,
+    COLD_START_CI_MULTIPLIER,
+    measure_cold_start,
+)
+
+
+@pytest.mark.benchmark
+def test_cold_start_is_within_budget():
+    timings = measure_cold_start()
+
+    assert timings["status"] == 200
+    assert timings["total_s"] < COLD_START_BUDGET, timings
+
+
+def test_cold_start_is_within_ci_budget():
+    # the probe fails unless the lifespan starts and shuts down cleanly, with
+    # no pgai install and no database
+    timings = measure_cold_start()
+
+    assert timings["status"] == 200
+    assert timings["total_s"] < COLD_START_BUDGET * COLD_START_CI_MULTIPLIER, timings
+    assert "ollama" not in timings["modules"]
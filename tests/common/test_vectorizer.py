@@ -0,0 +1,81 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.common import vectorizer
+from app.common.vectorizer import (
+    VectorizerBacklog,
+    record_backlog,
+    wait_for_page_embeddings,
+)
+
+
+@asynccontextmanager
+async def session_factory():
+    yield object()
+
+
+def fake_states(monkeypatch, states):
+    polls = []
+
+    async def page_embedding_state(session, page_id, name):
+        polls.append(page_id)
+        return states[min(len(polls), len(states)) - 1]
+
+    monkeypatch.setattr(vectorizer, "page_embedding_state", page_embedding_state)
+    return polls
+
+
+@pytest.mark.asyncio
+async def test_wait_for_page_embeddings_polls_until_dequeued(monkeypatch):
+    polls = fake_states(monkeypatch, [(True, False), (True, False), (False, True)])
+
+    embedded = await wait_for_page_embeddings(
+        7, timeout=5, interval=0, session_factory=session_factory
+    )
+
+    assert embedded is True
+    assert polls == [7, 7, 7]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_page_embeddings_times_out(monkeypatch):
+    fake_states(monkeypatch, [(True, False)])
+
+    embedded = await wait_for_page_embeddings(
+        7, timeout=0.05, interval=0.01, session_factory=session_factory
+    )
+
+    assert embedded is False
+
+
+@pytest.mark.asyncio
+async def test_wait_for_page_embeddings_reports_pages_left_without_chunks(
+    monkeypatch,
+):
+    fake_states(monkeypatch, [(False, False)])
+
+    embedded = await wait_for_page_embeddings(
+        7, timeout=5, interval=0, session_factory=session_factory
+    )
+
+    assert embedded is False
+
+
+def test_record_backlog_sets_gauges():
+    labels = {"vectorizer": "test_vectorizer"}
+    record_backlog(
+        VectorizerBacklog(
+            name="test_vectorizer",
+            disabled=False,
+            pending_items=None,
+            failed_items=2,
+            oldest_queued_at=None,
+            lag_seconds=12.5,
+        )
+    )
+
+    assert REGISTRY.get_sample_value("vectorizer_pending_items", labels) == 10001
+    assert REGISTRY.get_sample_value("vectorizer_failed_items", labels) == 2
+    assert REGISTRY.get_sample_value("vectorizer_lag_seconds", labels) == 12.5
@@ -1,13 +1,42 @@
+import asyncio
+import json
 from http import HTTPStatus
+from uuid import uuid4
 
 import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
 
 from app.common.database import get_session
 from app.common.dependencies import is_valid
-from app.v1.logic import create_page_content, get_all_pages
-from app.v1.schema import PageSchema
+from app.common.embeddings import (
+    EmbeddingCache,
+    EmbeddingService,
+    get_embedding_service,
+)
+from app.common.llm import LLMClient, get_llm_client
+from app.common.models import AnswerCache, Page
+from app.v1 import logic
+from app.v1.logic import (
+    CHAT_PROMPT_TEMPLATE,
+    create_page_content,
+    decode_cursor,
+    encode_cursor,
+    encode_stream_event,
+    get_all_pages,
+    insert_page_batch,
+)
+from app.v1.schema import PageSchema, StreamFormat
+from app.common.rag import render_from_template
+from benchmarks.fake_ollama import (
+    FakeOllama,
+    FakeOllamaSettings,
+    fake_answer_tokens,
+    fake_embedding,
+)
 
 V1_ENDPOINT = "/v1"
+CHUNK = "raise maintenance_work_mem before building the vector index"
 
 
 @pytest.fixture
@@ -18,6 +47,80 @@ def dependency_overrides(application, get_test_session):
     application.dependency_overrides = {}
 
 
+@pytest.fixture(scope="module")
+def fake_ollama():
+    settings = FakeOllamaSettings(
+        embed_latency=0,
+        first_token_latency=0,
+        token_latency=0,
+        # enough to repeat every word of the chat prompt
+        tokens=64,
+        last_token_on_done=True,
+    )
+    with FakeOllama(settings) as server:
+        yield server
+
+
+def make_llm_client(server, max_concurrency=2):
+    return LLMClient(
+        host=server.url,
+        max_concurrency=max_concurrency,
+        request_timeout=5.0,
+        queue_timeout=0.5,
+        max_connections=2,
+    )
+
+
+def override_models(overrides, llm_client):
+    overrides[get_llm_client] = lambda: llm_client
+    overrides[get_embedding_service] = lambda: EmbeddingService(
+        llm_client, "fake", EmbeddingCache(16, 60)
+    )
+
+
+@pytest_asyncio.fixture
+async def llm_client(dependency_overrides, fake_ollama):
+    client = make_llm_client(fake_ollama)
+    override_models(dependency_overrides, client)
+    yield client
+    await client.close()
+
+
+@pytest_asyncio.fixture
+async def indexed_page(test_session, page_factory):
+    """A page with one embedded chunk, as the vectorizer would leave it."""
+    page = await page_factory(title="index tuning", content=CHUNK)
+    test_session.add(
+        Page.content_embeddings(
+            embedding_uuid=str(uuid4()),
+            id=page.id,
+            chunk=CHUNK,
+            embedding=fake_embedding(CHUNK),
+            chunk_seq=0,
+        )
+    )
+    await test_session.commit()
+    return page
+
+
+def chat_payload(message=CHUNK):
+    # a single query keeps retrieval on the request's own session
+    return {"message": message, "mode": "vector", "expand": False}
+
+
+def parse_sse(body: str) -> list[tuple[str | None, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: "):
+                data = json.loads(line.removeprefix("data: "))
+        events.append((event, data))
+    return events
+
+
 @pytest.mark.usefixtures("dependency_overrides")
 @pytest.mark.asyncio
 async def test_get_pages(client, page_factory):
@@ -31,6 +134,51 @@ async def test_get_pages(client, page_factory):
     assert response.json()["pages"][0]["title"] == page.title
 
 
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_get_pages_keyset_pagination(client, page_factory):
+    pages = [await page_factory(title=f"page {index}") for index in range(3)]
+
+    first = await client.get(f"{V1_ENDPOINT}/pages", params={"limit": 2})
+    second = await client.get(
+        f"{V1_ENDPOINT}/pages",
+        params={"limit": 2, "cursor": first.json()["next_cursor"]},
+    )
+
+    assert first.status_code == HTTPStatus.OK
+    assert [page["id"] for page in first.json()["pages"]] == [
+        page.id for page in pages[:2]
+    ]
+    assert [page["id"] for page in second.json()["pages"]] == [pages[2].id]
+    assert second.json()["next_cursor"] is None
+
+
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_get_pages_fields_and_count(client, page_factory):
+    await page_factory(title="testpage")
+
+    response = await client.get(
+        f"{V1_ENDPOINT}/pages", params={"fields": "title", "count": "exact"}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["total"] == 1
+    assert set(response.json()["pages"][0]) == {"id", "title"}
+
+
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_get_pages_rejects_unknown_fields(client):
+    response = await client.get(f"{V1_ENDPOINT}/pages", params={"fields": "secret"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
 @pytest.mark.usefixtures("dependency_overrides")
 @pytest.mark.asyncio
 async def test_get_page(client, test_session):
@@ -78,3 +226,206 @@ async def test_create_page_content(client, test_session):
     assert response.status_code == HTTPStatus.OK
     assert response.json()["page"]
     assert len(pages) == 1
+
+
+@pytest.mark.parametrize(
+    "stream_format, event, expected",
+    [
+        (StreamFormat.NDJSON, None, '{"token": "hi"}\n'),
+        (StreamFormat.SSE, None, 'data: {"token": "hi"}\n\n'),
+        (StreamFormat.SSE, "done", 'event: done\ndata: {"token": "hi"}\n\n'),
+    ],
+)
+def test_encode_stream_event(stream_format, event, expected):
+    assert encode_stream_event(stream_format, {"token": "hi"}, event) == expected
+
+
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_bulk_create_pages(client, test_session):
+    payload = [
+        {"title": "first", "content": "first content"},
+        {"title": "missing content"},
+        {"title": "second", "content": "second content"},
+    ]
+
+    response = await client.post(f"{V1_ENDPOINT}/pages:bulk", json=payload)
+
+    pages = await get_all_pages(test_session)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["created"] == 2
+    assert [error["index"] for error in response.json()["errors"]] == [1]
+    assert [page.title for page in pages] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_insert_page_batch_copy_rolls_back_with_the_batch(
+    test_session, monkeypatch
+):
+    async def fail_after_copy():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(logic.CONFIG, "BULK_INSERT_METHOD", "copy")
+    monkeypatch.setattr(test_session, "commit", fail_after_copy)
+
+    with pytest.raises(RuntimeError):
+        await insert_page_batch(
+            test_session, [PageSchema(title="copied", content="copied content")]
+        )
+    await test_session.rollback()
+
+    assert await test_session.scalar(select(func.count()).select_from(Page)) == 0
+
+
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_bulk_create_pages_ndjson(client, test_session):
+    body = '{"title": "first", "content": "first content"}\nnot json\n'
+
+    response = await client.post(
+        f"{V1_ENDPOINT}/pages:bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["created"] == 1
+    assert response.json()["errors"][0]["index"] == 1
+
+
+@pytest.mark.usefixtures("dependency_overrides")
+@pytest.mark.asyncio
+async def test_export_pages_ndjson(client, page_factory):
+    page = await page_factory(title="testpage")
+
+    response = await client.get(f"{V1_ENDPOINT}/pages:export")
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == HTTPStatus.OK
+    assert records[0]["type"] == "page"
+    assert records[0]["uuid"] == str(page.uuid)
+
+
+@pytest.mark.usefixtures("indexed_page", "llm_client")
+@pytest.mark.asyncio
+async def test_chat_answers_from_the_retrieved_chunks(client, fake_ollama):
+    response = await client.post(f"{V1_ENDPOINT}/chat", json=chat_payload())
+
+    # the fake model answers with the words of the prompt it was sent, which
+    # holds the question and the retrieved chunk
+    prompt = render_from_template(
+        CHAT_PROMPT_TEMPLATE, {"question": CHUNK, "retrieved_text": CHUNK}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "response": "".join(fake_answer_tokens(prompt, fake_ollama.settings.tokens)),
+        "cached": False,
+    }
+
+
+@pytest.mark.usefixtures("indexed_page", "llm_client")
+@pytest.mark.asyncio
+async def test_chat_stream_sse(client, fake_ollama):
+    response = await client.post(f"{V1_ENDPOINT}/chat/stream", json=chat_payload())
+
+    events = parse_sse(response.text)
+    tokens = fake_ollama.settings.tokens
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    # every token, including the last one sent on Ollama's done part
+    assert [event for event, _ in events] == [None] * tokens + ["done"]
+    assert all("token" in data for _, data in events[:-1])
+    assert events[-1][1] == {"done": True, "cached": False, "eval_count": tokens}
+
+
+@pytest.mark.usefixtures("indexed_page", "llm_client")
+@pytest.mark.asyncio
+async def test_chat_stream_ndjson(client, fake_ollama):
+    response = await client.post(
+        f"{V1_ENDPOINT}/chat/stream",
+        params={"format": "ndjson"},
+        json=chat_payload(),
+    )
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    tokens = fake_ollama.settings.tokens
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert all("token" in record for record in records[:-1])
+    assert len(records) == tokens + 1
+    assert records[-1] == {"done": True, "cached": False, "eval_count": tokens}
+
+
+@pytest.mark.usefixtures("indexed_page", "llm_client")
+@pytest.mark.asyncio
+async def test_chat_stream_serves_the_cached_answer(client):
+    first = await client.post(f"{V1_ENDPOINT}/chat/stream", json=chat_payload())
+    second = await client.post(f"{V1_ENDPOINT}/chat/stream", json=chat_payload())
+
+    answer = "".join(data["token"] for _, data in parse_sse(first.text)[:-1])
+    assert parse_sse(second.text) == [
+        (None, {"token": answer}),
+        ("done", {"done": True, "cached": True}),
+    ]
+
+
+@pytest.mark.usefixtures("indexed_page")
+@pytest.mark.asyncio
+async def test_chat_stream_cancels_generation_on_disconnect(
+    application, dependency_overrides, test_session
+):
+    settings = FakeOllamaSettings(
+        embed_latency=0, first_token_latency=0, token_latency=0.05, tokens=40
+    )
+    with FakeOllama(settings) as server:
+        llm_client = make_llm_client(server, max_concurrency=1)
+        override_models(dependency_overrides, llm_client)
+        body = json.dumps(chat_payload()).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": f"{V1_ENDPOINT}/chat/stream",
+            "raw_path": f"{V1_ENDPOINT}/chat/stream".encode(),
+            "root_path": "",
+            "query_string": b"format=ndjson",
+            "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 12345),
+            "server": ("test", 80),
+        }
+        first_token_sent = asyncio.Event()
+        request_read = False
+        sent = []
+
+        async def receive():
+            nonlocal request_read
+            if not request_read:
+                request_read = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # the client goes away once it has seen the first token
+            await first_token_sent.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and message.get("body"):
+                first_token_sent.set()
+
+        try:
+            async with asyncio.timeout(5):
+                await application(scope, receive, send)
+
+            # the slot was given back without waiting for the generation
+            async with llm_client.slot():
+                pass
+        finally:
+            await llm_client.close()
+
+    bodies = [message.get("body", b"") for message in sent[1:]]
+    assert b"".join(bodies).count(b"\n") < settings.tokens
+    assert b'"done"' not in b"".join(bodies)
+    # the partial answer is not cached
+    assert await test_session.scalar(select(func.count()).select_from(AnswerCache)) == 0